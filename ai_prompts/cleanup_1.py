@@ -1,22 +1,7 @@
+# Instructions only: sent after TRANSCRIPT_PREFIX (transcript_prefix.py), which
+# holds the transcript
 CLEANUP_TRANSCRIPT = """
-You will be analyzing a long-form podcast interview transcript to extract the most valuable, interesting, and emotionally resonant segments. Your goal is to identify and preserve approximately 50% of the content while removing filler, repetitive content, and less interesting portions.
-
-First, here is additional context about the podcast show, host, and guest:
-
-<context>
-{context}
-</context>
-
-Here is the full podcast transcript you will analyze:
-
-<transcript>
-{transcript}
-</transcript>
-
-The transcript follows this format:
-- Timestamps in format HH:MM:SS,mmm --> HH:MM:SS,mmm
-- Speaker names in brackets [Name]
-- Spoken text following the speaker identification
+You will be analyzing the podcast interview transcript above to extract the most valuable, interesting, and emotionally resonant segments. Your goal is to identify and preserve approximately 50% of the content while removing filler, repetitive content, and less interesting portions.
 
 Your task is to identify segments worth keeping based on these criteria:
 
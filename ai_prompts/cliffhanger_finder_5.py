@@ -1,11 +1,7 @@
+# Instructions only: sent after TRANSCRIPT_PREFIX (transcript_prefix.py), which
+# holds the transcript
 CLIFFHANGER_FINDER = """
-You will be analyzing a podcast transcript to identify compelling cliffhanger moments that can be used in a podcast trailer. Your goal is to find segments that create curiosity and motivate listeners to watch the full episode.
-
-Here is the podcast transcript to analyze:
-
-<transcript>
-{transcript}
-</transcript>
+You will be analyzing the podcast transcript above to identify compelling cliffhanger moments that can be used in a podcast trailer. Your goal is to find segments that create curiosity and motivate listeners to watch the full episode.
 
 A great cliffhanger moment has one or more of these qualities:
 - Poses an intriguing question that isn't immediately answered
@@ -38,6 +34,7 @@ class ClipSelection(BaseModel):
     end: str    # Format: "HH:MM:SS,mmm" (e.g., "01:23:53,639")
     transcript_text: str  # Exact text from the transcript
     notes: str  # Brief explanation of why this works as a cliffhanger
+    score: Optional[float]  # 1-10, how strong this is as a cliffhanger
 ```
 
 In your notes field, specifically explain:
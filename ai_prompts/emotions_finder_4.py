@@ -1,11 +1,7 @@
+# Instructions only: sent after TRANSCRIPT_PREFIX (transcript_prefix.py), which
+# holds the transcript
 EMOTIONS_FINDER = """
-You will be analyzing a podcast transcript to identify compelling emotional moments that could be used to create a ninety-second trailer with a storytelling arc. Your goal is to find clips that showcase emotional ups and downs, creating an "emotional roller coaster" effect.
-
-Here is the podcast transcript you will be analyzing:
-
-<transcript>
-{transcript}
-</transcript>
+You will be analyzing the podcast transcript above to identify compelling emotional moments that could be used to create a ninety-second trailer with a storytelling arc. Your goal is to find clips that showcase emotional ups and downs, creating an "emotional roller coaster" effect.
 
 Your task is to identify and extract segments from this transcript that contain strong emotional moments. You are looking for:
 
@@ -62,6 +58,7 @@ class ClipSelection(BaseModel):
     end: str    # Format: "HH:MM:SS,mmm" (e.g., "01:23:53,639")
     transcript_text: str  # Exact text from the transcript
     notes: str  # Brief explanation
+    score: Optional[float]  # 1-10, how strong this is as an emotional moment
 ```
 
 """
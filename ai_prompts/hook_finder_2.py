@@ -30,6 +30,7 @@ class ClipSelection(BaseModel):
     end: str    # Format: "HH:MM:SS,mmm" (e.g., "01:23:53,639")
     transcript_text: str  # Exact text from the transcript
     notes: str  # Brief explanation of why this works as a hook
+    score: Optional[float]  # 1-10, how strong this is as a hook
 ```
 
 Here is an example of a good selection:
@@ -38,7 +39,8 @@ Here is an example of a good selection:
   "start": "01:21:32,954",
   "end": "01:21:40,000",
   "transcript_text": "[Hwei]I used to think that my existence is to be of use by others, is to lose my shapes and forms and then putting myself down to the dust.",
-  "notes": "Deeply vulnerable admission about past self-worth issues - emotionally powerful and relatable struggle"
+  "notes": "Deeply vulnerable admission about past self-worth issues - emotionally powerful and relatable struggle",
+  "score": 8
 }}
 
 Before providing your final output, use a scratchpad to work through the transcript:
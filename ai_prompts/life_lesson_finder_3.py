@@ -36,13 +36,16 @@ Before providing your final selections, use the scratchpad below to think throug
 - Prioritize the most impactful and valuable moments
 </scratchpad>
 
+Give each clip a "score" from 1 to 10 for how valuable and memorable the lesson is; the strongest clips are picked for the trailer by it.
+
 Now provide your selected clips in the following format. Each clip should be a separate JSON object with this exact structure:
 
 {{
   "start": "01:21:32,954",
   "end": "01:21:40,000",
   "transcript_text": "[Hwei]I used to think that my existence is to be of use by others, is to lose my shapes and forms and then putting myself down to the dust.",
-  "notes": "Deeply vulnerable admission about past self-worth issues - emotionally powerful and relatable struggle"
+  "notes": "Deeply vulnerable admission about past self-worth issues - emotionally powerful and relatable struggle",
+  "score": 8
 }}
 
 Present your selections inside <clips> tags, with each clip as a properly formatted JSON object. Include as many clips you can find, depending on how much valuable content is present in the transcript.
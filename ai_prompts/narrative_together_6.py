@@ -19,11 +19,9 @@ You will be provided with four lists of potential clips, each serving a differen
 {cliffhangers}
 </cliffhangers>
 
-Each clip in these lists contains:
-- start: timestamp in HH:MM:SS,mmm format
-- end: timestamp in HH:MM:SS,mmm format
-- transcript_text: the exact spoken words from the interview
-- notes: explanation of why this clip was selected for its category
+Each clip in these lists is written as:
+- a line "HH:MM:SS,mmm --> HH:MM:SS,mmm [Speaker] text" with the start time, end time, and the exact spoken words from the interview
+- an indented "notes:" line explaining why this clip was selected for its category
 
 NARRATIVE STRUCTURE:
 
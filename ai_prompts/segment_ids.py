@@ -0,0 +1,23 @@
+_SEGMENT_RANGES = """
+Each segment of the transcript above starts with its ID, e.g. "#12 00:01:02,000 --> 00:01:09,500 [Name]". Do not copy timestamps or transcript text into your answer; the text is filled in from the IDs. Instead, give each selection as a range of segments:
+
+- first_segment / last_segment: IDs of the first and last segment of the selection (the same ID for a selection within one segment)
+- trim_start_words / trim_end_words: words to leave out at the start of the first segment and at the end of the last one, to cut a selection mid-segment; leave them at 0 to keep whole segments
+"""
+
+SEGMENT_ID_INSTRUCTIONS = (
+    _SEGMENT_RANGES
+    + """- notes and score: as described above, with notes of one short sentence
+
+Follow all the other instructions above as they are.
+"""
+)
+
+# For steps whose notes are not used later, e.g. the cleanup
+SEGMENT_ID_INSTRUCTIONS_WITHOUT_NOTES = (
+    _SEGMENT_RANGES
+    + """- notes: leave empty, only the ranges are kept from this step
+
+Follow all the other instructions above as they are.
+"""
+)
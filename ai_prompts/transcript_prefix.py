@@ -0,0 +1,20 @@
+TRANSCRIPT_PREFIX = """
+You will be working with a long-form podcast interview. First, here is additional context about the podcast show, host, and guest:
+
+<context>
+{context}
+</context>
+
+Here is the full podcast transcript:
+
+<transcript>
+{transcript}
+</transcript>
+
+The transcript follows this format:
+- Timestamps in format HH:MM:SS,mmm --> HH:MM:SS,mmm
+- Speaker names in brackets [Name]
+- Spoken text following the speaker identification
+
+Your task for this transcript follows.
+"""
@@ -0,0 +1,302 @@
+"""
+Batch Clip Extraction Workflow
+
+Runs the clip selection and timeline pipeline from `main.py` for many episodes
+at once. Episodes come from either:
+
+- a manifest JSON file: {"defaults": {...}, "episodes": [{...}, ...]}
+- a directory of episode JSON files, one episode per file
+
+Each episode entry has the fields of `models.data_models.Episode` (name,
+transcript_path, context, fps, media_paths and optional output paths); values
+in "defaults" apply to every episode. Relative paths in an entry are resolved
+against the manifest's directory (for an episode directory, that directory);
+a transcript or media file that isn't there is still looked up from the
+working directory. Output paths left out keep their defaults under `data/`.
+
+    python batch.py data/episodes/season_2.json --workers 4 --api-concurrency 8
+
+Episodes run on a worker pool, share one limit on concurrent API requests and
+are reported individually, so one failing episode doesn't stop the season.
+
+With `--batch`, AI requests go out as provider batch jobs instead (see
+`utils.batch_jobs`): all episodes run at once, so the clip requests of every
+episode are submitted together. For transcripts split into windows, the
+reduce requests follow in a second job once the window results are back.
+Each episode still runs its own stages one after another.
+"""
+
+# ----------------------------------------------------------------------
+# IMPORTS
+# ----------------------------------------------------------------------
+
+# Standard library
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Any, Dict, List
+
+# Third-party
+from dotenv import load_dotenv
+
+# Local imports
+from config import (
+    BATCH_COLLECT_SECONDS,
+    BATCH_JOBS_DIR,
+    BATCH_MAX_EPISODES,
+    BATCH_MAX_REQUESTS,
+    BATCH_POLL_SECONDS,
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_SECONDS,
+    DEFAULT_MODEL,
+    MAX_API_CONCURRENCY,
+    MAX_REQUEST_ATTEMPTS,
+    MODEL_PRICES,
+    PROMETHEUS_PATH,
+    REQUEST_TIMEOUT_SECONDS,
+    REQUESTS_PER_MINUTE,
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_MAX_AGE_DAYS,
+    RESPONSE_CACHE_MAX_MB,
+    RESPONSE_CACHE_MODE,
+    STAGE_MODELS,
+    TELEMETRY_DIR,
+    TOKENS_PER_MINUTE,
+)
+from main import build_stages
+from models.data_models import Episode
+from models.transcript import Transcript
+from utils.batch_jobs import add_batch_arguments, batch_providers
+from utils.cache import build_response_cache
+from utils.pipeline import PipelineManifest, add_resume_arguments, run_stages
+from utils.providers import ModelRouter, add_provider_arguments
+from utils.request_layer import build_request_layer
+from utils.telemetry import build_telemetry
+
+
+# ----------------------------------------------------------------------
+# LOGGING CONFIGURATION
+# ----------------------------------------------------------------------
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPORT_PATH = Path("data/processing/batch_report.json")
+
+
+class EpisodeLogger(logging.LoggerAdapter):
+    """Prefix every log line with the episode name."""
+
+    def process(self, msg, kwargs):
+        return f"[{self.extra['episode']}] {msg}", kwargs
+
+
+# ----------------------------------------------------------------------
+# EPISODE LOADING
+# ----------------------------------------------------------------------
+
+
+def _input_path(path: Path, base_dir: Path) -> Path:
+    # Entries written relative to the working directory keep working
+    candidate = base_dir / path
+    return candidate if not path.is_absolute() and candidate.exists() else path
+
+
+def _episode_from_entry(entry: Dict[str, Any], base_dir: Path) -> Episode:
+    episode = Episode.model_validate(entry)
+    episode.transcript_path = _input_path(episode.transcript_path, base_dir)
+    episode.media_paths = [
+        str(_input_path(Path(path), base_dir)) for path in episode.media_paths
+    ]
+    for field in ("clips_path", "otio_path"):
+        path = getattr(episode, field)
+        if field in entry and not path.is_absolute():
+            setattr(episode, field, base_dir / path)
+    return episode
+
+
+def load_episodes(source: Path) -> List[Episode]:
+    """Read episodes from a manifest file or a directory of episode files."""
+    if source.is_dir():
+        return [
+            _episode_from_entry(json.loads(path.read_text(encoding="utf-8")), source)
+            for path in sorted(source.glob("*.json"))
+        ]
+
+    manifest = json.loads(source.read_text(encoding="utf-8"))
+    defaults = manifest.get("defaults", {})
+    return [
+        _episode_from_entry({**defaults, **entry}, source.parent)
+        for entry in manifest["episodes"]
+    ]
+
+
+# ----------------------------------------------------------------------
+# EXECUTION
+# ----------------------------------------------------------------------
+
+
+def run_episode(
+    episode: Episode, router, cache, request_layer, telemetry, args
+) -> Dict[str, Any]:
+    """Run one episode's pipeline and return its status entry."""
+    episode_logger = EpisodeLogger(logger, {"episode": episode.name})
+    started = time.perf_counter()
+    status: Dict[str, Any] = {"episode": episode.name}
+    try:
+        transcript = Transcript.from_file(episode.transcript_path)
+        results = run_stages(
+            build_stages(
+                router,
+                episode,
+                transcript,
+                cache,
+                request_layer,
+                logger=episode_logger,
+                telemetry=telemetry,
+                telemetry_prefix=f"{episode.name}/",
+            ),
+            max_workers=1,
+            logger=episode_logger,
+            manifest=PipelineManifest(episode.manifest_path),
+            from_stage=args.from_stage,
+            only_stages=args.only_stage,
+        )
+        status.update(
+            status="ok",
+            clips=len(results["clips"].clips) if "clips" in results else None,
+            timeline=str(episode.otio_path) if "timeline" in results else None,
+        )
+    except Exception as exc:
+        episode_logger.exception("Episode failed")
+        status.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+    status["seconds"] = round(time.perf_counter() - started, 1)
+    return status
+
+
+def log_report(report: List[Dict[str, Any]]) -> None:
+    """Log a one-line-per-episode status table."""
+    width = max([len("episode")] + [len(r["episode"]) for r in report])
+    lines = [f"{'episode':<{width}}  status  clips  seconds  detail"]
+    for r in report:
+        clips = "-" if r.get("clips") is None else str(r["clips"])
+        detail = r.get("error") or r.get("timeline") or ""
+        lines.append(
+            f"{r['episode']:<{width}}  {r['status']:<6}  {clips:>5}  "
+            f"{r['seconds']:>7}  {detail}"
+        )
+    logger.info("Batch report:\n" + "\n".join(lines))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Batch Clip Extraction")
+    parser.add_argument(
+        "episodes", type=Path, help="Episode manifest JSON or directory of episodes"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=f"Episodes processed at the same time (default: {BATCH_MAX_EPISODES}, "
+        "or all of them with --batch)",
+    )
+    parser.add_argument(
+        "--api-concurrency",
+        type=int,
+        default=MAX_API_CONCURRENCY,
+        help="Maximum AI requests in flight across all episodes",
+    )
+    parser.add_argument(
+        "--report", type=Path, default=DEFAULT_REPORT_PATH, help="Status report path"
+    )
+    add_resume_arguments(parser)
+    add_provider_arguments(parser)
+    add_batch_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+
+    episodes = load_episodes(args.episodes)
+    names = [e.name for e in episodes]
+    if len(set(names)) != len(names):
+        raise ValueError("Episode names must be unique; they name the output files")
+    logger.info(f"Loaded {len(episodes)} episodes from {args.episodes}")
+
+    load_dotenv()
+    if args.batch:
+        # Every episode waits on its batch jobs at the same time, so their
+        # requests share jobs; rate limits and timeouts don't apply to jobs
+        router = ModelRouter(
+            DEFAULT_MODEL,
+            STAGE_MODELS,
+            provider_override=args.provider,
+            providers=batch_providers(
+                BATCH_JOBS_DIR,
+                collect_seconds=BATCH_COLLECT_SECONDS,
+                poll_seconds=BATCH_POLL_SECONDS,
+                max_requests=BATCH_MAX_REQUESTS,
+                logger=logger,
+            ),
+        )
+        request_layer = None
+        workers = args.workers or len(episodes)
+    else:
+        router = ModelRouter(
+            DEFAULT_MODEL, STAGE_MODELS, provider_override=args.provider
+        )
+        # One request layer for all episodes, so the limits apply to the batch
+        request_layer = build_request_layer(
+            requests_per_minute=REQUESTS_PER_MINUTE,
+            tokens_per_minute=TOKENS_PER_MINUTE,
+            max_concurrent=args.api_concurrency,
+            max_attempts=MAX_REQUEST_ATTEMPTS,
+            breaker_failures=CIRCUIT_BREAKER_FAILURES,
+            breaker_reset_seconds=CIRCUIT_BREAKER_RESET_SECONDS,
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            logger=logger,
+        )
+        workers = args.workers or BATCH_MAX_EPISODES
+    response_cache = build_response_cache(
+        RESPONSE_CACHE_MODE,
+        RESPONSE_CACHE_DIR,
+        max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+        max_age_days=RESPONSE_CACHE_MAX_AGE_DAYS,
+    )
+
+    # One run log for the batch; records carry the output file of each episode
+    telemetry = build_telemetry(TELEMETRY_DIR, "batch", MODEL_PRICES)
+
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="episode"
+    ) as executor:
+        report = list(
+            executor.map(
+                lambda ep: run_episode(
+                    ep, router, response_cache, request_layer, telemetry, args
+                ),
+                episodes,
+            )
+        )
+
+    log_report(report)
+    telemetry.finish(logger, PROMETHEUS_PATH)
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    args.report.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    logger.info(f"Wrote batch report to {args.report}")
+
+    failed = sum(r["status"] != "ok" for r in report)
+    logger.info(f"Batch complete: {len(report) - failed} ok, {failed} failed")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
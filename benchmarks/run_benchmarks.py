@@ -0,0 +1,771 @@
+"""
+Offline Benchmarks
+
+Measures the local work of the workflows without calling any AI provider:
+
+- recorded: the example transcript and the LLM responses recorded in
+  `data/processing/*.json`, through transcript load, pre-filter, prompt rendering,
+  validation, `to_clip_specs`, `PerMediaTimelineBuilder.build_timeline`,
+  `update_timeline` (one retimed clip) and `otio.adapters.write_to_file`,
+  plus `TranscriptGrounder` over every stage's clips, `optimize_clips`
+  over the finders' candidates, and the cleanup response rebuilt from
+  segment ID ranges (with the output tokens of both forms)
+- pipeline: every stage of `narrative_trailer.py` and `main.py`, with the
+  recorded responses replayed by a fake provider, and the three transcript
+  stages on the fake Gemini client (with a simulated prefill time) without
+  and with a context cache for their shared prefix: time to first token and
+  prompt tokens sent
+- synthetic: generated transcripts of 1-10 hours and timelines of 10-10,000
+  clips, regular and compact, and the grounding of that many clips quoting
+  each transcript, to see how each step scales
+
+Each benchmark reports the best and mean wall time over `--repeat` runs, and
+from one extra run under tracemalloc the peak traced memory and the memory
+(and number of blocks) still allocated when it returns, i.e. its result.
+tracemalloc only sees Python allocations, so the C++ objects behind OTIO
+timelines are not included in the memory figures.
+Results are written as JSON; pass an earlier file to `--compare` to print
+the change per benchmark.
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --suite synthetic --clips 10 100 1000
+    python -m benchmarks.run_benchmarks --compare data/benchmarks/baseline.json
+"""
+
+# ----------------------------------------------------------------------
+# IMPORTS
+# ----------------------------------------------------------------------
+
+# Standard library
+import argparse
+import dataclasses
+import gc
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+# Third-party
+import opentimelineio as otio
+
+# Local imports
+from ai_prompts.cleanup_1 import CLEANUP_TRANSCRIPT
+from ai_prompts.cliffhanger_finder_5 import CLIFFHANGER_FINDER
+from ai_prompts.emotions_finder_4 import EMOTIONS_FINDER
+from ai_prompts.hook_finder_2 import HOOK_FINDER
+from ai_prompts.life_lesson_finder_3 import LIFE_LESSON_FINDER
+from ai_prompts.narrative_together_6 import NARRATIVE_TOGETHER
+from ai_prompts.transcript_prefix import TRANSCRIPT_PREFIX
+from benchmarks.synthetic import (
+    synthetic_clips,
+    synthetic_quotes,
+    synthetic_transcript,
+)
+from config import (
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_TOKEN_BUDGET,
+    CONTEXT,
+    FPS,
+    MEDIA_PATHS,
+    TRANSCRIPT_PATH,
+)
+from create_timelines.otio_builder import (
+    COMPACT_OTIO_INDENT,
+    OTIO_INDENT,
+    PerMediaTimelineBuilder,
+)
+from models.data_models import (
+    ClipSpec,
+    ClipsList,
+    Episode,
+    SegmentSelection,
+    SegmentSelectionList,
+    SourceMedia,
+)
+from models.transcript import Transcript
+from utils.clip_optimizer import optimize_clips
+from utils.genai import generate_clips_map_reduce, render_clips_for_prompt
+from utils.grounding import TranscriptGrounder
+from utils.pipeline import Stage, run_stages
+from utils.prefilter import prefilter_transcript
+from utils.segment_ids import rebuild_clips
+from utils.providers import FakeProvider, ModelRouter, ReplayProvider
+from utils.telemetry import Telemetry
+from utils.timecode import parse_frame_rate
+from utils.utils import estimate_tokens
+
+
+# ----------------------------------------------------------------------
+# LOGGING CONFIGURATION
+# ----------------------------------------------------------------------
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# The workflows log every response in full; keep that out of the measurements
+quiet_logger = logging.getLogger("benchmarks.quiet")
+quiet_logger.setLevel(logging.WARNING)
+
+RECORDED_DIR = Path("data/processing")
+DEFAULT_OUTPUT_DIR = Path("data/benchmarks")
+
+# Recorded response for each LLM stage of narrative_trailer.py and main.py
+RECORDED_RESPONSES = {
+    "cleanup": "cleaned_transcript.json",
+    "hooks": "hook_candidates.json",
+    "life_lessons": "life_lessons.json",
+    "emotions": "emotions.json",
+    "cliffhangers": "cliffhanger_candidates.json",
+    "narrative": "narrative_trailer.json",
+    "clips": "narrative_trailer.json",
+}
+
+# The stages whose prompts share the transcript prefix
+PREFIX_STAGES = {
+    "emotions": EMOTIONS_FINDER,
+    "cliffhangers": CLIFFHANGER_FINDER,
+}
+# Simulated prefill time of the fake provider, per 1,000 uncached prompt tokens
+PREFILL_SECONDS_PER_1K_TOKENS = 0.02
+
+
+# ----------------------------------------------------------------------
+# MEASUREMENT
+# ----------------------------------------------------------------------
+
+
+def _memory_run(fn: Callable[[], Any]) -> Dict[str, float]:
+    """Run `fn` once under tracemalloc; its result is kept until measured."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+
+    growth = [s for s in after.compare_to(before, "filename") if s.size_diff > 0]
+    return {
+        "peak_kib": round(peak / 1024, 1),
+        "allocated_kib": round(sum(s.size_diff for s in growth) / 1024, 1),
+        "allocated_blocks": sum(max(s.count_diff, 0) for s in growth),
+    }
+
+
+def measure(
+    name: str, fn: Callable[[], Any], *, repeat: int, **info
+) -> Dict[str, Any]:
+    """Time `fn` over `repeat` runs, then measure its memory in one more."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    record = {
+        "name": name,
+        **info,
+        "wall_seconds": round(min(timings), 6),
+        "wall_seconds_mean": round(statistics.mean(timings), 6),
+        **_memory_run(fn),
+    }
+    logger.info(
+        f"{name}: {record['wall_seconds'] * 1000:.1f} ms, "
+        f"peak {record['peak_kib']:,.0f} KiB"
+    )
+    return record
+
+
+def _source_media(specs: List[ClipSpec], fps, media_paths: List[str]):
+    rate = float(parse_frame_rate(fps))
+    return [SourceMedia(file_path=path, rate=rate, clips=specs) for path in media_paths]
+
+
+def _build_timeline(
+    clips: ClipsList, fps, media_paths: List[str], compact: bool = False
+):
+    return PerMediaTimelineBuilder(compact=compact).build_timeline(
+        _source_media(clips.to_clip_specs(fps), fps, media_paths)
+    )
+
+
+def _timeline_updater(timeline, clips: ClipsList, fps, media_paths: List[str]):
+    """Patch `timeline` back and forth between its clips and one retimed clip."""
+    specs = clips.to_clip_specs(fps)
+    edited = list(specs)
+    if edited:
+        middle = len(edited) // 2
+        edited[middle] = ClipSpec(
+            start=edited[middle].start + 1, duration=edited[middle].duration
+        )
+    states = itertools.cycle(
+        [
+            _source_media(edited, fps, media_paths),
+            _source_media(specs, fps, media_paths),
+        ]
+    )
+    builder = PerMediaTimelineBuilder()
+    return lambda: builder.update_timeline(timeline, next(states))
+
+
+def _clip_benchmarks(
+    prefix: str,
+    clips_json: str,
+    fps,
+    media_paths: List[str],
+    work_dir: Path,
+    repeat: int,
+    **info,
+) -> List[Dict[str, Any]]:
+    """Validation, frame conversion, timeline build, patch and write of clips."""
+    clips = ClipsList.model_validate_json(clips_json)
+    timeline = _build_timeline(clips, fps, media_paths)
+    otio_path = work_dir / f"{prefix.replace('/', '_')}.otio"
+
+    results = [
+        measure(
+            f"{prefix}/validation",
+            lambda: ClipsList.model_validate_json(clips_json),
+            repeat=repeat,
+            **info,
+        ),
+        measure(
+            f"{prefix}/to_clip_specs",
+            lambda: clips.to_clip_specs(fps),
+            repeat=repeat,
+            **info,
+        ),
+        measure(
+            f"{prefix}/build_timeline",
+            lambda: _build_timeline(clips, fps, media_paths),
+            repeat=repeat,
+            **info,
+        ),
+        measure(
+            f"{prefix}/update_timeline",
+            _timeline_updater(
+                _build_timeline(clips, fps, media_paths), clips, fps, media_paths
+            ),
+            repeat=repeat,
+            **info,
+        ),
+        measure(
+            f"{prefix}/write_otio",
+            lambda: otio.adapters.write_to_file(
+                timeline, str(otio_path), indent=OTIO_INDENT
+            ),
+            repeat=repeat,
+            **info,
+        ),
+    ]
+    results[-1]["output_bytes"] = otio_path.stat().st_size
+    return results
+
+
+def _compact_benchmarks(
+    prefix: str,
+    clips_list: ClipsList,
+    fps,
+    media_paths: List[str],
+    work_dir: Path,
+    repeat: int,
+    **info,
+) -> List[Dict[str, Any]]:
+    """Build and write of the same clips as a compact timeline."""
+    timeline = _build_timeline(clips_list, fps, media_paths, compact=True)
+    otio_path = work_dir / f"{prefix.replace('/', '_')}_compact.otio"
+    results = [
+        measure(
+            f"{prefix}/build_timeline_compact",
+            lambda: _build_timeline(clips_list, fps, media_paths, compact=True),
+            repeat=repeat,
+            **info,
+        ),
+        measure(
+            f"{prefix}/write_otio_compact",
+            lambda: otio.adapters.write_to_file(
+                timeline, str(otio_path), indent=COMPACT_OTIO_INDENT
+            ),
+            repeat=repeat,
+            **info,
+        ),
+    ]
+    results[-1]["output_bytes"] = otio_path.stat().st_size
+    return results
+
+
+# ----------------------------------------------------------------------
+# SUITES
+# ----------------------------------------------------------------------
+
+
+def _recorded_responses() -> Dict[str, str]:
+    return {
+        stage: (RECORDED_DIR / file_name).read_text(encoding="utf-8")
+        for stage, file_name in RECORDED_RESPONSES.items()
+    }
+
+
+def recorded_suite(repeat: int, work_dir: Path) -> List[Dict[str, Any]]:
+    """The example transcript and the recorded responses, step by step."""
+    responses = _recorded_responses()
+    transcript = Transcript.from_file(TRANSCRIPT_PATH)
+    cleaned = ClipsList.model_validate_json(responses["cleanup"])
+    finders = {
+        key: ClipsList.model_validate_json(responses[stage])
+        for key, stage in [
+            ("hooks", "hooks"),
+            ("lessons", "life_lessons"),
+            ("emotional_moments", "emotions"),
+            ("cliffhangers", "cliffhangers"),
+        ]
+    }
+
+    def render_prompts():
+        prefix = TRANSCRIPT_PREFIX.format(
+            transcript=transcript.render(), context=CONTEXT
+        )
+        cleaned_text = render_clips_for_prompt(
+            cleaned, label="cleaned transcript", logger=quiet_logger
+        )
+        return [
+            prefix + CLEANUP_TRANSCRIPT.format(),
+            *(prefix + template.format() for template in PREFIX_STAGES.values()),
+            HOOK_FINDER.format(transcript=cleaned_text),
+            LIFE_LESSON_FINDER.format(transcript=cleaned_text),
+            NARRATIVE_TOGETHER.format(
+                **{
+                    key: render_clips_for_prompt(
+                        clips, label=key, logger=quiet_logger, include_notes=True
+                    )
+                    for key, clips in finders.items()
+                }
+            ),
+        ]
+
+    grounder = TranscriptGrounder(transcript)
+    all_clips = [ClipsList.model_validate_json(r) for r in responses.values()]
+
+    slot_candidates = {
+        stage: ClipsList.model_validate_json(responses[stage])
+        for stage in ("hooks", "life_lessons", "emotions", "cliffhangers")
+    }
+
+    def optimize_recorded() -> Optional[ClipsList]:
+        # Candidates that fill no trailer still cost the full search
+        try:
+            return optimize_clips(slot_candidates)
+        except ValueError:
+            return None
+
+    # The recorded cleanup as the segment ranges an ID-addressed response
+    # would give, without the notes nothing reads
+    ranges = SegmentSelectionList(
+        clips=[
+            SegmentSelection(first_segment=segments.start, last_segment=segments[-1])
+            for segments in (
+                transcript.segments_between(start, end)
+                for start, end in zip(*cleaned.to_ms_arrays())
+            )
+        ]
+    )
+
+    info = {"segments": len(transcript), "clips": len(cleaned.clips)}
+    results = [
+        measure(
+            "recorded/transcript_load",
+            lambda: Transcript.from_file(TRANSCRIPT_PATH),
+            repeat=repeat,
+            **info,
+        ),
+        measure(
+            "recorded/prefilter",
+            lambda: prefilter_transcript(transcript),
+            repeat=repeat,
+            **info,
+        ),
+        measure("recorded/prompt_render", render_prompts, repeat=repeat, **info),
+        measure(
+            "recorded/validation_all_stages",
+            lambda: [ClipsList.model_validate_json(r) for r in responses.values()],
+            repeat=repeat,
+            **info,
+        ),
+        measure(
+            "recorded/grounding_index",
+            lambda: TranscriptGrounder(transcript),
+            repeat=repeat,
+            **info,
+        ),
+        measure(
+            "recorded/optimize_narrative",
+            optimize_recorded,
+            repeat=repeat,
+            fits=optimize_recorded() is not None,
+            **info,
+        ),
+        measure(
+            "recorded/grounding_all_stages",
+            lambda: [grounder.ground(clips) for clips in all_clips],
+            repeat=repeat,
+            **info,
+            grounded_clips=sum(len(clips.clips) for clips in all_clips),
+        ),
+        measure(
+            "recorded/segment_id_rebuild",
+            lambda: rebuild_clips(ranges, transcript),
+            repeat=repeat,
+            **info,
+            output_tokens_text=estimate_tokens(responses["cleanup"]),
+            output_tokens_ids=estimate_tokens(
+                ranges.model_dump_json(exclude_defaults=True)
+            ),
+        ),
+    ]
+    results += _clip_benchmarks(
+        "recorded/cleanup",
+        responses["cleanup"],
+        FPS,
+        MEDIA_PATHS,
+        work_dir,
+        repeat,
+        **info,
+    )
+    return results
+
+
+def _instrumented(
+    stages: List[Stage], records: Dict[str, Dict[str, Any]], traced: bool
+) -> List[Stage]:
+    """Wrap each stage's run to record its wall time (and memory when traced)."""
+
+    def wrap(stage: Stage) -> Stage:
+        def run(deps):
+            if traced:
+                tracemalloc.reset_peak()
+            started = time.perf_counter()
+            result = stage.run(deps)
+            record = records.setdefault(stage.name, {"timings": []})
+            record["timings"].append(time.perf_counter() - started)
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                record["peak_kib"] = round(peak / 1024, 1)
+            return result
+
+        return dataclasses.replace(stage, run=run)
+
+    return [wrap(stage) for stage in stages]
+
+
+def _pipeline_benchmark(
+    name: str, make_stages: Callable[[], List[Stage]], repeat: int
+) -> List[Dict[str, Any]]:
+    """Run a workflow's stages sequentially and report each stage."""
+    records: Dict[str, Dict[str, Any]] = {}
+    for _ in range(repeat):
+        stages = _instrumented(make_stages(), records, False)
+        run_stages(stages, max_workers=1, logger=quiet_logger)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stages = _instrumented(make_stages(), records, True)
+        run_stages(stages, max_workers=1, logger=quiet_logger)
+    finally:
+        tracemalloc.stop()
+
+    results = []
+    for stage, record in records.items():
+        timings = record["timings"][:repeat]
+        results.append(
+            {
+                "name": f"pipeline/{name}/{stage}",
+                "wall_seconds": round(min(timings), 6),
+                "wall_seconds_mean": round(statistics.mean(timings), 6),
+                "peak_kib": record["peak_kib"],
+            }
+        )
+        logger.info(
+            f"pipeline/{name}/{stage}: {min(timings) * 1000:.1f} ms, "
+            f"peak {record['peak_kib']:,.0f} KiB"
+        )
+    return results
+
+
+def pipeline_suite(repeat: int, work_dir: Path) -> List[Dict[str, Any]]:
+    """Every stage of narrative_trailer.py and main.py with replayed responses."""
+    import main as clip_workflow
+    import narrative_trailer
+
+    for module in (clip_workflow, narrative_trailer):
+        module.logger.setLevel(logging.WARNING)
+
+    router = ModelRouter(
+        "fake:default",
+        {stage: f"fake:{stage}" for stage in RECORDED_RESPONSES},
+        providers={"fake": ReplayProvider(_recorded_responses())},
+    )
+    transcript = Transcript.from_file(TRANSCRIPT_PATH)
+    episode = Episode(
+        name="benchmark",
+        transcript_path=TRANSCRIPT_PATH,
+        context=CONTEXT,
+        fps=FPS,
+        media_paths=MEDIA_PATHS,
+        clips_path=work_dir / "main" / "clips.json",
+        otio_path=work_dir / "main" / "timeline.otio",
+    )
+
+    results = _pipeline_benchmark(
+        "main",
+        lambda: clip_workflow.build_stages(
+            router, episode, transcript, None, logger=quiet_logger
+        ),
+        repeat,
+    )
+
+    # The trailer stages write to fixed relative paths; run them in work_dir
+    cwd = Path.cwd()
+    os.chdir(work_dir)
+    try:
+        results += _pipeline_benchmark(
+            "narrative_trailer",
+            # The recorded responses are clip lists, not segment ID ranges
+            lambda: narrative_trailer.build_stages(
+                router, transcript, None, segment_ids=False
+            ),
+            repeat,
+        )
+    finally:
+        os.chdir(cwd)
+    results += _context_cache_benchmarks(repeat, work_dir)
+    return results
+
+
+def _context_cache_benchmarks(repeat: int, work_dir: Path) -> List[Dict[str, Any]]:
+    """The transcript stages, streamed, without and with a context cache."""
+    transcript = Transcript.from_file(TRANSCRIPT_PATH)
+    results = []
+    for label, ttl in (("off", None), ("on", 900)):
+        runs: List[Telemetry] = []
+
+        def run():
+            # A new provider each time, so every run creates its caches
+            provider = FakeProvider(
+                prefill_seconds_per_1k_tokens=PREFILL_SECONDS_PER_1K_TOKENS,
+                context_cache_ttl=ttl,
+            )
+            telemetry = Telemetry()
+            for stage, template in PREFIX_STAGES.items():
+                generate_clips_map_reduce(
+                    provider=provider,
+                    model_name="fake",
+                    template=template,
+                    prefix_template=TRANSCRIPT_PREFIX,
+                    format_kwargs={"context": CONTEXT},
+                    transcript=transcript,
+                    start_log=stage,
+                    extract_label="clips",
+                    detail_label="Clips",
+                    output_path=work_dir / "context_cache" / f"{stage}.json",
+                    logger=quiet_logger,
+                    token_budget=CHUNK_TOKEN_BUDGET,
+                    overlap_tokens=CHUNK_OVERLAP_TOKENS,
+                    stream=True,
+                    telemetry=telemetry,
+                    stage=stage,
+                )
+            runs.append(telemetry)
+
+        record = measure(f"pipeline/context_cache[{label}]", run, repeat=repeat)
+        requests = runs[0].records
+        prompt_tokens = sum(r.prompt_tokens for r in requests)
+        cached_tokens = sum(r.cached_tokens or 0 for r in requests)
+        record.update(
+            requests=len(requests),
+            mean_ttft_seconds=round(
+                statistics.mean(r.ttft_seconds for r in requests), 6
+            ),
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+        )
+        logger.info(
+            f"pipeline/context_cache[{label}]: {len(requests)} requests, mean "
+            f"TTFT {record['mean_ttft_seconds'] * 1000:.0f} ms, "
+            f"{cached_tokens:,} of {prompt_tokens:,} prompt tokens from the "
+            f"context cache"
+        )
+        results.append(record)
+    return results
+
+
+def synthetic_suite(
+    repeat: int, work_dir: Path, hours: List[float], clip_counts: List[int]
+) -> List[Dict[str, Any]]:
+    """Generated transcripts and clip lists of increasing size."""
+    results = []
+    for length in hours:
+        path = work_dir / f"transcript_{length:g}h.txt"
+        path.write_text(synthetic_transcript(length), encoding="utf-8")
+        transcript = Transcript.from_file(path)
+        info = {"hours": length, "segments": len(transcript)}
+        results += [
+            measure(
+                f"synthetic/transcript_load[{length:g}h]",
+                lambda: Transcript.from_file(path),
+                repeat=repeat,
+                **info,
+            ),
+            measure(
+                f"synthetic/transcript_render[{length:g}h]",
+                transcript.render,
+                repeat=repeat,
+                **info,
+            ),
+            measure(
+                f"synthetic/prefilter[{length:g}h]",
+                lambda: prefilter_transcript(transcript),
+                repeat=repeat,
+                **info,
+            ),
+            measure(
+                f"synthetic/grounding_index[{length:g}h]",
+                lambda: TranscriptGrounder(transcript),
+                repeat=repeat,
+                **info,
+            ),
+        ]
+        grounder = TranscriptGrounder(transcript)
+        for count in clip_counts:
+            quotes = synthetic_quotes(transcript, count)
+            results.append(
+                measure(
+                    f"synthetic/grounding[{length:g}h,{count}]",
+                    lambda: grounder.ground(quotes),
+                    repeat=repeat,
+                    clips=count,
+                    **info,
+                )
+            )
+
+    media_paths = ["synthetic_camera_a.mp4", "synthetic_camera_b.mp4"]
+    for count in clip_counts:
+        clips_list = synthetic_clips(count)
+        results += _clip_benchmarks(
+            f"synthetic/clips[{count}]",
+            clips_list.model_dump_json(),
+            24,
+            media_paths,
+            work_dir,
+            repeat,
+            clips=count,
+        )
+        results += _compact_benchmarks(
+            f"synthetic/clips[{count}]",
+            clips_list,
+            24,
+            media_paths,
+            work_dir,
+            repeat,
+            clips=count,
+        )
+    return results
+
+
+# ----------------------------------------------------------------------
+# REPORTING
+# ----------------------------------------------------------------------
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Log the change in wall time and peak memory per benchmark."""
+    old = {r["name"]: r for r in previous["results"]}
+    width = max(len(r["name"]) for r in current["results"])
+    lines = [f"{'benchmark':<{width}}  {'time':>14}  {'peak memory':>14}"]
+    for record in current["results"]:
+        before = old.get(record["name"])
+        if before is None:
+            lines.append(f"{record['name']:<{width}}  {'new':>14}  {'new':>14}")
+            continue
+        cells = []
+        for key in ("wall_seconds", "peak_kib"):
+            if before[key]:
+                cells.append(f"{record[key] / before[key] - 1:>+13.1%} ")
+            else:
+                cells.append(f"{'-':>14}")
+        lines.append(f"{record['name']:<{width}}  {cells[0]} {cells[1]}")
+    logger.info("Compared with previous run:\n" + "\n".join(lines))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline Benchmarks")
+    parser.add_argument(
+        "--suite",
+        nargs="+",
+        choices=("recorded", "pipeline", "synthetic"),
+        default=["recorded", "pipeline", "synthetic"],
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs each")
+    parser.add_argument(
+        "--hours",
+        type=float,
+        nargs="+",
+        default=[1, 2, 5, 10],
+        help="Synthetic transcript lengths",
+    )
+    parser.add_argument(
+        "--clips",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1_000, 5_000, 10_000],
+        help="Synthetic timeline sizes",
+    )
+    parser.add_argument("--output", type=Path, help="Results JSON path")
+    parser.add_argument("--compare", type=Path, help="Earlier results to compare")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="benchmarks-") as tmp:
+        work_dir = Path(tmp)
+        if "recorded" in args.suite:
+            results += recorded_suite(args.repeat, work_dir)
+        if "pipeline" in args.suite:
+            results += pipeline_suite(args.repeat, work_dir)
+        if "synthetic" in args.suite:
+            results += synthetic_suite(args.repeat, work_dir, args.hours, args.clips)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    output = args.output or (
+        DEFAULT_OUTPUT_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    logger.info(f"Wrote {len(results)} benchmark results to {output}")
+
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding="utf-8")), report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
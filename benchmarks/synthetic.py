@@ -0,0 +1,103 @@
+"""
+Synthetic inputs for the benchmarks.
+
+Generates transcripts of any length in the `data/transcripts` format, and
+clip lists of any size (optionally quoting a transcript), from a seed, so
+runs on different machines or commits measure the same data.
+"""
+
+import random
+from typing import Sequence
+
+from models.data_models import ClipSelection, ClipsList
+from models.transcript import Transcript
+from utils.utils import ms_to_timestamp
+
+_WORDS = (
+    "I you we they it so and but like really think know just actually people "
+    "work learn build started freelance coach data model project client time "
+    "year always never maybe right yeah okay um uh because when then there "
+    "what how why good hard new first last different journey path growth "
+    "story moment felt changed wanted tried failed found help others"
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choices(_WORDS, k=max(words, 1)))
+    return text[0].upper() + text[1:] + "."
+
+
+def synthetic_transcript(
+    hours: float,
+    *,
+    seed: int = 0,
+    speakers: Sequence[str] = ("Host", "Guest"),
+) -> str:
+    """
+    A transcript of about `hours` hours: segments of 1.5-9 s with short gaps,
+    ~170 words per minute, and speaker changes every few segments.
+    """
+    rng = random.Random(seed)
+    total_ms = int(hours * 3_600_000)
+    blocks = []
+    start = 0
+    speaker = 0
+    while start < total_ms:
+        duration = rng.randint(1_500, 9_000)
+        end = start + duration
+        if rng.random() < 0.3:
+            speaker = (speaker + 1) % len(speakers)
+        header = f"{ms_to_timestamp(start)} --> {ms_to_timestamp(end)}"
+        text = _sentence(rng, duration * 170 // 60_000)
+        blocks.append(f"{header} [{speakers[speaker]}]\n{text} \n")
+        start = end + rng.randint(0, 400)
+    return "\n".join(blocks)
+
+
+def synthetic_clips(count: int, *, seed: int = 0) -> ClipsList:
+    """
+    `count` non-overlapping clips in time order, one per 20 s of source on
+    average, each 2-10 s long with a sentence of text and a note.
+    """
+    rng = random.Random(seed)
+    step = 20_000
+    clips = []
+    for i in range(count):
+        start = i * step + rng.randint(0, step // 4)
+        end = start + rng.randint(2_000, step // 2)
+        clips.append(
+            ClipSelection(
+                start=ms_to_timestamp(start),
+                end=ms_to_timestamp(end),
+                transcript_text=_sentence(rng, (end - start) * 170 // 60_000),
+                notes=_sentence(rng, 8),
+            )
+        )
+    return ClipsList(clips=clips)
+
+
+def synthetic_quotes(transcript: Transcript, count: int, *, seed: int = 0) -> ClipsList:
+    """
+    `count` clips quoting 1-3 consecutive segments of `transcript`, as a model
+    would: each timestamp off by up to 3 s, and a word dropped from the text
+    of one clip in four.
+    """
+    rng = random.Random(seed)
+    clips = []
+    for _ in range(count):
+        first = rng.randrange(len(transcript))
+        last = min(first + rng.randint(0, 2), len(transcript) - 1)
+        words = " ".join(transcript.text(i) for i in range(first, last + 1)).split()
+        if len(words) > 4 and rng.random() < 0.25:
+            del words[rng.randrange(len(words))]
+        start = max(transcript.start_ms[first] + rng.randint(-3_000, 3_000), 0)
+        end = max(transcript.end_ms[last] + rng.randint(-3_000, 3_000), start + 500)
+        clips.append(
+            ClipSelection(
+                start=ms_to_timestamp(start),
+                end=ms_to_timestamp(end),
+                transcript_text=" ".join(words),
+                notes="",
+            )
+        )
+    return ClipsList(clips=clips)
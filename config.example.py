@@ -14,6 +14,17 @@ GOOGLE_MODEL_NAME = "gemini-2.5-flash"
 # gemini-2.5-flash
 # gemini-3-pro-preview
 
+# Model Routing
+# Models are written "provider:model"; providers are "gemini", "openai" and
+# "fake" (deterministic and offline). Stages missing from STAGE_MODELS use
+# DEFAULT_MODEL, e.g. a fast model for the finders and a stronger one for the
+# narrative.
+DEFAULT_MODEL = f"gemini:{GOOGLE_MODEL_NAME}"
+STAGE_MODELS = {
+    # "narrative": "gemini:gemini-3-pro-preview",
+    # "hooks": f"openai:{OPENAI_MODEL_NAME}",
+}
+
 # Input Paths
 # Change to the transcript filename you placed in data/transcripts
 TRANSCRIPT_FILE_NAME = "example_transcript.txt"
@@ -27,13 +38,154 @@ CONTEXT = example_context
 
 
 # Video Settings
-FPS = 24  # Frames per second; adjust to match your footage
+FPS = 24  # Frames per second; adjust to match your footage (NTSC: "24000/1001")
 
 # Media Files (replace these placeholders with your absolute video paths)
 MEDIA_PATHS = [
     "insert here the path to your video file #1.mp4",
     "insert here the path to your video file #2.mp4",
 ]
+# Read each file's real length, frame rate and start timecode with ffprobe
+# (cached until the file changes): clips are converted at the file's own
+# rate, placed at its timecode, and dropped if they run past its end.
+# Files that can't be probed fall back to FPS. Off by default, as it needs
+# ffprobe on the PATH.
+PROBE_MEDIA = False
+MEDIA_PROBE_CACHE_DIR = Path("data/cache/media")
+
+# Pipeline Settings
+MAX_CONCURRENT_STAGES = 4  # How many independent AI stages may run at once
+# Pick the narrative trailer locally from the finders' scored candidates
+# (hook, lesson, 2-3 emotional moments, cliffhanger) instead of asking the
+# model. Off by default: the finders' clips often miss the slot lengths, and
+# then the model is asked anyway.
+OPTIMIZE_NARRATIVE = False
+NARRATIVE_SECONDS = (85, 95)  # Shortest and longest trailer length
+
+# Batch Settings (batch.py)
+BATCH_MAX_EPISODES = 4  # Episodes processed at the same time
+MAX_API_CONCURRENCY = 8  # AI requests in flight across all episodes
+
+# Batch Jobs (--batch)
+# AI requests go out as provider batch jobs (about half the price, results
+# within hours) instead of one by one; for overnight season runs
+BATCH_COLLECT_SECONDS = 10  # Submit once no new request arrived for this long
+BATCH_POLL_SECONDS = 60  # How often running jobs are checked
+BATCH_MAX_REQUESTS = 500  # Most requests per job
+BATCH_JOBS_DIR = Path("data/batch_jobs")  # Job files of the local stand-in
+
+# Request Limits
+# Client-side pacing and retries for every AI request; set a limit to None to
+# disable it. Keep the per-minute limits a little under your provider quota.
+REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 1_000_000  # Estimated prompt tokens
+MAX_REQUEST_ATTEMPTS = 5  # Retries with jittered backoff on 429/5xx/timeouts
+CIRCUIT_BREAKER_FAILURES = 5  # Consecutive failures before failing fast
+CIRCUIT_BREAKER_RESET_SECONDS = 60
+REQUEST_TIMEOUT_SECONDS = 300  # Per request attempt
+# Per-stage overrides of REQUEST_TIMEOUT_SECONDS
+STAGE_TIMEOUT_SECONDS = {"cleanup": 600, "narrative": 600}
+# Stream responses and validate each clip as soon as it is complete, instead
+# of waiting for the whole JSON response; the trailer grounds each clip as it
+# arrives
+STREAM_RESPONSES = False
+# The emotion and cliffhanger prompts start with the same context and
+# transcript. Gemini stores that prefix once as a context cache kept for this
+# many seconds (storage is billed per hour), and the stages only send their
+# instructions after it; OpenAI reuses shared prefixes by itself. None = off.
+CONTEXT_CACHE_TTL_SECONDS = 900
+# Number the transcript segments in the cleanup, emotion and cliffhanger
+# prompts and have the model answer with segment ID ranges instead of copying
+# timestamps and text; the clips are rebuilt from the transcript locally, for
+# a fraction of the output tokens. Off by default: it changes the prompts and
+# responses, so cached and recorded responses no longer match.
+SEGMENT_ID_MODE = False
+
+# Telemetry
+# Every AI request (queue time, time to first token, latency, tokens, cost,
+# cache hit, retries) is appended to a JSONL log per run; set to None to disable
+TELEMETRY_DIR = Path("data/telemetry")
+# Also write Prometheus text-format metrics here, e.g. for the node_exporter
+# textfile collector (None = off)
+PROMETHEUS_PATH = None
+# USD per million (prompt, completion[, cached prompt]) tokens, for cost
+# estimates. Check your provider's current pricing; unlisted models are logged
+# without a cost, and prompt tokens served from a cache cost the prompt price
+# unless a cached price is given.
+MODEL_PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50, 0.03),
+    "gemini-3-pro-preview": (2.00, 12.00, 0.20),
+    "gpt-5.1": (1.25, 10.00, 0.125),
+}
+
+# Long transcripts are split at speaker turns into overlapping windows that are
+# processed in parallel and merged. Set CHUNK_TOKEN_BUDGET = None to always send
+# the whole transcript in one request.
+CHUNK_TOKEN_BUDGET = 50_000  # Approximate tokens of transcript per window
+CHUNK_OVERLAP_TOKENS = 1_500  # Tokens repeated between neighbouring windows
+CHUNK_MAX_WORKERS = 4
+
+# Strip sound tags, filler words, stutters and backchannel turns ("Mm-hmm.")
+# from the transcript before the cleanup call, the most expensive request.
+# PREFILTER_MIN_NOVELTY (0-1) also drops segments that mostly repeat the ones
+# just before (TF-IDF); it can cut into long stories, so it stays None. The
+# prefilter itself is off by default, as the cleanup then picks from a shortened
+# transcript; compare its clips on a few episodes before turning it on.
+PREFILTER_TRANSCRIPT = False
+# Shorter segments are merged into the speaker's previous one, or dropped;
+# short answers at a change of speaker are kept
+PREFILTER_MIN_WORDS = 3
+PREFILTER_MIN_NOVELTY = None
+
+# Response Cache
+# "use" reuses earlier responses for identical requests, "refresh" re-queries
+# and overwrites them, "off" disables the cache entirely
+RESPONSE_CACHE_MODE = "use"
+RESPONSE_CACHE_DIR = Path("data/cache/responses")
+RESPONSE_CACHE_MAX_MB = 500
+RESPONSE_CACHE_MAX_AGE_DAYS = 30
+
+# Check the selected clips against the transcript before building timelines:
+# timestamps are snapped to segment (or, failing that, word) bounds, clips
+# quoting another part of the episode are moved there, and clips whose text
+# isn't in the transcript are dropped
+GROUND_CLIPS = True
+GROUNDING_MIN_TEXT_SCORE = 0.6  # Share of a quote that must be found
+GROUNDING_MAX_SNAP_MS = 1_500  # Farthest a timestamp may move to a segment bound
+
+# Move every cut into the nearest pause of each file in MEDIA_PATHS (each
+# camera in its own audio), so clips don't start or end mid-word or
+# mid-breath. Needs ffmpeg; only the audio around the cuts is decoded, and
+# cached in AUDIO_CACHE_DIR.
+SNAP_CUTS_TO_SILENCE = False
+SILENCE_THRESHOLD_DB = -40  # RMS level (dBFS) below which audio counts as silent
+SILENCE_MIN_MS = 60  # Shortest pause a cut may be moved into
+SILENCE_MAX_SHIFT_MS = 400  # Farthest a cut may move
+AUDIO_CACHE_DIR = Path("data/cache/audio")
+
+# Patch the existing .otio to the new clip list instead of rebuilding it: only
+# added, removed or retimed clips change, and an unchanged timeline isn't
+# rewritten. Reading the old file back takes about as long as a rebuild.
+INCREMENTAL_TIMELINE = False
+# Write compact timelines: the audio tracks are copies of the video tracks
+# (clips named "Clip<n>" on both) and the JSON has no indentation, about a
+# third of the size
+COMPACT_TIMELINE = False
+# Also export the timeline for other NLEs, written in parallel to EXPORT_DIR.
+# Choose from "otio", "fcpxml" (Final Cut Pro X / Resolve), "xml" (FCP 7 /
+# Premiere), "edl" (CMX 3600, one per camera) and "aaf" (Avid). All but "otio"
+# need their OTIO adapter package, e.g. `pip install otio-fcpx-xml-adapter`.
+EXPORT_FORMATS = []
+EXPORT_DIR = Path("data/exports")
+EXPORT_MAX_WORKERS = 4
+# Also render a preview MP4 of the timeline straight from the media of camera
+# RENDER_CAMERA (1 = the first file in MEDIA_PATHS), so the cut can be watched
+# without opening an NLE. Needs ffmpeg. Cut segments are cached, so after a
+# change only the changed clips are cut again.
+RENDER_PREVIEW = False
+RENDER_CAMERA = 1
+RENDER_DIR = Path("data/renders")
+RENDER_MAX_WORKERS = 4  # Segments cut at the same time
 
 # Output Paths
 # Change to the timeline name you want to create
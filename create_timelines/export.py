@@ -0,0 +1,249 @@
+"""
+Export one built timeline to several NLE formats at once.
+
+Each format is written by its OTIO adapter in a separate process, so slow
+pure-Python adapters (FCPXML, AAF) don't queue behind each other. The
+timeline is handed to the workers as OTIO JSON, and that JSON is also what a
+format's output is keyed on: a file whose timeline, adapter and options are
+unchanged since it was last written (and that is itself untouched) is
+skipped, using the same manifest as the pipeline checkpoints.
+
+Only `otio` works out of the box; the other adapters are separate packages:
+
+    pip install otio-fcpx-xml-adapter otio-fcp-adapter otio-cmx3600-adapter \\
+        otio-aaf-adapter
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import functools
+import hashlib
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import opentimelineio as otio
+
+from utils.pipeline import PipelineManifest, hash_inputs
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """
+    A timeline format written by an OTIO adapter:
+    - adapter: OTIO adapter name
+    - suffix: output file extension
+    - package: pip package that provides the adapter (None = built in)
+    - per_camera: the format holds a single camera, so each V/A track pair
+      is written to its own `<name>_V<n><suffix>` file
+    - options: extra keyword arguments for the adapter
+    """
+
+    adapter: str
+    suffix: str
+    package: Optional[str] = None
+    per_camera: bool = False
+    options: Mapping[str, Any] = field(default_factory=dict)
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "otio": ExportFormat("otio_json", ".otio"),
+    # Final Cut Pro X / DaVinci Resolve
+    "fcpxml": ExportFormat("fcpx_xml", ".fcpxml", "otio-fcpx-xml-adapter"),
+    # Final Cut Pro 7 XML, for Premiere Pro
+    "xml": ExportFormat("fcp_xml", ".xml", "otio-fcp-adapter"),
+    # CMX 3600 EDLs carry one video track
+    "edl": ExportFormat("cmx_3600", ".edl", "otio-cmx3600-adapter", per_camera=True),
+    # Avid Media Composer
+    "aaf": ExportFormat("AAF", ".aaf", "otio-aaf-adapter"),
+}
+
+
+@dataclass(frozen=True)
+class _ExportJob:
+    format_name: str
+    path: Path
+    # Indexes of the tracks to keep (None = all)
+    tracks: Optional[Tuple[int, ...]] = None
+
+
+def _export_jobs(
+    timeline: otio.schema.Timeline, formats: Sequence[str], base_path: Path
+) -> List[_ExportJob]:
+    jobs = []
+    for name in formats:
+        export_format = EXPORT_FORMATS[name]
+        if not export_format.per_camera:
+            jobs.append(_ExportJob(name, base_path.with_suffix(export_format.suffix)))
+            continue
+        # A camera is a video track plus the audio tracks up to the next one
+        tracks = list(timeline.tracks)
+        starts = [
+            i for i, t in enumerate(tracks) if t.kind == otio.schema.TrackKind.Video
+        ]
+        for start, end in zip(starts, starts[1:] + [len(tracks)]):
+            path = base_path.with_name(
+                f"{base_path.stem}_{tracks[start].name}{export_format.suffix}"
+            )
+            jobs.append(_ExportJob(name, path, tuple(range(start, end))))
+    return jobs
+
+
+def _write_export(
+    timeline: Union[otio.schema.Timeline, str],
+    adapter: str,
+    path: str,
+    tracks: Optional[Tuple[int, ...]],
+    options: Mapping[str, Any],
+) -> float:
+    """
+    Write one output; returns the serialization time. Worker processes get
+    the timeline as OTIO JSON.
+    """
+    if isinstance(timeline, str):
+        timeline = otio.adapters.read_from_string(timeline, "otio_json")
+    if tracks is not None:
+        subset = otio.schema.Timeline(
+            name=timeline.name, global_start_time=timeline.global_start_time
+        )
+        subset.tracks.extend(timeline.tracks[i].deepcopy() for i in tracks)
+        timeline = subset
+
+    started = time.perf_counter()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    otio.adapters.write_to_file(timeline, path, adapter_name=adapter, **options)
+    return time.perf_counter() - started
+
+
+def _adapter_error(export_format: ExportFormat) -> Optional[str]:
+    try:
+        otio.adapters.from_name(export_format.adapter)
+    except otio.exceptions.NotSupportedError:
+        return f"adapter {export_format.adapter!r} not installed" + (
+            f" (pip install {export_format.package})" if export_format.package else ""
+        )
+    return None
+
+
+def export_timeline(
+    timeline: otio.schema.Timeline,
+    formats: Sequence[str],
+    base_path: Path,
+    logger: logging.Logger,
+    max_workers: int = 4,
+) -> List[Dict[str, Any]]:
+    """
+    Write `timeline` in each of `formats` next to `base_path` (its suffix is
+    replaced by the format's), on up to `max_workers` processes (at most one
+    per CPU). What was written is kept in `<base_path stem>_exports.json`.
+
+    Returns one status entry per output file: status "written", "current"
+    (skipped, already up to date), "unavailable" (adapter not installed) or
+    "failed", with the serialization time and file size.
+    """
+    # A format listed twice would write the same files from two processes
+    formats = list(dict.fromkeys(formats))
+    unknown = sorted(set(formats) - set(EXPORT_FORMATS))
+    if unknown:
+        raise ValueError(
+            f"Unknown export formats {unknown}; expected some of "
+            f"{sorted(EXPORT_FORMATS)}"
+        )
+
+    manifest = PipelineManifest(
+        base_path.with_name(f"{base_path.stem}_exports.json")
+    )
+    max_workers = min(max_workers, os.cpu_count() or 1)
+    timeline_json = otio.adapters.write_to_string(timeline, "otio_json", indent=0)
+    timeline_hash = hashlib.sha256(timeline_json.encode("utf-8")).hexdigest()
+
+    report: List[Dict[str, Any]] = []
+    pending = []
+    for job in _export_jobs(timeline, formats, base_path):
+        export_format = EXPORT_FORMATS[job.format_name]
+        status: Dict[str, Any] = {"format": job.format_name, "path": str(job.path)}
+        report.append(status)
+
+        error = _adapter_error(export_format)
+        if error is not None:
+            status.update(status="unavailable", error=error)
+            continue
+
+        input_hash = hash_inputs(
+            {
+                "timeline": timeline_hash,
+                "adapter": export_format.adapter,
+                "options": dict(export_format.options),
+                "tracks": job.tracks,
+            }
+        )
+        entry_name = f"export:{job.path.name}"
+        if manifest.is_valid(entry_name, input_hash, job.path):
+            status.update(status="current", bytes=job.path.stat().st_size)
+            continue
+        pending.append((job, export_format, entry_name, input_hash, status))
+
+    # Outputs are written in worker processes, except a single one. Workers
+    # are spawned, not forked: the caller may be running threads (the stage
+    # DAG, request timeouts) whose locks a fork would copy mid-use.
+    parallel = len(pending) > 1 and max_workers > 1
+    pool = (
+        ProcessPoolExecutor(
+            min(max_workers, len(pending)),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        if parallel
+        else None
+    )
+    try:
+        results = []
+        for job, export_format, _, _, _ in pending:
+            args = (
+                export_format.adapter,
+                str(job.path),
+                job.tracks,
+                dict(export_format.options),
+            )
+            if pool is not None:
+                results.append(pool.submit(_write_export, timeline_json, *args).result)
+            else:
+                results.append(functools.partial(_write_export, timeline, *args))
+
+        for (job, _, entry_name, input_hash, status), result in zip(pending, results):
+            try:
+                seconds = result()
+            except Exception as exc:
+                logger.warning(f"Export to {job.path} failed: {exc}")
+                status.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+                continue
+            manifest.record(entry_name, input_hash, job.path)
+            status.update(
+                status="written",
+                seconds=round(seconds, 3),
+                bytes=job.path.stat().st_size,
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    log_export_report(report, logger)
+    return report
+
+
+def log_export_report(report: List[Dict[str, Any]], logger: logging.Logger) -> None:
+    """Log a one-line-per-file export table."""
+    if not report:
+        return
+    width = max(len(Path(r["path"]).name) for r in report)
+    lines = [f"{'file':<{width}}  {'status':<11}  seconds        bytes  detail"]
+    for r in report:
+        seconds = "-" if r.get("seconds") is None else f"{r['seconds']:.3f}"
+        size = "-" if r.get("bytes") is None else f"{r['bytes']:,}"
+        lines.append(
+            f"{Path(r['path']).name:<{width}}  {r['status']:<11}  {seconds:>7}  "
+            f"{size:>11}  {r.get('error', '')}"
+        )
+    logger.info("Timeline export:\n" + "\n".join(lines))
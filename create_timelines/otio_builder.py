@@ -4,12 +4,32 @@ Generate a timeline where:
 - For each source media, you provide a list of clip in/out times.
 - The script creates 1 video track + 1 audio track per source media.
 - It then adds all the specified clips for that media to those tracks.
+
+`update_timeline` patches a previously built timeline to new clip lists
+instead, touching only the clips that changed.
+
+Media probed with `utils.media_probe` (`SourceMedia.media`) get their real
+available range: the file's length, starting at its start timecode. Clips
+are offset by that timecode, and clips outside the file are dropped with a
+warning instead of pointing the NLE at footage that doesn't exist. Without
+probe results the available range just spans the clips.
+
+In compact mode the audio track mirrors the video track: the clips at the
+same position share their name ("Clip<n>"), source range and media
+reference, there is no per-clip metadata (the V/A link is the position),
+and the timeline is written without indentation. OTIO JSON has no way to
+refer to a shared object, so the media reference is still written out once
+per clip.
 """
 
+from dataclasses import dataclass
+import difflib
+import logging
+from pathlib import Path
 import opentimelineio as otio
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from models.data_models import ClipSpec, SourceMedia
+from models.data_models import ClipSpec, MediaInfo, SourceMedia
 
 
 # ----------------------------------------------------------------------
@@ -28,14 +48,64 @@ from models.data_models import ClipSpec, SourceMedia
 # ----------------------------------------------------------------------
 
 
+@dataclass
+class TimelineDiff:
+    """What `update_timeline` changed, counted per clip on the video tracks."""
+
+    added: int = 0
+    removed: int = 0
+    retimed: int = 0
+    renamed: int = 0
+    # Kept clips whose media reference changed (replaced or re-probed file)
+    relinked: int = 0
+    tracks_rebuilt: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return any(
+            (
+                self.added,
+                self.removed,
+                self.retimed,
+                self.renamed,
+                self.relinked,
+                self.tracks_rebuilt,
+            )
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"{self.added} added, {self.removed} removed, {self.retimed} retimed, "
+            f"{self.renamed} renamed, {self.relinked} relinked, "
+            f"{self.tracks_rebuilt} track pairs rebuilt"
+        )
+
+
+def _clip_key(clip: otio.schema.Clip) -> Tuple[float, float]:
+    source_range = clip.source_range
+    return (source_range.start_time.value, source_range.duration.value)
+
+
+# Indentation of written .otio files; compact timelines use none
+OTIO_INDENT = 4
+COMPACT_OTIO_INDENT = 0
+
+
 class PerMediaTimelineBuilder:
-    def __init__(self, timeline_name: str = "Per-media A/V tracks with clip lists"):
+    def __init__(
+        self,
+        timeline_name: str = "Per-media A/V tracks with clip lists",
+        compact: bool = False,
+        logger: Optional[logging.Logger] = None,
+    ):
         self.timeline_name = timeline_name
+        self.compact = compact
+        self.logger = logger or logging.getLogger(__name__)
 
     def build_available_range_from_clips(
         self,
         clips: List[ClipSpec],
-        rate: int,
+        rate: float,
     ) -> Optional[otio.opentime.TimeRange]:
         """
         Derive an available_range that covers all specified clips for a media.
@@ -57,74 +127,364 @@ class PerMediaTimelineBuilder:
             duration=otio.opentime.RationalTime(max_end - min_start, rate),
         )
 
-    def build_timeline(
-        self, source_media_list: List[SourceMedia]
-    ) -> otio.schema.Timeline:
-        tl = otio.schema.Timeline(name=self.timeline_name)
+    @staticmethod
+    def build_available_range_from_media(
+        media: MediaInfo, rate: float
+    ) -> otio.opentime.TimeRange:
+        """The whole file: its length, starting at its start timecode."""
+        return otio.opentime.TimeRange(
+            start_time=otio.opentime.RationalTime(media.start_frame(rate), rate),
+            duration=otio.opentime.RationalTime(media.duration_frames(rate), rate),
+        )
 
-        # For each source media, create one video track + one audio track
-        for media_index, media_spec in enumerate(source_media_list, start=1):
-            file_path = media_spec.file_path
-            rate = media_spec.rate
-            clip_specs = media_spec.clips
-
-            # Create one V + one A track for this media
-            v_track = otio.schema.Track(
-                name=f"V{media_index}",
-                kind=otio.schema.TrackKind.Video,
+    def _available_range(
+        self, media_spec: SourceMedia
+    ) -> Optional[otio.opentime.TimeRange]:
+        if media_spec.media is not None:
+            return self.build_available_range_from_media(
+                media_spec.media, media_spec.rate
             )
+        return self.build_available_range_from_clips(media_spec.clips, media_spec.rate)
+
+    def _fit_to_media(self, media_index: int, media_spec: SourceMedia) -> SourceMedia:
+        """
+        Clips in the probed file's own frame numbers, without those that
+        reach outside it; unchanged when the media wasn't probed.
+        """
+        media = media_spec.media
+        if media is None:
+            return media_spec
+        offset = media.start_frame(media_spec.rate)
+        length = media.duration_frames(media_spec.rate)
+        clips = []
+        for clip_index, clip in enumerate(media_spec.clips, start=1):
+            if clip.start < 0 or clip.start + clip.duration > length:
+                self.logger.warning(
+                    f"Dropped clip {clip_index} of media {media_index}: frames "
+                    f"{clip.start}-{clip.start + clip.duration} are outside "
+                    f"{media_spec.file_path} ({length} frames)"
+                )
+                continue
+            clips.append(clip.model_copy(update={"start": clip.start + offset}))
+        return media_spec.model_copy(update={"clips": clips})
+
+    @staticmethod
+    def _source_range(clip_def: ClipSpec, rate: float) -> otio.opentime.TimeRange:
+        return otio.opentime.TimeRange(
+            start_time=otio.opentime.RationalTime(clip_def.start, rate),
+            duration=otio.opentime.RationalTime(clip_def.duration, rate),
+        )
+
+    def _clip_name(self, role: str, media_index: int, clip_index: int) -> str:
+        if self.compact:
+            return f"Clip{clip_index}"
+        return f"{role[0].upper()}{media_index}_Clip{clip_index}"
+
+    def _label_clip(
+        self, clip: otio.schema.Clip, role: str, media_index: int, clip_index: int
+    ) -> bool:
+        """Set the name and link group of a clip; True if they changed."""
+        name = self._clip_name(role, media_index, clip_index)
+        if self.compact:
+            if clip.name == name:
+                return False
+            clip.name = name
+            return True
+        # Shared id to logically link V + A for this segment
+        link_group_id = f"media{media_index}_clip{clip_index}"
+        if clip.name == name and clip.metadata.get("linked_group") == link_group_id:
+            return False
+        clip.name = name
+        clip.metadata["linked_group"] = link_group_id
+        clip.metadata["role"] = role
+        return True
+
+    def _build_clip(
+        self,
+        role: str,
+        media_index: int,
+        clip_index: int,
+        clip_def: ClipSpec,
+        rate: float,
+        media_ref: otio.schema.ExternalReference,
+    ) -> otio.schema.Clip:
+        clip = otio.schema.Clip(
+            media_reference=media_ref,
+            source_range=self._source_range(clip_def, rate),
+        )
+        self._label_clip(clip, role, media_index, clip_index)
+        return clip
+
+    def _build_tracks(
+        self, media_index: int, media_spec: SourceMedia
+    ) -> Tuple[otio.schema.Track, otio.schema.Track]:
+        """One video + one audio track holding all clips of a media."""
+        media_spec = self._fit_to_media(media_index, media_spec)
+        rate = media_spec.rate
+        clip_specs = media_spec.clips
+
+        # Create one V + one A track for this media
+        v_track = otio.schema.Track(
+            name=f"V{media_index}",
+            kind=otio.schema.TrackKind.Video,
+        )
+
+        # The probed file's range, or else one that covers all requested clips
+        available_range = self._available_range(media_spec)
+
+        # Shared media reference for all clips on these tracks
+        media_ref = otio.schema.ExternalReference(
+            target_url=media_spec.file_path,
+            available_range=available_range,
+        )
+
+        if self.compact:
+            video_clips = [
+                otio.schema.Clip(
+                    name=f"Clip{clip_index}",
+                    media_reference=media_ref,
+                    source_range=self._source_range(clip_def, rate),
+                )
+                for clip_index, clip_def in enumerate(clip_specs, start=1)
+            ]
+            v_track.extend(video_clips)
+            # The audio track is a structural copy of the video track. Mirroring
+            # the clips is cheaper than Track.deepcopy(), which also copies
+            # every media reference.
             a_track = otio.schema.Track(
                 name=f"A{media_index}",
                 kind=otio.schema.TrackKind.Audio,
             )
+            a_track.extend(
+                otio.schema.Clip(
+                    name=clip.name,
+                    media_reference=media_ref,
+                    source_range=clip.source_range,
+                )
+                for clip in video_clips
+            )
+            return v_track, a_track
 
+        # ------------------------------------------------------------------
+        # For each clip spec, create video + audio clip with same source_range
+        # ------------------------------------------------------------------
+        a_track = otio.schema.Track(
+            name=f"A{media_index}",
+            kind=otio.schema.TrackKind.Audio,
+        )
+        for clip_index, clip_def in enumerate(clip_specs, start=1):
+            # Append clips sequentially on their respective tracks
+            v_track.append(
+                self._build_clip(
+                    "video", media_index, clip_index, clip_def, rate, media_ref
+                )
+            )
+            a_track.append(
+                self._build_clip(
+                    "audio", media_index, clip_index, clip_def, rate, media_ref
+                )
+            )
+
+        return v_track, a_track
+
+    def build_timeline(
+        self, source_media_list: List[SourceMedia]
+    ) -> otio.schema.Timeline:
+        tl = otio.schema.Timeline(name=self.timeline_name)
+
+        # For each source media, create one video track + one audio track
+        for media_index, media_spec in enumerate(source_media_list, start=1):
             # Append tracks to the timeline's track stack in the order you want
-            tl.tracks.append(v_track)
-            tl.tracks.append(a_track)
+            tl.tracks.extend(self._build_tracks(media_index, media_spec))
 
-            # Derive an available_range that covers all requested clips
-            available_range = self.build_available_range_from_clips(clip_specs, rate)
+        return tl
+
+    def _matches_media(
+        self,
+        v_track: otio.schema.Track,
+        a_track: otio.schema.Track,
+        media_index: int,
+        media_spec: SourceMedia,
+    ) -> bool:
+        """Whether a track pair looks built by this builder for this media."""
+        if (v_track.name, a_track.name) != (f"V{media_index}", f"A{media_index}"):
+            return False
+        if len(v_track) != len(a_track):
+            return False
+        if not len(v_track):
+            return True
+        # Checking the first clip is enough for tracks this builder made
+        first = v_track[0]
+        return (
+            isinstance(first, otio.schema.Clip)
+            and first.name == self._clip_name("video", media_index, 1)
+            and getattr(first.media_reference, "target_url", None)
+            == media_spec.file_path
+            and first.source_range.start_time.rate == media_spec.rate
+        )
+
+    def _patch_tracks(
+        self,
+        v_track: otio.schema.Track,
+        a_track: otio.schema.Track,
+        media_index: int,
+        media_spec: SourceMedia,
+        diff: TimelineDiff,
+    ) -> None:
+        media_spec = self._fit_to_media(media_index, media_spec)
+        rate = media_spec.rate
+        # A replaced media file changes the reference even if no clip does
+        available_range = self._available_range(media_spec)
+        for track in (v_track, a_track):
+            for clip in track:
+                reference = clip.media_reference
+                if (reference.target_url, reference.available_range) == (
+                    media_spec.file_path,
+                    available_range,
+                ):
+                    continue
+                reference.target_url = media_spec.file_path
+                reference.available_range = available_range
+                diff.relinked += track is v_track
+
+        old_keys = [_clip_key(clip) for clip in v_track]
+        new_keys = [(float(c.start), float(c.duration)) for c in media_spec.clips]
+        if old_keys == new_keys:
+            return
 
-            # Shared media reference for all clips on these tracks
+        if len(v_track):
+            media_ref = v_track[0].media_reference
+        else:
             media_ref = otio.schema.ExternalReference(
-                target_url=file_path,
-                available_range=available_range,
+                target_url=media_spec.file_path, available_range=available_range
             )
 
-            # ------------------------------------------------------------------
-            # For each clip spec, create video + audio clip with same source_range
-            # ------------------------------------------------------------------
-            for clip_index, clip_def in enumerate(clip_specs, start=1):
-                source_range = otio.opentime.TimeRange(
-                    start_time=otio.opentime.RationalTime(clip_def.start, rate),
-                    duration=otio.opentime.RationalTime(clip_def.duration, rate),
+        # Apply the edits back to front so earlier indexes stay valid
+        matcher = difflib.SequenceMatcher(a=old_keys, b=new_keys, autojunk=False)
+        first_shift = None
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                continue
+            # Retime clips in place where one clip replaces another, so their
+            # metadata and any edits made in the NLE are kept
+            paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+            for offset in range(paired):
+                source_range = self._source_range(media_spec.clips[j1 + offset], rate)
+                v_track[i1 + offset].source_range = source_range
+                a_track[i1 + offset].source_range = source_range
+            diff.retimed += paired
+            for index in range(i2 - 1, i1 + paired - 1, -1):
+                del v_track[index]
+                del a_track[index]
+            diff.removed += max(i2 - i1 - paired, 0)
+            for j in range(j1 + paired, j2):
+                at = i1 + (j - j1)
+                for track, role in ((v_track, "video"), (a_track, "audio")):
+                    track.insert(
+                        at,
+                        self._build_clip(
+                            role,
+                            media_index,
+                            j + 1,
+                            media_spec.clips[j],
+                            rate,
+                            media_ref,
+                        ),
+                    )
+            diff.added += max(j2 - j1 - paired, 0)
+            if i2 - i1 != j2 - j1:
+                first_shift = j1 + paired
+
+        # Clips after an insert or removal move to a new position
+        if first_shift is not None:
+            for clip_index in range(first_shift, len(v_track)):
+                renamed = self._label_clip(
+                    v_track[clip_index], "video", media_index, clip_index + 1
                 )
+                renamed |= self._label_clip(
+                    a_track[clip_index], "audio", media_index, clip_index + 1
+                )
+                diff.renamed += renamed
 
-                # Shared id to logically link V + A for this segment
-                link_group_id = f"media{media_index}_clip{clip_index}"
+    def update_timeline(
+        self,
+        timeline: otio.schema.Timeline,
+        source_media_list: List[SourceMedia],
+    ) -> TimelineDiff:
+        """
+        Patch a timeline built by `build_timeline` to new clip lists, in place.
 
-                video_clip = otio.schema.Clip(
-                    name=f"V{media_index}_Clip{clip_index}",
-                    media_reference=media_ref,
-                    source_range=source_range,
-                    metadata={
-                        "linked_group": link_group_id,
-                        "role": "video",
-                    },
+        Each media's clips are diffed against its video track: unchanged clips
+        are left alone, a clip whose range changed is retimed, and only inserted
+        or deleted clips are created or removed. Track pairs that don't match
+        their media (other file, rate or layout) are rebuilt. The result equals
+        a fresh `build_timeline` apart from what was edited on kept clips.
+        """
+        diff = TimelineDiff()
+        tracks = timeline.tracks
+        for media_index, media_spec in enumerate(source_media_list, start=1):
+            v_at, a_at = 2 * media_index - 2, 2 * media_index - 1
+            if a_at < len(tracks) and self._matches_media(
+                tracks[v_at], tracks[a_at], media_index, media_spec
+            ):
+                self._patch_tracks(
+                    tracks[v_at], tracks[a_at], media_index, media_spec, diff
                 )
+                continue
+            v_track, a_track = self._build_tracks(media_index, media_spec)
+            if a_at < len(tracks):
+                tracks[v_at], tracks[a_at] = v_track, a_track
+            else:
+                del tracks[v_at:]
+                tracks.extend([v_track, a_track])
+            diff.tracks_rebuilt += 1
 
-                audio_clip = otio.schema.Clip(
-                    name=f"A{media_index}_Clip{clip_index}",
-                    media_reference=media_ref,
-                    source_range=source_range,
-                    metadata={
-                        "linked_group": link_group_id,
-                        "role": "audio",
-                    },
-                )
+        # Media removed from the list
+        extra = len(tracks) - 2 * len(source_media_list)
+        if extra > 0:
+            del tracks[2 * len(source_media_list) :]
+            diff.tracks_rebuilt += (extra + 1) // 2
+        return diff
 
-                # Append clips sequentially on their respective tracks
-                v_track.append(video_clip)
-                a_track.append(audio_clip)
 
-        return tl
+def write_timeline(
+    source_media_list: List[SourceMedia],
+    path: Path,
+    logger: logging.Logger,
+    incremental: bool = False,
+    compact: bool = False,
+) -> otio.schema.Timeline:
+    """
+    Build the timeline and write it to `path`.
+
+    With `incremental=True` a timeline already at `path` is patched with
+    `update_timeline` instead of rebuilt, which keeps whatever was added to
+    unchanged clips, and the file is left untouched when nothing changed.
+    `compact=True` builds and writes a compact timeline.
+    """
+    builder = PerMediaTimelineBuilder(compact=compact, logger=logger)
+    timeline = None
+    if incremental and path.exists():
+        try:
+            timeline = otio.adapters.read_from_file(str(path))
+        except Exception as exc:
+            logger.warning(f"Could not read {path} ({exc}); rebuilding it")
+        if not isinstance(timeline, otio.schema.Timeline):
+            timeline = None
+
+    if timeline is None:
+        logger.info("Building OTIO timeline")
+        timeline = builder.build_timeline(source_media_list)
+    else:
+        diff = builder.update_timeline(timeline, source_media_list)
+        logger.info(f"Updated OTIO timeline: {diff}")
+        if not diff.changed:
+            logger.info(f"Timeline {path} is up to date")
+            return timeline
+
+    logger.info(f"Writing timeline to {path}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    otio.adapters.write_to_file(
+        timeline, str(path), indent=COMPACT_OTIO_INDENT if compact else OTIO_INDENT
+    )
+    return timeline
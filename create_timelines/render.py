@@ -0,0 +1,350 @@
+"""
+Render a preview MP4 of a cut list straight from the source media.
+
+Each clip is cut out of its source file by ffmpeg in a worker process:
+
+- When every clip starts on a keyframe, the video of all segments is
+  stream-copied (no quality loss, about as fast as reading the file);
+  otherwise all of them are re-encoded with x264. Copied and encoded
+  segments have different streams, so mixing them would only make the join
+  encode everything again. A copy that ffmpeg refuses (e.g. a codec MP4
+  can't hold) switches the render to encoding. Audio is always encoded to
+  AAC, which is cheap.
+- Segments are cached under `<cache_dir>`, keyed by the source file
+  version (path, size, mtime), the frame range, copy or encode, and the
+  encoding settings. Re-rendering after one clip changed only cuts that
+  clip again.
+- The segments are joined with ffmpeg's concat demuxer: stream-copied when
+  they all have the same stream parameters (segments copied from cameras
+  with different codecs don't), re-encoded otherwise.
+
+Clips come from a built timeline (one camera's video track,
+`segments_from_timeline`) or from `SourceMedia` clip specs
+(`segments_from_source_media`).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from fractions import Fraction
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import opentimelineio as otio
+
+from models.data_models import MediaInfo, SourceMedia
+from utils.media_probe import media_cache_key
+from utils.timecode import parse_frame_rate
+
+# Re-encoded segments; part of the segment cache key
+ENCODE_VIDEO = ("-c:v", "libx264", "-preset", "veryfast", "-crf", "20")
+ENCODE_AUDIO = ("-c:a", "aac", "-b:a", "192k", "-ar", "48000")
+ENCODE_PIXEL_FORMAT = ("-pix_fmt", "yuv420p")
+
+# Stream fields that must match for segments to be joined without encoding
+_CONCAT_FIELDS = (
+    "codec_type",
+    "codec_name",
+    "profile",
+    "width",
+    "height",
+    "pix_fmt",
+    "sample_rate",
+    "channels",
+)
+
+
+class RenderSegment(NamedTuple):
+    """One clip to cut: `duration` frames from `start_frame` at `rate`."""
+
+    media_path: str
+    start_frame: int
+    duration: int
+    rate: float
+
+
+def segments_from_source_media(source_media: SourceMedia) -> List[RenderSegment]:
+    """
+    The clip specs of one media, in order; clips outside the probed file
+    are left out, as the timeline builder does.
+    """
+    rate = source_media.rate
+    length = (
+        source_media.media.duration_frames(rate)
+        if source_media.media is not None
+        else None
+    )
+    return [
+        RenderSegment(source_media.file_path, clip.start, clip.duration, rate)
+        for clip in source_media.clips
+        if length is None or (clip.start >= 0 and clip.start + clip.duration <= length)
+    ]
+
+
+def segments_from_timeline(
+    timeline: otio.schema.Timeline,
+    camera: int = 1,
+    media: Optional[Mapping[str, MediaInfo]] = None,
+) -> List[RenderSegment]:
+    """
+    The clips on the video track of camera `camera` (1 = "V1"), in order.
+    Clips of files in `media` were placed at the file's start timecode by
+    the builder, so that is subtracted again.
+    """
+    tracks = [t for t in timeline.tracks if t.kind == otio.schema.TrackKind.Video]
+    if not 1 <= camera <= len(tracks):
+        raise ValueError(
+            f"Timeline {timeline.name!r} has {len(tracks)} cameras, not {camera}"
+        )
+    segments = []
+    for clip in tracks[camera - 1].find_clips():
+        path = clip.media_reference.target_url
+        source_range = clip.source_range
+        rate = source_range.start_time.rate
+        info = (media or {}).get(path)
+        offset = info.start_frame(rate) if info is not None else 0
+        segments.append(
+            RenderSegment(
+                path,
+                round(source_range.start_time.value) - offset,
+                round(source_range.duration.value),
+                rate,
+            )
+        )
+    return segments
+
+
+def _seconds(frames: int, rate: float) -> str:
+    return f"{float(Fraction(frames) / parse_frame_rate(rate)):.6f}"
+
+
+def _run(command: List[str]) -> subprocess.CompletedProcess:
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"{Path(command[0]).name} failed: {result.stderr.strip()[-500:]}"
+        )
+    return result
+
+
+def _starts_on_keyframe(ffprobe: str, segment: RenderSegment) -> bool:
+    """Whether a video keyframe lies within half a frame of the clip start."""
+    start = float(_seconds(segment.start_frame, segment.rate))
+    half_frame = 0.5 / segment.rate
+    output = _run(
+        [
+            ffprobe,
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-skip_frame",
+            "nokey",
+            "-show_entries",
+            "frame=best_effort_timestamp_time",
+            "-of",
+            "csv=p=0",
+            "-read_intervals",
+            f"{max(start - 10, 0):.6f}%{start + 1:.6f}",
+            segment.media_path,
+        ]
+    ).stdout
+    return any(
+        abs(float(line) - start) <= half_frame
+        for line in output.split()
+        if line.strip() not in ("", "N/A")
+    )
+
+
+def _render_segment(
+    segment: RenderSegment, path: str, copy: bool, ffmpeg: str
+) -> float:
+    """Cut one segment to `path`, stream-copying or encoding its video."""
+    started = time.perf_counter()
+    cut = [
+        ffmpeg,
+        "-nostdin",
+        "-v",
+        "error",
+        "-y",
+        "-ss",
+        _seconds(segment.start_frame, segment.rate),
+        "-i",
+        segment.media_path,
+        "-t",
+        _seconds(segment.duration, segment.rate),
+        "-map",
+        "0:v:0",
+        "-map",
+        "0:a:0?",
+    ]
+    tmp = f"{path}.{os.getpid()}.tmp.mp4"
+    video = (
+        ["-c:v", "copy", "-avoid_negative_ts", "make_zero"]
+        if copy
+        else [*ENCODE_VIDEO, *ENCODE_PIXEL_FORMAT]
+    )
+    _run(cut + [*video, *ENCODE_AUDIO, tmp])
+    os.replace(tmp, path)
+    return time.perf_counter() - started
+
+
+def _map(fn: Callable[..., Any], calls: List[tuple], max_workers: int) -> List[Any]:
+    """`fn(*args)` for each of `calls`, on up to `max_workers` processes."""
+    max_workers = min(max_workers, os.cpu_count() or 1, len(calls))
+    if max_workers <= 1:
+        return [fn(*args) for args in calls]
+    # Spawned, not forked: a fork would copy locks held by pipeline threads
+    spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers, mp_context=spawn) as pool:
+        futures = [pool.submit(fn, *args) for args in calls]
+        return [future.result() for future in futures]
+
+
+def _stream_signature(ffprobe: str, path: Path) -> str:
+    output = _run(
+        [ffprobe, "-v", "error", "-print_format", "json", "-show_streams", str(path)]
+    ).stdout
+    streams = json.loads(output).get("streams", [])
+    return json.dumps(
+        [{k: s.get(k) for k in _CONCAT_FIELDS} for s in streams], sort_keys=True
+    )
+
+
+@dataclass
+class RenderReport:
+    """What `render_preview` did."""
+
+    output_path: Path
+    segments: int
+    unique: int
+    cached: int
+    copied: int
+    encoded: int
+    concat: str
+    seconds: float
+
+    def log(self, logger: logging.Logger) -> None:
+        logger.info(
+            f"Rendered {self.output_path} from {self.segments} clips "
+            f"({self.unique} distinct segments: {self.cached} cached, "
+            f"{self.copied} stream-copied, {self.encoded} re-encoded; joined by "
+            f"{self.concat}) in {self.seconds:.1f}s"
+        )
+
+
+def render_preview(
+    segments: List[RenderSegment],
+    output_path: Path,
+    cache_dir: Path,
+    logger: logging.Logger,
+    max_workers: int = 4,
+    ffmpeg: str = "ffmpeg",
+    ffprobe: str = "ffprobe",
+) -> Optional[RenderReport]:
+    """
+    Cut `segments` from their media on up to `max_workers` processes (at
+    most one per CPU) and join them, in order, into `output_path`.
+    """
+    if not segments:
+        logger.warning(f"Nothing to render to {output_path}: the cut has no clips")
+        return None
+    started = time.perf_counter()
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    settings = [*ENCODE_VIDEO, *ENCODE_AUDIO, *ENCODE_PIXEL_FORMAT]
+
+    versions: Dict[str, str] = {}
+    keys = []
+    for segment in segments:
+        if segment.media_path not in versions:
+            versions[segment.media_path] = media_cache_key(Path(segment.media_path))
+        version = versions[segment.media_path]
+        keys.append(json.dumps([version, *segment[1:], settings], default=str))
+    # A clip used twice is cut once
+    unique = list(dict(zip(keys, segments)).values())
+
+    def segment_paths(copy: bool) -> List[Path]:
+        mode = "copy" if copy else "encode"
+        digests = (
+            hashlib.sha256(f"{mode} {key}".encode("utf-8")).hexdigest() for key in keys
+        )
+        return [cache_dir / f"{digest[:20]}.mp4" for digest in digests]
+
+    def cut_all(copy: bool) -> Tuple[List[Path], int, int]:
+        """Paths of all segments, how many were cached and how many were cut."""
+        paths = segment_paths(copy)
+        pending = {
+            path: segment
+            for path, segment in zip(paths, segments)
+            if not path.exists()
+        }
+        _map(
+            _render_segment,
+            [(segment, str(path), copy, ffmpeg) for path, segment in pending.items()],
+            max_workers,
+        )
+        return paths, len(set(paths)) - len(pending), len(pending)
+
+    # Cut every segment the same way, so that the join can copy them
+    if all(path.exists() for path in segment_paths(True)):
+        copy = True
+    elif all(path.exists() for path in segment_paths(False)):
+        copy = False
+    else:
+        calls = [(ffprobe, segment) for segment in unique]
+        copy = all(_map(_starts_on_keyframe, calls, max_workers))
+    try:
+        paths, cached, cut = cut_all(copy)
+    except RuntimeError as exc:
+        if not copy:
+            raise
+        # A codec MP4 can't hold, or similar
+        logger.warning(f"Stream copy failed, re-encoding all segments: {exc}")
+        copy = False
+        paths, cached, cut = cut_all(copy)
+
+    # Join without encoding only if every segment has the same streams
+    signatures = {_stream_signature(ffprobe, path) for path in set(paths)}
+    concat = "stream copy" if len(signatures) == 1 else "re-encoding"
+    codec = (
+        ["-c", "copy"]
+        if len(signatures) == 1
+        else [*ENCODE_VIDEO, *ENCODE_PIXEL_FORMAT, *ENCODE_AUDIO]
+    )
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, list_path = tempfile.mkstemp(suffix=".txt", dir=cache_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        for path in paths:
+            quoted = path.resolve().as_posix().replace("'", "'\\''")
+            f.write(f"file '{quoted}'\n")
+    tmp = output_path.with_name(f"{output_path.stem}.tmp{output_path.suffix}")
+    try:
+        _run(
+            [ffmpeg, "-nostdin", "-v", "error", "-y", "-f", "concat", "-safe", "0"]
+            + ["-i", list_path, *codec, "-movflags", "+faststart", str(tmp)]
+        )
+        os.replace(tmp, output_path)
+    finally:
+        os.unlink(list_path)
+
+    report = RenderReport(
+        output_path=output_path,
+        segments=len(segments),
+        unique=len(unique),
+        cached=cached,
+        copied=cut if copy else 0,
+        encoded=0 if copy else cut,
+        concat=concat,
+        seconds=time.perf_counter() - started,
+    )
+    report.log(logger)
+    return report
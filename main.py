@@ -4,6 +4,10 @@ Long-to-Short Clip Extraction Workflow
 This script analyzes a podcast transcript and uses AI to extract interesting clips
 for creating a short-form intro video. It converts timestamp-based clips to frame
 ranges and builds an OTIO timeline.
+
+Both stages are checkpointed under `data/processing/`, so a re-run after a
+failed timeline write reuses the clip selection instead of calling the AI again.
+Use `--from-stage` / `--only-stage` to force a stage to run.
 """
 
 # ----------------------------------------------------------------------
@@ -11,30 +15,83 @@ ranges and builds an OTIO timeline.
 # ----------------------------------------------------------------------
 
 # Standard library
-import os
+import argparse
 import logging
+from typing import List, Optional
 
 # Third-party
 from dotenv import load_dotenv
-from openai import OpenAI
 import opentimelineio as otio
-from google import genai
-from google.genai import types
 
 # Local imports
 from ai_prompts.prompts import ORCHESTRATOR_PROMPT
 from config import (
     AI_CLIPS_PATH,
+    AUDIO_CACHE_DIR,
+    CHUNK_MAX_WORKERS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_TOKEN_BUDGET,
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_SECONDS,
+    COMPACT_TIMELINE,
     CONTEXT,
+    DEFAULT_MODEL,
+    EXPORT_DIR,
+    EXPORT_FORMATS,
+    EXPORT_MAX_WORKERS,
     FPS,
-    GOOGLE_MODEL_NAME,
+    GROUND_CLIPS,
+    GROUNDING_MAX_SNAP_MS,
+    GROUNDING_MIN_TEXT_SCORE,
+    INCREMENTAL_TIMELINE,
+    MAX_API_CONCURRENCY,
+    MAX_REQUEST_ATTEMPTS,
+    MODEL_PRICES,
     MEDIA_PATHS,
-    OPENAI_MODEL_NAME,
+    MEDIA_PROBE_CACHE_DIR,
     OUTPUT_OTIO_PATH,
+    PROBE_MEDIA,
+    PROMETHEUS_PATH,
+    RENDER_CAMERA,
+    RENDER_DIR,
+    RENDER_MAX_WORKERS,
+    RENDER_PREVIEW,
+    REQUEST_TIMEOUT_SECONDS,
+    REQUESTS_PER_MINUTE,
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_MAX_AGE_DAYS,
+    RESPONSE_CACHE_MAX_MB,
+    RESPONSE_CACHE_MODE,
+    SILENCE_MAX_SHIFT_MS,
+    SILENCE_MIN_MS,
+    SILENCE_THRESHOLD_DB,
+    SNAP_CUTS_TO_SILENCE,
+    STAGE_MODELS,
+    STAGE_TIMEOUT_SECONDS,
+    STREAM_RESPONSES,
+    TELEMETRY_DIR,
+    TOKENS_PER_MINUTE,
     TRANSCRIPT_PATH,
 )
-from models.data_models import SourceMedia, ClipsList
-from create_timelines.otio_builder import PerMediaTimelineBuilder
+from models.data_models import Episode, SourceMedia
+from models.transcript import Transcript
+from create_timelines.export import export_timeline
+from create_timelines.otio_builder import write_timeline
+from create_timelines.render import render_preview, segments_from_timeline
+from utils.cache import ResponseCache, build_response_cache
+from utils.genai import generate_clips_map_reduce, load_clips
+from utils.grounding import TranscriptGrounder
+from utils.media_probe import MediaProber, media_versions
+from utils.pipeline import (
+    PipelineManifest,
+    Stage,
+    add_resume_arguments,
+    run_stages,
+)
+from utils.providers import ModelRouter, add_provider_arguments
+from utils.request_layer import RequestLayer, build_request_layer
+from utils.silence import snap_cuts_to_silence
+from utils.telemetry import Telemetry, build_telemetry
 
 
 # ----------------------------------------------------------------------
@@ -49,108 +106,269 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-# ----------------------------------------------------------------------
-# MAIN EXECUTION
-# ----------------------------------------------------------------------
+def build_stages(
+    router: ModelRouter,
+    episode: Episode,
+    transcript: Transcript,
+    cache: Optional[ResponseCache],
+    request_layer: Optional[RequestLayer] = None,
+    logger: logging.Logger = logger,
+    telemetry: Optional[Telemetry] = None,
+    telemetry_prefix: str = "",
+) -> List[Stage]:
+    """
+    Define the clip selection and timeline stages for one episode.
+
+    `telemetry_prefix` is put before the stage names in `telemetry`, so the
+    episodes of a batch run are summarized separately.
+    """
+    transcript_text = transcript.render()
+
+    # Long transcripts are split into windows; the candidates from all windows
+    # go through the orchestrator prompt once more to pick the final 3-4 clips.
+    chunking = {
+        "token_budget": CHUNK_TOKEN_BUDGET,
+        "overlap_tokens": CHUNK_OVERLAP_TOKENS,
+        "max_workers": CHUNK_MAX_WORKERS,
+    }
+
+    # Step 2: Call AI model to extract clips and persist them for downstream use
+    def clips_stage(_):
+        provider, model_name = router.route("clips")
+        return generate_clips_map_reduce(
+            provider=provider,
+            model_name=model_name,
+            template=ORCHESTRATOR_PROMPT,
+            transcript=transcript,
+            format_kwargs={"context": episode.context},
+            reduce_template=ORCHESTRATOR_PROMPT,
+            start_log=f"Generating clip selections with {router.spec('clips')}",
+            extract_label="clips from transcript",
+            detail_label="Clips Selected",
+            output_path=episode.clips_path,
+            logger=logger,
+            cache=cache,
+            request_layer=request_layer,
+            timeout=STAGE_TIMEOUT_SECONDS.get("clips", REQUEST_TIMEOUT_SECONDS),
+            stream=STREAM_RESPONSES,
+            telemetry=telemetry,
+            stage=f"{telemetry_prefix}clips",
+            **chunking,
+        )
+
+    def probed_media():
+        if not PROBE_MEDIA:
+            return {}
+        return MediaProber(MEDIA_PROBE_CACHE_DIR).probe_all(episode.media_paths, logger)
+
+    def media_clips(clips, path):
+        if not SNAP_CUTS_TO_SILENCE:
+            return clips
+        # Move the cuts into pauses of this camera's own audio
+        return snap_cuts_to_silence(
+            clips,
+            path,
+            AUDIO_CACHE_DIR,
+            logger,
+            threshold_db=SILENCE_THRESHOLD_DB,
+            min_silence_ms=SILENCE_MIN_MS,
+            max_shift_ms=SILENCE_MAX_SHIFT_MS,
+        )
+
+    def timeline_stage(deps):
+        # Step 3: Convert timestamp-based clips to frame-based clips
+        logger.info(f"Converting clips to frame ranges at {episode.fps} fps")
+        clips = deps["clips"]
+        if GROUND_CLIPS:
+            # Fix or drop clips that don't match the transcript
+            grounder = TranscriptGrounder(
+                transcript,
+                min_text_score=GROUNDING_MIN_TEXT_SCORE,
+                max_snap_ms=GROUNDING_MAX_SNAP_MS,
+            )
+            clips, _ = grounder.ground(clips, logger)
+
+        # Step 4: Create source media list with clips for each media file, cut
+        # at its own pauses and in frames at its own rate when it could be probed
+        media = probed_media()
+        source_media_list = [
+            SourceMedia.from_clips(
+                path, media_clips(clips, path), episode.fps, media.get(path)
+            )
+            for path in episode.media_paths
+        ]
+
+        # Step 5: Build (or patch) the OTIO timeline and write it to file
+        return write_timeline(
+            source_media_list,
+            episode.otio_path,
+            logger,
+            incremental=INCREMENTAL_TIMELINE,
+            compact=COMPACT_TIMELINE,
+        )
+
+    stages = [
+        Stage(
+            "clips",
+            clips_stage,
+            inputs={
+                "model": router.spec("clips"),
+                "prompt": ORCHESTRATOR_PROMPT,
+                "context": episode.context,
+                "transcript": transcript_text,
+                **chunking,
+            },
+            output_path=episode.clips_path,
+            load=load_clips,
+        ),
+        Stage(
+            "timeline",
+            timeline_stage,
+            depends_on=("clips",),
+            inputs={
+                "fps": episode.fps,
+                "media_paths": episode.media_paths,
+                # Probing and silence snapping read the files themselves
+                "media_versions": (
+                    media_versions(episode.media_paths)
+                    if PROBE_MEDIA or SNAP_CUTS_TO_SILENCE
+                    else None
+                ),
+                "compact": COMPACT_TIMELINE,
+                "probe_media": PROBE_MEDIA,
+                "grounding": [
+                    GROUND_CLIPS,
+                    GROUNDING_MIN_TEXT_SCORE,
+                    GROUNDING_MAX_SNAP_MS,
+                ],
+                "silence": [
+                    SNAP_CUTS_TO_SILENCE,
+                    SILENCE_THRESHOLD_DB,
+                    SILENCE_MIN_MS,
+                    SILENCE_MAX_SHIFT_MS,
+                ],
+            },
+            output_path=episode.otio_path,
+            load=lambda path: otio.adapters.read_from_file(str(path)),
+        ),
+    ]
+
+    # Other NLE formats are written from the finished timeline; outputs that
+    # are already current are skipped by the export itself
+    if EXPORT_FORMATS:
+        stages.append(
+            Stage(
+                "export",
+                lambda deps: export_timeline(
+                    deps["timeline"],
+                    EXPORT_FORMATS,
+                    EXPORT_DIR / f"{episode.otio_path.stem}.otio",
+                    logger,
+                    max_workers=EXPORT_MAX_WORKERS,
+                ),
+                depends_on=("timeline",),
+            )
+        )
+
+    # Preview of one camera's cut, rendered from the media; segments that
+    # are already cut are reused by the render itself
+    if RENDER_PREVIEW:
+        stages.append(
+            Stage(
+                "render",
+                lambda deps: render_preview(
+                    segments_from_timeline(
+                        deps["timeline"], RENDER_CAMERA, probed_media()
+                    ),
+                    RENDER_DIR / f"{episode.otio_path.stem}.mp4",
+                    RENDER_DIR / "segments",
+                    logger,
+                    max_workers=RENDER_MAX_WORKERS,
+                ),
+                depends_on=("timeline",),
+            )
+        )
+    return stages
 
-# Step 1: Load environment and transcript
-logger.info("Loading environment variables")
-load_dotenv()
-logger.info(f"Loading transcript from {TRANSCRIPT_PATH}")
-transcript = TRANSCRIPT_PATH.read_text(encoding="utf-8")
-logger.info(f"Transcript loaded ({len(transcript)} characters)")
 
 # ----------------------------------------------------------------------
-# OPENAI EXECUTION
-# ----------------------------------------------------------------------
-
-# Initialize OpenAI openai_client
-# openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Step 2: Call AI model to extract clips
-# logger.info(f"Calling {OPENAI_MODEL_NAME} to extract clips")
-# completion = openai_client.beta.chat.completions.parse(
-#     model=OPENAI_MODEL_NAME,
-#     messages=[
-#         {
-#             "role": "system",
-#             "content": ORCHESTRATOR_PROMPT.format(
-#                 transcript=transcript, context=CONTEXT
-#             ),
-#         }
-#     ],
-#     response_format=ClipsList,
-# )
-
-# clips_list = completion.choices[0].message.parsed
-# logger.info(f"Extracted {len(clips_list.clips)} clips from transcript")
-# print(clips_list)
-
-
-# ----------------------------------------------------------------------
-# GOOGLE GEMINI EXECUTION
+# MAIN EXECUTION
 # ----------------------------------------------------------------------
 
-logger.info("Initializing Google GenAI client")
-google_client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-
-# Log before processing transcript with the Google client generate call
-logger.info(f"Generating clip selections with {GOOGLE_MODEL_NAME}")
-
-# use this with thinking models like gemini 3-pro
-# response = google_client.models.generate_content(
-#     model=GOOGLE_MODEL_NAME,
-#     contents=ORCHESTRATOR_PROMPT.format(transcript=transcript, context=CONTEXT),
-#     config=types.GenerateContentConfig(
-#         thinking_config=types.ThinkingConfig(thinking_level="low"),
-#         response_mime_type="application/json",
-#         response_json_schema=ClipsList.model_json_schema(),
-#     ),
-# )
-
-response = google_client.models.generate_content(
-    model=GOOGLE_MODEL_NAME,
-    contents=ORCHESTRATOR_PROMPT.format(transcript=transcript, context=CONTEXT),
-    config={
-        "response_mime_type": "application/json",
-        "response_json_schema": ClipsList.model_json_schema(),
-    },
-)
-
 
-clips_list = ClipsList.model_validate_json(response.text)
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Long-to-Short Clip Extraction")
+    add_resume_arguments(parser)
+    add_provider_arguments(parser)
+    return parser.parse_args(argv)
 
-logger.info(f"Extracted {len(clips_list.clips)} clips from transcript")
 
-logger.info(f"Clips Selected: {clips_list.model_dump_json(indent=2)}")
+def main(argv=None) -> None:
+    args = parse_args(argv)
 
-# Persist selected clips to file for downstream use
-AI_CLIPS_PATH.parent.mkdir(parents=True, exist_ok=True)
-AI_CLIPS_PATH.write_text(clips_list.model_dump_json(indent=2), encoding="utf-8")
-logger.info(f"Wrote clip selections to {AI_CLIPS_PATH}")
+    episode = Episode(
+        name=OUTPUT_OTIO_PATH.stem,
+        transcript_path=TRANSCRIPT_PATH,
+        context=CONTEXT,
+        fps=FPS,
+        media_paths=MEDIA_PATHS,
+        clips_path=AI_CLIPS_PATH,
+        otio_path=OUTPUT_OTIO_PATH,
+    )
 
+    # Step 1: Load environment and transcript
+    logger.info("Loading environment variables")
+    load_dotenv()
+    logger.info(f"Loading transcript from {episode.transcript_path}")
+    transcript = Transcript.from_file(episode.transcript_path)
+    logger.info(
+        f"Transcript loaded ({len(transcript)} segments, "
+        f"{len(transcript.speakers)} speakers, {transcript.char_count} characters)"
+    )
 
-# Step 3: Convert timestamp-based clips to frame-based clips
-logger.info(f"Converting clips to frame ranges at {FPS} fps")
-builder_clips = [clip.to_clip_spec(FPS) for clip in clips_list.clips]
+    router = ModelRouter(DEFAULT_MODEL, STAGE_MODELS, provider_override=args.provider)
 
-# Step 4: Create source media list with clips for each media file
-source_media_list = [
-    SourceMedia(
-        file_path=path,
-        rate=FPS,
-        clips=builder_clips,
+    response_cache = build_response_cache(
+        RESPONSE_CACHE_MODE,
+        RESPONSE_CACHE_DIR,
+        max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+        max_age_days=RESPONSE_CACHE_MAX_AGE_DAYS,
     )
-    for path in MEDIA_PATHS
-]
 
-# Step 5: Build OTIO timeline
-logger.info("Building OTIO timeline")
-builder = PerMediaTimelineBuilder()
-timeline = builder.build_timeline(source_media_list)
-
-# Step 6: Write timeline to file
-logger.info(f"Writing timeline to {OUTPUT_OTIO_PATH}")
-otio.adapters.write_to_file(timeline, OUTPUT_OTIO_PATH)
+    request_layer = build_request_layer(
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        max_concurrent=MAX_API_CONCURRENCY,
+        max_attempts=MAX_REQUEST_ATTEMPTS,
+        breaker_failures=CIRCUIT_BREAKER_FAILURES,
+        breaker_reset_seconds=CIRCUIT_BREAKER_RESET_SECONDS,
+        timeout=REQUEST_TIMEOUT_SECONDS,
+        logger=logger,
+    )
 
-logger.info("Workflow complete!")
+    telemetry = build_telemetry(TELEMETRY_DIR, episode.name, MODEL_PRICES)
+
+    try:
+        run_stages(
+            build_stages(
+                router,
+                episode,
+                transcript,
+                response_cache,
+                request_layer,
+                telemetry=telemetry,
+            ),
+            max_workers=1,
+            logger=logger,
+            manifest=PipelineManifest(episode.manifest_path),
+            from_stage=args.from_stage,
+            only_stages=args.only_stage,
+        )
+    finally:
+        telemetry.finish(logger, PROMETHEUS_PATH)
+
+    logger.info("Workflow complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,21 @@ This module contains all the data classes used for:
 - Validating clip selections
 """
 
-from typing import List
+from fractions import Fraction
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
 from pydantic import BaseModel, Field, RootModel, field_validator, model_validator
 
-from utils.utils import timestamp_to_seconds
+from utils.timecode import (
+    FrameRate,
+    ms_to_frames,
+    parse_frame_rate,
+    timecode_to_frames,
+    timestamps_to_ms,
+)
+from utils.utils import timestamp_to_ms
 
 
 class ClipSpec(BaseModel):
@@ -20,17 +31,65 @@ class ClipSpec(BaseModel):
     duration: int
 
 
+class MediaInfo(BaseModel):
+    """
+    What ffprobe reports about a media file (see `utils.media_probe`):
+    - duration_seconds: length of the file
+    - frame_rate: of the first video stream, e.g. "24000/1001"; None for audio
+    - start_timecode: timecode of the first frame, e.g. "01:00:00:00"
+    - video_streams / audio_channels: stream layout, one entry per audio
+      stream
+    """
+
+    file_path: str
+    duration_seconds: float
+    frame_rate: Optional[str] = None
+    start_timecode: Optional[str] = None
+    video_streams: int = 0
+    audio_channels: List[int] = []
+
+    def start_frame(self, fps: FrameRate) -> int:
+        """Frame number of the first frame at `fps`; 0 without a timecode."""
+        if not self.start_timecode:
+            return 0
+        return timecode_to_frames(self.start_timecode, fps)
+
+    def duration_frames(self, fps: FrameRate) -> int:
+        return round(Fraction(self.duration_seconds) * parse_frame_rate(fps))
+
+
 class SourceMedia(BaseModel):
     """
     Represents a single source media item:
     - file_path: path to the media file
-    - rate: frames per second (fps)
+    - rate: frames per second (fps), e.g. 24 or 23.976 for 24000/1001
     - clips: list of clip specs for this media
+    - media: the probed file, if known; the timeline then uses its real
+      length and start timecode
     """
 
     file_path: str
-    rate: int
+    rate: float
     clips: List[ClipSpec]
+    media: Optional[MediaInfo] = None
+
+    @classmethod
+    def from_clips(
+        cls,
+        file_path: str,
+        clips: "ClipsList",
+        fps: FrameRate,
+        media: Optional[MediaInfo] = None,
+    ) -> "SourceMedia":
+        """Convert `clips` to frames at the media's own rate, or else `fps`."""
+        if media is not None and media.frame_rate:
+            fps = media.frame_rate
+        return cls(
+            file_path=file_path,
+            rate=float(parse_frame_rate(fps)),
+            clips=clips.to_clip_specs(fps),
+            media=media,
+        )
 
 
 class ClipSelection(BaseModel):
@@ -52,41 +111,153 @@ class ClipSelection(BaseModel):
     notes: str = Field(
         description="Brief note about why you choose this segment",
     )
+    score: Optional[float] = Field(
+        default=None,
+        description="How well the segment does its job, from 1 (weak) to 10 "
+        "(outstanding)",
+    )
 
     @field_validator("start", "end")
     @classmethod
     def validate_timestamp(cls, v: str) -> str:
         # Will raise if invalid; we don't store the parsed value here,
         # just validate and keep the original string.
-        timestamp_to_seconds(v)
+        timestamp_to_ms(v)
         return v
 
     @model_validator(mode="after")
     def check_order(self) -> "ClipSelection":
-        if timestamp_to_seconds(self.end) <= timestamp_to_seconds(self.start):
+        if timestamp_to_ms(self.end) <= timestamp_to_ms(self.start):
             raise ValueError("end must be strictly after start")
         return self
 
-    def to_clip_spec(self, fps: int) -> ClipSpec:
+    def to_clip_spec(self, fps: FrameRate) -> ClipSpec:
         """Convert timestamp-based selection to frame-based clip spec.
 
         Args:
-            fps: Frame rate (frames per second)
+            fps: Frame rate (frames per second), e.g. 24 or "24000/1001"
 
         Returns:
             ClipSpec with start frame and duration in frames
         """
-        start_seconds = timestamp_to_seconds(self.start)
-        end_seconds = timestamp_to_seconds(self.end)
-
-        start_frame = int(round(start_seconds * fps))
-        end_frame = int(round(end_seconds * fps))
+        rate = parse_frame_rate(fps)
+        start_frame = round(Fraction(timestamp_to_ms(self.start), 1000) * rate)
+        end_frame = round(Fraction(timestamp_to_ms(self.end), 1000) * rate)
         duration_frames = end_frame - start_frame
 
         return ClipSpec(start=start_frame, duration=duration_frames)
 
+    def to_prompt_line(self, include_notes: bool = False) -> str:
+        """Render as one compact transcript-style line for use in prompts.
+
+        Example: '00:04:01,000 --> 00:04:09,000 a stranger in the internet...'
+        """
+        line = f"{self.start} --> {self.end} {self.transcript_text.strip()}"
+        if include_notes and self.notes:
+            line += f"\n  notes: {self.notes.strip()}"
+        return line
+
+
+class SegmentSelection(BaseModel):
+    """Clip given as a range of numbered transcript segments"""
+
+    first_segment: int = Field(
+        description="ID of the clip's first segment, the number after '#' in "
+        "the transcript",
+        examples=[12],
+    )
+    last_segment: int = Field(
+        description="ID of the clip's last segment; the same as first_segment "
+        "for a clip within one segment",
+        examples=[15],
+    )
+    trim_start_words: int = Field(
+        default=0,
+        description="Words to leave out at the start of the first segment",
+    )
+    trim_end_words: int = Field(
+        default=0,
+        description="Words to leave out at the end of the last segment",
+    )
+    notes: str = Field(
+        default="",
+        description="Brief note about why you choose this segment",
+    )
+    score: Optional[float] = Field(
+        default=None,
+        description="How well the segment does its job, from 1 (weak) to 10 "
+        "(outstanding)",
+    )
+
+
+class SegmentSelectionList(BaseModel):
+    """List of clip selections by segment ID"""
+
+    clips: List[SegmentSelection] = Field(description="List of clip selections")
+
 
 class ClipsList(BaseModel):
     """List of clip selections"""
 
     clips: List[ClipSelection] = Field(description="List of clip selections")
+
+    def to_prompt(self, include_notes: bool = False) -> str:
+        """Render all clips in the compact line format, one clip per line.
+
+        Much smaller than the model repr, which repeats field names and quotes
+        for every clip.
+        """
+        return "\n".join(clip.to_prompt_line(include_notes) for clip in self.clips)
+
+    def to_ms_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Parse all start/end timestamps at once into int64 millisecond arrays."""
+        starts = timestamps_to_ms([clip.start for clip in self.clips])
+        ends = timestamps_to_ms([clip.end for clip in self.clips])
+        return starts, ends
+
+    def to_frame_arrays(self, fps: FrameRate) -> Tuple[np.ndarray, np.ndarray]:
+        """Convert all clips to (start frames, durations in frames) arrays.
+
+        Same rounding as `ClipSelection.to_clip_spec`, without per-clip parsing.
+        """
+        starts, ends = self.to_ms_arrays()
+        start_frames = ms_to_frames(starts, fps)
+        return start_frames, ms_to_frames(ends, fps) - start_frames
+
+    def to_clip_specs(self, fps: FrameRate) -> List[ClipSpec]:
+        """Batch version of `ClipSelection.to_clip_spec` for the whole list."""
+        start_frames, durations = self.to_frame_arrays(fps)
+        return [
+            ClipSpec(start=start, duration=duration)
+            for start, duration in zip(start_frames.tolist(), durations.tolist())
+        ]
+
+
+class Episode(BaseModel):
+    """
+    One episode to clip, with its own inputs and outputs:
+    - name: episode id, used for default output file names
+    - transcript_path / context: what the AI reads
+    - fps / media_paths: the footage the timeline points at
+    - clips_path / otio_path: where the selection and timeline are written
+    """
+
+    name: str
+    transcript_path: Path
+    context: str
+    fps: Union[int, float, str]
+    media_paths: List[str]
+    clips_path: Optional[Path] = None
+    otio_path: Optional[Path] = None
+
+    @model_validator(mode="after")
+    def default_output_paths(self) -> "Episode":
+        if self.clips_path is None:
+            self.clips_path = Path(f"data/ai_selected_clips/{self.name}.json")
+        if self.otio_path is None:
+            self.otio_path = Path(f"data/timelines/{self.name}.otio")
+        return self
+
+    @property
+    def manifest_path(self) -> Path:
+        return Path(f"data/processing/{self.name}_manifest.json")
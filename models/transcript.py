@@ -0,0 +1,268 @@
+"""
+Parsed, indexed transcript for timeline automation workflows.
+
+Transcripts use the SRT-like format produced by ElevenLabs:
+
+    00:00:01,620 --> 00:00:04,040 [Nicola]
+    Hi, Wei. How are you?
+
+Segments are stored column-wise in compact arrays (start/end in milliseconds,
+speaker ids, offsets into one shared text buffer), with a sorted index for
+O(log n) time lookups and a per-speaker index, so validation, trimming and
+chunking never have to rescan the raw text.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from utils.utils import ms_to_timestamp, timestamp_to_ms
+
+_HEADER_RE = re.compile(
+    r"^\s*(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})"
+    r"(?:\s*\[([^\]]*)\])?\s*$"
+)
+
+
+class Segment(NamedTuple):
+    """A single transcript segment, materialized from the columns."""
+
+    index: int
+    start_ms: int
+    end_ms: int
+    speaker: str
+    text: str
+
+    @property
+    def start(self) -> str:
+        return ms_to_timestamp(self.start_ms)
+
+    @property
+    def end(self) -> str:
+        return ms_to_timestamp(self.end_ms)
+
+
+class Transcript:
+    """
+    Column-oriented transcript:
+    - start_ms / end_ms: segment bounds in milliseconds, sorted by start
+    - speaker_ids: index into `speakers` for each segment
+    - text_offsets: start/end offsets of each segment's text in one buffer
+    """
+
+    def __init__(self) -> None:
+        self.start_ms = array("q")
+        self.end_ms = array("q")
+        self.speaker_ids = array("i")
+        self._text_start = array("q")
+        self._text_end = array("q")
+        self._text = ""
+        self.speakers: List[str] = []
+        self._speaker_lookup: Dict[str, int] = {}
+        self._speaker_index: Dict[int, array] = {}
+        # Running maximum of end_ms, so overlap queries can bisect even when
+        # segments overlap slightly.
+        self._max_end = array("q")
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def parse(cls, lines: Iterable[str]) -> "Transcript":
+        """Parse transcript lines one at a time (works on open file handles)."""
+        builder = _TranscriptBuilder()
+        header = None
+        text_lines: List[str] = []
+
+        for line_no, raw in enumerate(lines, start=1):
+            line = raw.rstrip("\r\n")
+            match = _HEADER_RE.match(line)
+            if match:
+                if header is not None:
+                    builder.add(*header, " ".join(text_lines))
+                start, end, speaker = match.groups()
+                header = (
+                    timestamp_to_ms(start),
+                    timestamp_to_ms(end),
+                    (speaker or "").strip(),
+                    line_no,
+                )
+                text_lines = []
+            elif line.strip():
+                if header is None:
+                    raise ValueError(
+                        f"Line {line_no}: text before the first timestamp line"
+                    )
+                text_lines.append(line.strip())
+
+        if header is not None:
+            builder.add(*header, " ".join(text_lines))
+        return builder.build()
+
+    @classmethod
+    def from_file(cls, path: Path) -> "Transcript":
+        """Stream-parse a transcript file without loading it into one string."""
+        with open(path, encoding="utf-8") as f:
+            return cls.parse(f)
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Segment]) -> "Transcript":
+        """Build a transcript from existing segments (e.g. a filtered subset)."""
+        builder = _TranscriptBuilder()
+        for seg in segments:
+            builder.add(seg.start_ms, seg.end_ms, seg.speaker, None, seg.text)
+        return builder.build()
+
+    def subset(self, indices: Iterable[int]) -> "Transcript":
+        """New transcript containing only the given segment indices."""
+        return Transcript.from_segments(self.segment(i) for i in indices)
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.start_ms)
+
+    def __iter__(self) -> Iterator[Segment]:
+        return (self.segment(i) for i in range(len(self)))
+
+    def segment(self, index: int) -> Segment:
+        return Segment(
+            index=index,
+            start_ms=self.start_ms[index],
+            end_ms=self.end_ms[index],
+            speaker=self.speakers[self.speaker_ids[index]],
+            text=self.text(index),
+        )
+
+    def text(self, index: int) -> str:
+        return self._text[self._text_start[index] : self._text_end[index]]
+
+    def speaker(self, index: int) -> str:
+        return self.speakers[self.speaker_ids[index]]
+
+    @property
+    def duration_ms(self) -> int:
+        return self._max_end[-1] - self.start_ms[0] if len(self) else 0
+
+    @property
+    def char_count(self) -> int:
+        return len(self._text)
+
+    # ------------------------------------------------------------------
+    # Indexes
+    # ------------------------------------------------------------------
+
+    def segment_at(self, ms: int) -> Optional[int]:
+        """Index of the segment playing at `ms`, or None if it falls in a gap."""
+        i = bisect_right(self.start_ms, ms) - 1
+        # Walk back over earlier segments that may still overlap `ms`
+        while i >= 0 and self._max_end[i] > ms:
+            if self.end_ms[i] > ms:
+                return i
+            i -= 1
+        return None
+
+    def nearest_segment(self, ms: int) -> Optional[int]:
+        """Index of the segment whose bounds are closest to `ms`."""
+        if not len(self):
+            return None
+        hit = self.segment_at(ms)
+        if hit is not None:
+            return hit
+        after = bisect_right(self.start_ms, ms)
+        candidates = [i for i in (after - 1, after) if 0 <= i < len(self)]
+        return min(
+            candidates,
+            key=lambda i: min(abs(self.start_ms[i] - ms), abs(self.end_ms[i] - ms)),
+        )
+
+    def segments_between(self, start_ms: int, end_ms: int) -> range:
+        """Indices of segments overlapping [start_ms, end_ms)."""
+        first = bisect_right(self._max_end, start_ms)
+        last = bisect_left(self.start_ms, end_ms)
+        return range(first, max(first, last))
+
+    def speaker_segments(self, speaker: str) -> Sequence[int]:
+        """Indices of all segments spoken by `speaker`, in order."""
+        speaker_id = self._speaker_lookup.get(speaker)
+        if speaker_id is None:
+            return array("i")
+        return self._speaker_index[speaker_id]
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def render(
+        self, indices: Optional[Iterable[int]] = None, numbered: bool = False
+    ) -> str:
+        """
+        Render segments back to the transcript format used in prompts.
+
+        `numbered` starts each header with the segment's index as its ID
+        ("#12 00:01:02,000 --> ..."), for prompts answered by segment ID.
+        """
+        if indices is None:
+            indices = range(len(self))
+        blocks = []
+        for i in indices:
+            start = ms_to_timestamp(self.start_ms[i])
+            header = f"{start} --> {ms_to_timestamp(self.end_ms[i])}"
+            if numbered:
+                header = f"#{i} {header}"
+            speaker = self.speaker(i)
+            if speaker:
+                header += f" [{speaker}]"
+            blocks.append(f"{header}\n{self.text(i)}\n")
+        return "\n".join(blocks)
+
+
+class _TranscriptBuilder:
+    """Accumulates parsed segments and freezes them into a Transcript."""
+
+    def __init__(self) -> None:
+        self.transcript = Transcript()
+        self._texts: List[str] = []
+        self._offset = 0
+
+    def add(
+        self,
+        start_ms: int,
+        end_ms: int,
+        speaker: str,
+        line_no: Optional[int],
+        text: str,
+    ) -> None:
+        t = self.transcript
+        where = f"Line {line_no}: " if line_no is not None else ""
+        if end_ms < start_ms:
+            raise ValueError(f"{where}segment ends before it starts")
+        if len(t) and start_ms < t.start_ms[-1]:
+            raise ValueError(f"{where}segments are not in chronological order")
+
+        speaker_id = t._speaker_lookup.get(speaker)
+        if speaker_id is None:
+            speaker_id = len(t.speakers)
+            t.speakers.append(speaker)
+            t._speaker_lookup[speaker] = speaker_id
+            t._speaker_index[speaker_id] = array("i")
+
+        index = len(t)
+        t.start_ms.append(start_ms)
+        t.end_ms.append(end_ms)
+        t.speaker_ids.append(speaker_id)
+        t._speaker_index[speaker_id].append(index)
+        t._max_end.append(max(end_ms, t._max_end[-1]) if index else end_ms)
+        t._text_start.append(self._offset)
+        self._offset += len(text)
+        t._text_end.append(self._offset)
+        self._texts.append(text)
+
+    def build(self) -> Transcript:
+        self.transcript._text = "".join(self._texts)
+        return self.transcript
@@ -1,5 +1,15 @@
 """
 Narrative 90 seconds trailer. multi step process
+
+The finder stages that don't depend on each other run concurrently; see
+`build_stages` for the dependency graph. Every stage is checkpointed in
+`data/processing/narrative_trailer_manifest.json`, so a re-run resumes from the
+first stage whose inputs changed or whose output is missing:
+
+    python narrative_trailer.py                        # resume
+    python narrative_trailer.py --from-stage narrative # redo narrative + timeline
+    python narrative_trailer.py --only-stage hooks     # redo just the hooks
+    python narrative_trailer.py --batch                # cheaper batch jobs
 """
 
 # ----------------------------------------------------------------------
@@ -7,28 +17,114 @@ Narrative 90 seconds trailer. multi step process
 # ----------------------------------------------------------------------
 
 # Standard library
-import os
+import argparse
 import logging
 from pathlib import Path
+import threading
+from typing import List, Optional
 
 
 # Third-party
 from dotenv import load_dotenv
 import opentimelineio as otio
-from google import genai
 
 # Local imports
 from config import (
+    AUDIO_CACHE_DIR,
+    BATCH_COLLECT_SECONDS,
+    BATCH_JOBS_DIR,
+    BATCH_MAX_REQUESTS,
+    BATCH_POLL_SECONDS,
+    CHUNK_MAX_WORKERS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_TOKEN_BUDGET,
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_SECONDS,
+    COMPACT_TIMELINE,
     CONTEXT,
+    CONTEXT_CACHE_TTL_SECONDS,
+    DEFAULT_MODEL,
+    EXPORT_DIR,
+    EXPORT_FORMATS,
+    EXPORT_MAX_WORKERS,
     FPS,
-    GOOGLE_MODEL_NAME,
+    GROUND_CLIPS,
+    GROUNDING_MAX_SNAP_MS,
+    GROUNDING_MIN_TEXT_SCORE,
+    INCREMENTAL_TIMELINE,
+    MAX_API_CONCURRENCY,
+    MAX_CONCURRENT_STAGES,
+    MAX_REQUEST_ATTEMPTS,
+    MODEL_PRICES,
     MEDIA_PATHS,
+    MEDIA_PROBE_CACHE_DIR,
+    NARRATIVE_SECONDS,
+    OPTIMIZE_NARRATIVE,
+    PREFILTER_MIN_NOVELTY,
+    PREFILTER_MIN_WORDS,
+    PREFILTER_TRANSCRIPT,
+    PROBE_MEDIA,
+    PROMETHEUS_PATH,
+    RENDER_CAMERA,
+    RENDER_DIR,
+    RENDER_MAX_WORKERS,
+    RENDER_PREVIEW,
+    REQUEST_TIMEOUT_SECONDS,
+    REQUESTS_PER_MINUTE,
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_MAX_AGE_DAYS,
+    RESPONSE_CACHE_MAX_MB,
+    RESPONSE_CACHE_MODE,
+    SILENCE_MAX_SHIFT_MS,
+    SILENCE_MIN_MS,
+    SILENCE_THRESHOLD_DB,
+    SNAP_CUTS_TO_SILENCE,
+    SEGMENT_ID_MODE,
+    STAGE_MODELS,
+    STAGE_TIMEOUT_SECONDS,
+    STREAM_RESPONSES,
+    TELEMETRY_DIR,
+    TOKENS_PER_MINUTE,
     TRANSCRIPT_PATH,
 )
-from models.data_models import SourceMedia, ClipsList
-from create_timelines.otio_builder import PerMediaTimelineBuilder
+from models.data_models import SourceMedia
+from models.transcript import Transcript
+from create_timelines.export import export_timeline
+from create_timelines.otio_builder import write_timeline
+from create_timelines.render import render_preview, segments_from_timeline
 from ai_prompts.cleanup_1 import CLEANUP_TRANSCRIPT
-from utils.genai import generate_clips_step
+from ai_prompts.hook_finder_2 import HOOK_FINDER
+from ai_prompts.life_lesson_finder_3 import LIFE_LESSON_FINDER
+from ai_prompts.emotions_finder_4 import EMOTIONS_FINDER
+from ai_prompts.cliffhanger_finder_5 import CLIFFHANGER_FINDER
+from ai_prompts.narrative_together_6 import NARRATIVE_TOGETHER
+from ai_prompts.segment_ids import (
+    SEGMENT_ID_INSTRUCTIONS,
+    SEGMENT_ID_INSTRUCTIONS_WITHOUT_NOTES,
+)
+from ai_prompts.transcript_prefix import TRANSCRIPT_PREFIX
+from utils.batch_jobs import add_batch_arguments, batch_providers
+from utils.cache import ResponseCache, build_response_cache
+from utils.clip_optimizer import NARRATIVE_SLOTS, optimize_clips
+from utils.genai import (
+    generate_clips_map_reduce,
+    generate_clips_step,
+    load_clips,
+    render_clips_for_prompt,
+)
+from utils.grounding import TranscriptGrounder
+from utils.media_probe import MediaProber, media_versions
+from utils.pipeline import (
+    PipelineManifest,
+    Stage,
+    add_resume_arguments,
+    run_stages,
+)
+from utils.prefilter import prefilter_transcript
+from utils.providers import ModelRouter, add_provider_arguments
+from utils.request_layer import RequestLayer, build_request_layer
+from utils.silence import snap_cuts_to_silence
+from utils.telemetry import Telemetry, build_telemetry
 
 
 # ----------------------------------------------------------------------
@@ -43,143 +139,526 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-# ----------------------------------------------------------------------
-# MAIN EXECUTION
-# ----------------------------------------------------------------------
-
-# Step 1: Load environment and transcript
-logger.info("Loading environment variables")
-load_dotenv()
-logger.info(f"Loading transcript from {TRANSCRIPT_PATH}")
-transcript = TRANSCRIPT_PATH.read_text(encoding="utf-8")
-logger.info(f"Transcript loaded ({len(transcript)} characters)")
-
-# ----------------------------------------------------------------------
-# GOOGLE GEMINI EXECUTION
-# ----------------------------------------------------------------------
-
-logger.info("Initializing Google GenAI client")
-google_client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-
 CLEANED_TRANSCRIPT_PATH = Path("data/processing/cleaned_transcript.json")
 HOOK_CANDIDATES_PATH = Path("data/processing/hook_candidates.json")
 LIFE_LESSONS_PATH = Path("data/processing/life_lessons.json")
 EMOTIONS_PATH = Path("data/processing/emotions.json")
 CLIFFHANGER_PATH = Path("data/processing/cliffhanger_candidates.json")
 NARRATIVE_TRAILER_PATH = Path("data/processing/narrative_trailer.json")
+NARRATIVE_TRAILER_OTIO_PATH = Path("data/processing/narrative_trailer.otio")
+MANIFEST_PATH = Path("data/processing/narrative_trailer_manifest.json")
 
-# Step 1: clean up the transcript to only the meaningful parts
-cleaned_transcript = generate_clips_step(
-    client=google_client,
-    model_name=GOOGLE_MODEL_NAME,
-    prompt=CLEANUP_TRANSCRIPT.format(transcript=transcript, context=CONTEXT),
-    start_log=f"Cleaning up the transcript with {GOOGLE_MODEL_NAME}",
-    extract_label="clips from transcript",
-    detail_label="Clips selected",
-    output_path=CLEANED_TRANSCRIPT_PATH,
-    logger=logger,
-)
-
-from ai_prompts.hook_finder_2 import HOOK_FINDER
-
-hook_candidates = generate_clips_step(
-    client=google_client,
-    model_name=GOOGLE_MODEL_NAME,
-    prompt=HOOK_FINDER.format(transcript=cleaned_transcript.clips),
-    start_log="Selecting hooks",
-    extract_label="potential hooks",
-    detail_label="Hook candidates",
-    output_path=HOOK_CANDIDATES_PATH,
-    logger=logger,
-)
-
-from ai_prompts.life_lesson_finder_3 import LIFE_LESSON_FINDER
-
-life_lessons = generate_clips_step(
-    client=google_client,
-    model_name=GOOGLE_MODEL_NAME,
-    prompt=LIFE_LESSON_FINDER.format(transcript=cleaned_transcript.clips),
-    start_log="Selecting life lessons",
-    extract_label="life lessons",
-    detail_label="Life lessons",
-    output_path=LIFE_LESSONS_PATH,
-    logger=logger,
-)
-
-# Step 4: emotions
-from ai_prompts.emotions_finder_4 import EMOTIONS_FINDER
 
-emotions = generate_clips_step(
-    client=google_client,
-    model_name=GOOGLE_MODEL_NAME,
-    prompt=EMOTIONS_FINDER.format(transcript=transcript),
-    start_log="Analyzing emotional moments",
-    extract_label="emotion clips",
-    detail_label="Emotion candidates",
-    output_path=EMOTIONS_PATH,
-    logger=logger,
-)
+# ----------------------------------------------------------------------
+# STAGES
+# ----------------------------------------------------------------------
 
-# Step 5: cliffhanger
-from ai_prompts.cliffhanger_finder_5 import CLIFFHANGER_FINDER
 
-cliffhanger_candidates = generate_clips_step(
-    client=google_client,
-    model_name=GOOGLE_MODEL_NAME,
-    prompt=CLIFFHANGER_FINDER.format(transcript=transcript),
-    start_log="Finding cliffhangers",
-    extract_label="cliffhanger candidates",
-    detail_label="Cliffhanger candidates",
-    output_path=CLIFFHANGER_PATH,
-    logger=logger,
-)
-
-# Step 6: narrative trailer
-from ai_prompts.narrative_together_6 import NARRATIVE_TOGETHER
+def build_stages(
+    router: ModelRouter,
+    transcript: Transcript,
+    cache: Optional[ResponseCache],
+    request_layer: Optional[RequestLayer] = None,
+    telemetry: Optional[Telemetry] = None,
+    segment_ids: bool = SEGMENT_ID_MODE,
+) -> List[Stage]:
+    """
+    Define the trailer stages and how they depend on each other.
+
+    `segment_ids` makes the transcript stages answer with segment ID ranges
+    (see `SEGMENT_ID_MODE`); replayed clip-list responses need it off.
+    """
+    transcript_text = transcript.render()
+
+    # Each stage runs on the provider and model the router assigns it; every
+    # AI request goes through the shared request layer, with a timeout per
+    # request attempt that can be overridden per stage, and is recorded in the
+    # run's telemetry under the stage name
+    def llm_settings(stage: str) -> dict:
+        provider, model_name = router.route(stage)
+        return {
+            "provider": provider,
+            "model_name": model_name,
+            "request_layer": request_layer,
+            "timeout": STAGE_TIMEOUT_SECONDS.get(stage, REQUEST_TIMEOUT_SECONDS),
+            "stream": STREAM_RESPONSES,
+            "telemetry": telemetry,
+            "stage": stage,
+            "on_clip": early_grounding(stage),
+        }
+
+    # The clips of the narrative, and of the candidates it is optimized from,
+    # are grounded later. While their responses stream in, each clip is
+    # checked as soon as it arrives; the grounder keeps the results, so the
+    # later grounding only checks clips that were merged or changed since.
+    grounded_stages = {"narrative"}
+    if OPTIMIZE_NARRATIVE:
+        grounded_stages.update(slot.name for slot in NARRATIVE_SLOTS)
+
+    def early_grounding(stage: str):
+        if not (STREAM_RESPONSES and GROUND_CLIPS and stage in grounded_stages):
+            return None
+        return lambda clip: transcript_grounder().check(clip)
+
+    # Long transcripts are split into overlapping windows processed in parallel
+    chunking = {
+        "token_budget": CHUNK_TOKEN_BUDGET,
+        "overlap_tokens": CHUNK_OVERLAP_TOKENS,
+        "max_workers": CHUNK_MAX_WORKERS,
+    }
+    # The emotion and cliffhanger finders read the same transcript through
+    # the same windows, so their prompts start with the same context and
+    # transcript: the provider caches that prefix once and each stage follows
+    # it with its own instructions. They need the sound tags and short
+    # reactions, so only the cleanup reads the prefiltered transcript.
+    transcript_prefix = {
+        "prefix_template": TRANSCRIPT_PREFIX,
+        "format_kwargs": {"context": CONTEXT},
+        "segment_ids": segment_ids,
+    }
+
+    # With segment IDs the model answers with ID ranges and the clips are
+    # rebuilt from the transcript, instead of it copying the text. Nothing
+    # reads the cleanup's notes, so it skips them too.
+    def with_segment_ids(template: str, instructions: str) -> str:
+        return template + instructions if segment_ids else template
+
+    cleanup_template = with_segment_ids(
+        CLEANUP_TRANSCRIPT, SEGMENT_ID_INSTRUCTIONS_WITHOUT_NOTES
+    )
+    emotions_template = with_segment_ids(EMOTIONS_FINDER, SEGMENT_ID_INSTRUCTIONS)
+    cliffhanger_template = with_segment_ids(CLIFFHANGER_FINDER, SEGMENT_ID_INSTRUCTIONS)
+
+    # Step 1: clean up the transcript to only the meaningful parts, from the
+    # transcript with the filler dropped locally
+    def cleanup_stage(_):
+        source = transcript
+        if PREFILTER_TRANSCRIPT:
+            source, _ = prefilter_transcript(
+                transcript,
+                min_words=PREFILTER_MIN_WORDS,
+                min_novelty=PREFILTER_MIN_NOVELTY,
+                logger=logger,
+            )
+        return generate_clips_map_reduce(
+            template=cleanup_template,
+            start_log=f"Cleaning up the transcript with {router.spec('cleanup')}",
+            extract_label="clips from transcript",
+            detail_label="Clips selected",
+            output_path=CLEANED_TRANSCRIPT_PATH,
+            logger=logger,
+            cache=cache,
+            transcript=source,
+            **transcript_prefix,
+            **llm_settings("cleanup"),
+            **chunking,
+        )
+
+    # Step 2: hooks
+    def hook_stage(deps):
+        return generate_clips_step(
+            prompt=HOOK_FINDER.format(
+                transcript=render_clips_for_prompt(
+                    deps["cleanup"], label="cleaned transcript", logger=logger
+                )
+            ),
+            start_log="Selecting hooks",
+            extract_label="potential hooks",
+            detail_label="Hook candidates",
+            output_path=HOOK_CANDIDATES_PATH,
+            logger=logger,
+            cache=cache,
+            **llm_settings("hooks"),
+        )
+
+    # Step 3: life lessons
+    def life_lesson_stage(deps):
+        return generate_clips_step(
+            prompt=LIFE_LESSON_FINDER.format(
+                transcript=render_clips_for_prompt(
+                    deps["cleanup"], label="cleaned transcript", logger=logger
+                )
+            ),
+            start_log="Selecting life lessons",
+            extract_label="life lessons",
+            detail_label="Life lessons",
+            output_path=LIFE_LESSONS_PATH,
+            logger=logger,
+            cache=cache,
+            **llm_settings("life_lessons"),
+        )
+
+    # Step 4: emotions
+    def emotions_stage(_):
+        return generate_clips_map_reduce(
+            template=emotions_template,
+            start_log="Analyzing emotional moments",
+            extract_label="emotion clips",
+            detail_label="Emotion candidates",
+            output_path=EMOTIONS_PATH,
+            logger=logger,
+            cache=cache,
+            transcript=transcript,
+            **transcript_prefix,
+            **llm_settings("emotions"),
+            **chunking,
+        )
+
+    # Step 5: cliffhanger
+    def cliffhanger_stage(_):
+        return generate_clips_map_reduce(
+            template=cliffhanger_template,
+            start_log="Finding cliffhangers",
+            extract_label="cliffhanger candidates",
+            detail_label="Cliffhanger candidates",
+            output_path=CLIFFHANGER_PATH,
+            logger=logger,
+            cache=cache,
+            transcript=transcript,
+            **transcript_prefix,
+            **llm_settings("cliffhangers"),
+            **chunking,
+        )
+
+    # One grounder for all stages; its indexes are built on first use, so a
+    # resumed run that grounds nothing doesn't build them
+    grounder: Optional[TranscriptGrounder] = None
+    grounder_lock = threading.Lock()
+
+    def transcript_grounder() -> TranscriptGrounder:
+        nonlocal grounder
+        with grounder_lock:
+            if grounder is None:
+                grounder = TranscriptGrounder(
+                    transcript,
+                    min_text_score=GROUNDING_MIN_TEXT_SCORE,
+                    max_snap_ms=GROUNDING_MAX_SNAP_MS,
+                )
+            return grounder
+
+    def grounded(clips):
+        if not GROUND_CLIPS:
+            return clips
+        return transcript_grounder().ground(clips, logger)[0]
+
+    # Step 6: narrative trailer, picked by score and length from the
+    # candidates or written by the model
+    def narrative_stage(deps):
+        if OPTIMIZE_NARRATIVE:
+            logger.info("Optimizing the narrative trailer from the candidates")
+            try:
+                trailer = optimize_clips(
+                    {slot.name: grounded(deps[slot.name]) for slot in NARRATIVE_SLOTS},
+                    NARRATIVE_SLOTS,
+                    min_total_seconds=NARRATIVE_SECONDS[0],
+                    max_total_seconds=NARRATIVE_SECONDS[1],
+                    logger=logger,
+                )
+            except ValueError as exc:
+                logger.warning(f"{exc}; asking the model for the trailer instead")
+            else:
+                NARRATIVE_TRAILER_PATH.parent.mkdir(parents=True, exist_ok=True)
+                NARRATIVE_TRAILER_PATH.write_text(
+                    trailer.model_dump_json(indent=2), encoding="utf-8"
+                )
+                logger.info(f"Wrote clip selections to {NARRATIVE_TRAILER_PATH}")
+                return trailer
+        return generate_clips_step(
+            prompt=NARRATIVE_TOGETHER.format(
+                **{
+                    key: render_clips_for_prompt(
+                        deps[stage], label=key, logger=logger, include_notes=True
+                    )
+                    for key, stage in [
+                        ("hooks", "hooks"),
+                        ("lessons", "life_lessons"),
+                        ("emotional_moments", "emotions"),
+                        ("cliffhangers", "cliffhangers"),
+                    ]
+                }
+            ),
+            start_log="Building narrative trailer",
+            extract_label="clips for the trailer",
+            detail_label="Narrative trailer",
+            output_path=NARRATIVE_TRAILER_PATH,
+            logger=logger,
+            cache=cache,
+            **llm_settings("narrative"),
+        )
+
+    # Step 7: convert to frames, build the OTIO timeline and write it
+    def probed_media():
+        if not PROBE_MEDIA:
+            return {}
+        return MediaProber(MEDIA_PROBE_CACHE_DIR).probe_all(MEDIA_PATHS, logger)
+
+    def media_clips(clips, path):
+        if not SNAP_CUTS_TO_SILENCE:
+            return clips
+        # Move the cuts into pauses of this camera's own audio
+        return snap_cuts_to_silence(
+            clips,
+            path,
+            AUDIO_CACHE_DIR,
+            logger,
+            threshold_db=SILENCE_THRESHOLD_DB,
+            min_silence_ms=SILENCE_MIN_MS,
+            max_shift_ms=SILENCE_MAX_SHIFT_MS,
+        )
+
+    def timeline_stage(deps):
+        logger.info(f"Converting clips to frame ranges at {FPS} fps")
+        # Fix or drop clips that don't match the transcript
+        clips = grounded(deps["narrative"])
+
+        # Create source media list with clips for each media file, cut at its
+        # own pauses and in frames at its own rate when it could be probed
+        media = probed_media()
+        source_media_list = [
+            SourceMedia.from_clips(
+                path, media_clips(clips, path), FPS, media.get(path)
+            )
+            for path in MEDIA_PATHS
+        ]
+
+        return write_timeline(
+            source_media_list,
+            NARRATIVE_TRAILER_OTIO_PATH,
+            logger,
+            incremental=INCREMENTAL_TIMELINE,
+            compact=COMPACT_TIMELINE,
+        )
+
+    def llm_inputs(stage: str, template: str, **extra) -> dict:
+        return {"model": router.spec(stage), "prompt": template, **extra}
+
+    def chunked_inputs(stage: str, template: str, **extra) -> dict:
+        return llm_inputs(
+            stage,
+            template,
+            prefix=TRANSCRIPT_PREFIX,
+            context=CONTEXT,
+            transcript=transcript_text,
+            **chunking,
+            **extra,
+        )
+
+    # The emotion and cliffhanger finders read the transcript, so they run
+    # alongside the cleanup; hooks and lessons start as soon as it is done.
+    stages = [
+        Stage(
+            "cleanup",
+            cleanup_stage,
+            inputs=chunked_inputs(
+                "cleanup",
+                cleanup_template,
+                prefilter=[
+                    PREFILTER_TRANSCRIPT,
+                    PREFILTER_MIN_WORDS,
+                    PREFILTER_MIN_NOVELTY,
+                ],
+            ),
+            output_path=CLEANED_TRANSCRIPT_PATH,
+            load=load_clips,
+        ),
+        Stage(
+            "hooks",
+            hook_stage,
+            depends_on=("cleanup",),
+            inputs=llm_inputs("hooks", HOOK_FINDER),
+            output_path=HOOK_CANDIDATES_PATH,
+            load=load_clips,
+        ),
+        Stage(
+            "life_lessons",
+            life_lesson_stage,
+            depends_on=("cleanup",),
+            inputs=llm_inputs("life_lessons", LIFE_LESSON_FINDER),
+            output_path=LIFE_LESSONS_PATH,
+            load=load_clips,
+        ),
+        Stage(
+            "emotions",
+            emotions_stage,
+            inputs=chunked_inputs("emotions", emotions_template),
+            output_path=EMOTIONS_PATH,
+            load=load_clips,
+        ),
+        Stage(
+            "cliffhangers",
+            cliffhanger_stage,
+            inputs=chunked_inputs("cliffhangers", cliffhanger_template),
+            output_path=CLIFFHANGER_PATH,
+            load=load_clips,
+        ),
+        Stage(
+            "narrative",
+            narrative_stage,
+            depends_on=("hooks", "life_lessons", "emotions", "cliffhangers"),
+            inputs=llm_inputs(
+                "narrative",
+                NARRATIVE_TOGETHER,
+                optimize=[OPTIMIZE_NARRATIVE, NARRATIVE_SECONDS, NARRATIVE_SLOTS],
+                grounding=[
+                    GROUND_CLIPS,
+                    GROUNDING_MIN_TEXT_SCORE,
+                    GROUNDING_MAX_SNAP_MS,
+                ],
+            ),
+            output_path=NARRATIVE_TRAILER_PATH,
+            load=load_clips,
+        ),
+        Stage(
+            "timeline",
+            timeline_stage,
+            depends_on=("narrative",),
+            inputs={
+                "fps": FPS,
+                "media_paths": MEDIA_PATHS,
+                # Probing and silence snapping read the files themselves
+                "media_versions": (
+                    media_versions(MEDIA_PATHS)
+                    if PROBE_MEDIA or SNAP_CUTS_TO_SILENCE
+                    else None
+                ),
+                "compact": COMPACT_TIMELINE,
+                "probe_media": PROBE_MEDIA,
+                "grounding": [
+                    GROUND_CLIPS,
+                    GROUNDING_MIN_TEXT_SCORE,
+                    GROUNDING_MAX_SNAP_MS,
+                ],
+                "silence": [
+                    SNAP_CUTS_TO_SILENCE,
+                    SILENCE_THRESHOLD_DB,
+                    SILENCE_MIN_MS,
+                    SILENCE_MAX_SHIFT_MS,
+                ],
+            },
+            output_path=NARRATIVE_TRAILER_OTIO_PATH,
+            load=lambda path: otio.adapters.read_from_file(str(path)),
+        ),
+    ]
+
+    # Other NLE formats are written from the finished timeline; outputs that
+    # are already current are skipped by the export itself
+    if EXPORT_FORMATS:
+        stages.append(
+            Stage(
+                "export",
+                lambda deps: export_timeline(
+                    deps["timeline"],
+                    EXPORT_FORMATS,
+                    EXPORT_DIR / f"{NARRATIVE_TRAILER_OTIO_PATH.stem}.otio",
+                    logger,
+                    max_workers=EXPORT_MAX_WORKERS,
+                ),
+                depends_on=("timeline",),
+            )
+        )
+
+    # Preview of one camera's cut, rendered from the media; segments that
+    # are already cut are reused by the render itself
+    if RENDER_PREVIEW:
+        stages.append(
+            Stage(
+                "render",
+                lambda deps: render_preview(
+                    segments_from_timeline(
+                        deps["timeline"], RENDER_CAMERA, probed_media()
+                    ),
+                    RENDER_DIR / f"{NARRATIVE_TRAILER_OTIO_PATH.stem}.mp4",
+                    RENDER_DIR / "segments",
+                    logger,
+                    max_workers=RENDER_MAX_WORKERS,
+                ),
+                depends_on=("timeline",),
+            )
+        )
+    return stages
 
-narrative_trailer = generate_clips_step(
-    client=google_client,
-    model_name=GOOGLE_MODEL_NAME,
-    prompt=NARRATIVE_TOGETHER.format(
-        hooks=hook_candidates,
-        lessons=life_lessons,
-        emotional_moments=emotions,
-        cliffhangers=cliffhanger_candidates,
-    ),
-    start_log="Building narrative trailer",
-    extract_label="clips for the trailer",
-    detail_label="Narrative trailer",
-    output_path=NARRATIVE_TRAILER_PATH,
-    logger=logger,
-)
 
 # ----------------------------------------------------------------------
-# TIMELINE BUILDING
+# MAIN EXECUTION
 # ----------------------------------------------------------------------
 
-logger.info(f"Converting clips to frame ranges at {FPS} fps")
-builder_clips = [clip.to_clip_spec(FPS) for clip in narrative_trailer.clips]
 
-# Create source media list with clips for each media file
-source_media_list = [
-    SourceMedia(
-        file_path=path,
-        rate=FPS,
-        clips=builder_clips,
-    )
-    for path in MEDIA_PATHS
-]
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_resume_arguments(parser)
+    add_provider_arguments(parser)
+    add_batch_arguments(parser)
+    return parser.parse_args(argv)
 
-# Build OTIO timeline
-logger.info("Building OTIO timeline")
-builder = PerMediaTimelineBuilder()
-timeline = builder.build_timeline(source_media_list)
 
-NARRATIVE_TRAILER_OTIO_PATH = Path("data/processing/narrative_trailer.otio")
+def main(argv=None) -> None:
+    args = parse_args(argv)
 
+    # Step 1: Load environment and transcript
+    logger.info("Loading environment variables")
+    load_dotenv()
+    logger.info(f"Loading transcript from {TRANSCRIPT_PATH}")
+    transcript = Transcript.from_file(TRANSCRIPT_PATH)
+    logger.info(
+        f"Transcript loaded ({len(transcript)} segments, "
+        f"{len(transcript.speakers)} speakers, {transcript.char_count} characters)"
+    )
 
-# Write timeline to file
-logger.info(f"Writing timeline to {NARRATIVE_TRAILER_OTIO_PATH}")
-otio.adapters.write_to_file(timeline, NARRATIVE_TRAILER_OTIO_PATH)
+    router = ModelRouter(
+        DEFAULT_MODEL,
+        STAGE_MODELS,
+        provider_override=args.provider,
+        context_cache_ttl=CONTEXT_CACHE_TTL_SECONDS,
+        providers=(
+            batch_providers(
+                BATCH_JOBS_DIR,
+                collect_seconds=BATCH_COLLECT_SECONDS,
+                poll_seconds=BATCH_POLL_SECONDS,
+                max_requests=BATCH_MAX_REQUESTS,
+                logger=logger,
+            )
+            if args.batch
+            else None
+        ),
+    )
+
+    response_cache = build_response_cache(
+        RESPONSE_CACHE_MODE,
+        RESPONSE_CACHE_DIR,
+        max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+        max_age_days=RESPONSE_CACHE_MAX_AGE_DAYS,
+    )
 
-logger.info("Workflow complete!")
+    # Batch jobs take minutes to hours: no rate limits or request timeouts
+    request_layer = None
+    if not args.batch:
+        request_layer = build_request_layer(
+            requests_per_minute=REQUESTS_PER_MINUTE,
+            tokens_per_minute=TOKENS_PER_MINUTE,
+            max_concurrent=MAX_API_CONCURRENCY,
+            max_attempts=MAX_REQUEST_ATTEMPTS,
+            breaker_failures=CIRCUIT_BREAKER_FAILURES,
+            breaker_reset_seconds=CIRCUIT_BREAKER_RESET_SECONDS,
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            logger=logger,
+        )
+
+    telemetry = build_telemetry(TELEMETRY_DIR, "narrative_trailer", MODEL_PRICES)
+
+    try:
+        run_stages(
+            build_stages(router, transcript, response_cache, request_layer, telemetry),
+            max_workers=MAX_CONCURRENT_STAGES,
+            logger=logger,
+            manifest=PipelineManifest(MANIFEST_PATH),
+            from_stage=args.from_stage,
+            only_stages=args.only_stage,
+        )
+    finally:
+        telemetry.finish(logger, PROMETHEUS_PATH)
+
+    logger.info("Workflow complete!")
+
+
+if __name__ == "__main__":
+    main()
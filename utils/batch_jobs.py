@@ -0,0 +1,396 @@
+"""
+Provider batch jobs for non-interactive runs.
+
+Batch APIs answer a file of requests within hours at about half the price,
+which suits whole-season runs overnight. `BatchProvider` puts that behind
+the usual provider interface, so the stage DAG runs unchanged:
+
+- `generate` queues the request and blocks until its job has finished.
+- Queued requests are submitted together, one job per model, once no new
+  request has arrived for `collect_seconds` (or `max_requests` are queued).
+- Jobs are polled every `poll_seconds`. Each request's result is handed
+  back to its stage as soon as its job finishes, and the stages that depend
+  on it queue their own requests, which go out in the next job. So the
+  finders of every episode form the first wave and e.g. the narrative the
+  second, without any stage knowing about batches.
+- A poll that fails (e.g. a dropped connection) is retried with backoff;
+  requests only fail once their job has ended without results.
+
+Backends: Gemini's batch API (`GeminiBatchBackend`, inline requests) and a
+file-based stand-in for testing (`LocalBatchBackend`), which writes each job
+as JSONL files and answers it with another provider, e.g. the fake. OpenAI
+stages keep running interactively.
+"""
+
+from concurrent.futures import Future
+from dataclasses import dataclass
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Type, Union
+
+from pydantic import BaseModel
+
+from utils.providers import Completion, FakeProvider, GeminiProvider, LLMProvider
+
+BATCH_PROVIDER_NAMES = ("gemini", "fake")
+
+# Results of a finished job, in request order: a completion or the error of
+# each request
+JobResults = List[Union[Completion, Exception]]
+
+# Longest wait between polls of a job whose polls keep failing
+MAX_POLL_BACKOFF_SECONDS = 30 * 60
+
+
+class BatchJobFailed(RuntimeError):
+    """A job ended without results; its requests fail with this error."""
+
+
+class BatchRequest(NamedTuple):
+    """One request of a batch job; all requests of a job use the same model."""
+
+    prompt: str
+    schema: Type[BaseModel]
+    prefix: Optional[str] = None
+
+
+class BatchBackend:
+    """Creates and polls batch jobs on one provider."""
+
+    def submit(self, model: str, requests: List[BatchRequest]) -> str:
+        """Create a job and return its id."""
+        raise NotImplementedError
+
+    def poll(self, job_id: str) -> Optional[JobResults]:
+        """
+        Results once the job has finished, None while it is running. Raises
+        `BatchJobFailed` when the job has ended without results; any other
+        error is taken as transient and the job is polled again.
+        """
+        raise NotImplementedError
+
+
+class GeminiBatchBackend(BatchBackend):
+    """Gemini batch jobs with inline requests (up to 20 MB per job)."""
+
+    _RUNNING = ("JOB_STATE_PENDING", "JOB_STATE_QUEUED", "JOB_STATE_RUNNING")
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, model: str, requests: List[BatchRequest]) -> str:
+        job = self.client.batches.create(
+            model=model,
+            src=[
+                {
+                    "contents": [{"role": "user", "parts": [{"text": r.prompt}]}],
+                    "config": GeminiProvider.config(r.schema),
+                }
+                for r in requests
+            ],
+            config={"display_name": f"automate-timelines-{len(requests)}"},
+        )
+        return job.name
+
+    def poll(self, job_id: str) -> Optional[JobResults]:
+        job = self.client.batches.get(name=job_id)
+        state = job.state.name
+        if state in self._RUNNING:
+            return None
+        if state != "JOB_STATE_SUCCEEDED":
+            raise BatchJobFailed(f"Batch job {job_id} ended in {state}: {job.error}")
+        return [
+            GeminiProvider._completion(r.response)
+            if r.response is not None
+            else RuntimeError(f"Batch request failed: {r.error}")
+            for r in job.dest.inlined_responses
+        ]
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for a provider's batch API.
+
+    Each job is a directory under `directory` holding `requests.jsonl`.
+    After `turnaround_seconds` a background thread answers every request
+    with `provider` and writes `results.jsonl`; polling reads that file like
+    a client reads the provider's job state.
+    """
+
+    def __init__(
+        self, directory: Path, provider: LLMProvider, turnaround_seconds: float = 0.0
+    ):
+        self.directory = Path(directory)
+        self.provider = provider
+        self.turnaround_seconds = turnaround_seconds
+        self._schemas: Dict[str, Type[BaseModel]] = {}
+        self._numbers = itertools.count(1)
+
+    def submit(self, model: str, requests: List[BatchRequest]) -> str:
+        job_id = f"job-{time.strftime('%Y%m%d-%H%M%S')}-{next(self._numbers):03d}"
+        job_dir = self.directory / job_id
+        job_dir.mkdir(parents=True)
+        lines = []
+        for r in requests:
+            self._schemas[r.schema.__name__] = r.schema
+            request = {"model": model, **r._asdict(), "schema": r.schema.__name__}
+            lines.append(json.dumps(request))
+        (job_dir / "requests.jsonl").write_text("\n".join(lines) + "\n", "utf-8")
+        threading.Thread(
+            target=self._process, args=(job_dir,), name=job_id, daemon=True
+        ).start()
+        return job_id
+
+    def _process(self, job_dir: Path) -> None:
+        time.sleep(self.turnaround_seconds)
+        results = []
+        with open(job_dir / "requests.jsonl", encoding="utf-8") as f:
+            for line in f:
+                request = json.loads(line)
+                try:
+                    completion = self.provider.generate(
+                        request["model"],
+                        request["prompt"],
+                        self._schemas[request["schema"]],
+                        prefix=request["prefix"],
+                    )
+                    results.append(completion._asdict())
+                except Exception as exc:
+                    results.append({"error": f"{type(exc).__name__}: {exc}"})
+        tmp = job_dir / "results.jsonl.tmp"
+        tmp.write_text("".join(json.dumps(r) + "\n" for r in results), "utf-8")
+        os.replace(tmp, job_dir / "results.jsonl")
+
+    def poll(self, job_id: str) -> Optional[JobResults]:
+        path = self.directory / job_id / "results.jsonl"
+        if not path.exists():
+            return None
+        results: JobResults = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                result = json.loads(line)
+                if "error" in result:
+                    results.append(RuntimeError(result["error"]))
+                else:
+                    results.append(Completion(**result))
+        return results
+
+
+@dataclass
+class _Job:
+    job_id: str
+    model: str
+    futures: List[Future]
+    submitted: float
+    # Polls failed in a row, and when to poll again after them
+    poll_errors: int = 0
+    retry_at: float = 0.0
+
+
+class BatchProvider(LLMProvider):
+    """
+    Sends requests as batch jobs of `backend` (see the module docstring).
+
+    - name: the provider's usual name, so responses are cached and recorded
+      the same as interactive ones
+    - make_backend: creates the backend on first use
+    - collect_seconds: submit once no new request has arrived for this long
+    - poll_seconds: how often running jobs are checked
+    - max_requests: submit right away once this many requests are queued
+    """
+
+    def __init__(
+        self,
+        name: str,
+        make_backend: Callable[[], BatchBackend],
+        *,
+        collect_seconds: float = 10.0,
+        poll_seconds: float = 60.0,
+        max_requests: int = 500,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.name = name
+        self.make_backend = make_backend
+        self.collect_seconds = collect_seconds
+        self.poll_seconds = poll_seconds
+        self.max_requests = max_requests
+        self.logger = logger or logging.getLogger(__name__)
+        self._backend: Optional[BatchBackend] = None
+        self._queued: List[tuple] = []
+        self._jobs: List[_Job] = []
+        self._last_request = 0.0
+        self._waves = itertools.count(1)
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Completion:
+        future: Future = Future()
+        with self._condition:
+            self._queued.append((model, BatchRequest(prompt, schema, prefix), future))
+            self._last_request = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"batch-{self.name}", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+        return future.result()
+
+    def stream(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Iterator[Completion]:
+        # A batch result arrives in one piece
+        yield self.generate(model, prompt, schema, prefix)
+
+    def _run(self) -> None:
+        next_poll = 0.0
+        while True:
+            with self._condition:
+                while not self._queued and not self._jobs:
+                    self._condition.wait()
+                now = time.monotonic()
+                flush_at = self._last_request + self.collect_seconds
+                queued = []
+                if self._queued and (
+                    now >= flush_at or len(self._queued) >= self.max_requests
+                ):
+                    queued = self._queued[: self.max_requests]
+                    del self._queued[: self.max_requests]
+                poll_due = bool(self._jobs) and now >= next_poll
+                if not queued and not poll_due:
+                    deadlines = [flush_at] if self._queued else []
+                    deadlines += [next_poll] if self._jobs else []
+                    self._condition.wait(max(min(deadlines) - now, 0))
+                    continue
+            if queued:
+                self._submit(queued)
+            if poll_due:
+                self._poll()
+                next_poll = time.monotonic() + self.poll_seconds
+
+    def _submit(self, queued: List[tuple]) -> None:
+        by_model: Dict[str, List[tuple]] = {}
+        for item in queued:
+            by_model.setdefault(item[0], []).append(item)
+        wave = next(self._waves)
+        for model, items in by_model.items():
+            futures = [future for _, _, future in items]
+            try:
+                if self._backend is None:
+                    self._backend = self.make_backend()
+                job_id = self._backend.submit(model, [r for _, r, _ in items])
+            except Exception as exc:
+                self.logger.error(f"Could not submit a {self.name} batch job: {exc}")
+                for future in futures:
+                    future.set_exception(exc)
+                continue
+            self.logger.info(
+                f"Submitted batch job {job_id} (wave {wave}): "
+                f"{len(items)} {self.name}:{model} requests"
+            )
+            self._jobs.append(_Job(job_id, model, futures, time.monotonic()))
+
+    def _poll(self) -> None:
+        now = time.monotonic()
+        for job in list(self._jobs):
+            if now < job.retry_at:
+                continue
+            try:
+                results = self._backend.poll(job.job_id)
+                if results is None:
+                    job.poll_errors = 0
+                    continue
+                if len(results) != len(job.futures):
+                    raise BatchJobFailed(
+                        f"Batch job {job.job_id} returned {len(results)} results "
+                        f"for {len(job.futures)} requests"
+                    )
+            except BatchJobFailed as exc:
+                self.logger.error(f"Batch job {job.job_id} failed: {exc}")
+                results = [exc] * len(job.futures)
+            except Exception as exc:
+                # The job keeps running on the provider's side; ask again later
+                delay = min(
+                    self.poll_seconds * 2**job.poll_errors, MAX_POLL_BACKOFF_SECONDS
+                )
+                job.poll_errors += 1
+                job.retry_at = now + delay
+                self.logger.warning(
+                    f"Could not poll batch job {job.job_id} "
+                    f"({type(exc).__name__}: {exc}); retrying in {delay:.0f}s"
+                )
+                continue
+            else:
+                self.logger.info(
+                    f"Batch job {job.job_id} finished after "
+                    f"{time.monotonic() - job.submitted:.0f}s"
+                )
+            self._jobs.remove(job)
+            for future, result in zip(job.futures, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+def create_batch_backend(name: str, jobs_dir: Path) -> BatchBackend:
+    """The batch backend of a provider; "fake" uses the local stand-in."""
+    if name == "gemini":
+        from google import genai
+
+        return GeminiBatchBackend(genai.Client(api_key=os.getenv("GOOGLE_API_KEY")))
+    if name == "fake":
+        return LocalBatchBackend(jobs_dir, FakeProvider())
+    raise ValueError(
+        f"Provider {name!r} has no batch mode; expected one of {BATCH_PROVIDER_NAMES}"
+    )
+
+
+def batch_providers(
+    jobs_dir: Path,
+    *,
+    collect_seconds: float = 10.0,
+    poll_seconds: float = 60.0,
+    max_requests: int = 500,
+    logger: Optional[logging.Logger] = None,
+) -> Dict[str, LLMProvider]:
+    """
+    Batch versions of the providers that have one, for `ModelRouter`'s
+    `providers`; backends are only created when a stage uses them.
+    """
+    return {
+        name: BatchProvider(
+            name,
+            lambda name=name: create_batch_backend(name, jobs_dir),
+            collect_seconds=collect_seconds,
+            poll_seconds=poll_seconds,
+            max_requests=max_requests,
+            logger=logger,
+        )
+        for name in BATCH_PROVIDER_NAMES
+    }
+
+
+def add_batch_arguments(parser) -> None:
+    """Add the `--batch` option shared by the workflow scripts."""
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Send AI requests as provider batch jobs: cheaper, but results take "
+        "minutes to hours ('--provider fake' uses a local stand-in)",
+    )
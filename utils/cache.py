@@ -0,0 +1,194 @@
+"""
+Persistent, content-addressed cache for GenAI responses.
+
+Entries are keyed by a hash of everything that determines a response (model,
+rendered prompt, JSON schema and generation config), so re-running a pipeline
+only pays for the stages whose inputs actually changed.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+CACHE_MODES = ("use", "refresh", "off")
+# Rescan the cache directory at least this often, for entries that expired or
+# were written by other processes; in between, the size is tracked per put
+EVICT_EVERY_PUTS = 100
+# Share of max_bytes left after evicting for size, so that the next puts don't
+# all push the cache over the limit again
+EVICT_TO_FRACTION = 0.9
+
+
+class ResponseCache:
+    """
+    On-disk response cache with size- and age-based eviction.
+
+    - cache_dir: directory holding one JSON file per entry
+    - max_bytes: evict least recently used entries beyond this total size,
+      down to `EVICT_TO_FRACTION` of it
+    - max_age_seconds: entries older than this are treated as missing
+    - refresh: skip lookups but still store fresh responses
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        *,
+        max_bytes: Optional[int] = None,
+        max_age_seconds: Optional[float] = None,
+        refresh: bool = False,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        # Total size of the entries as of the last scan plus later puts (None
+        # until the first scan), and puts since that scan
+        self._size: Optional[int] = None
+        self._puts = 0
+
+    @staticmethod
+    def make_key(
+        *, model_name: str, prompt: str, schema: dict, config: dict
+    ) -> str:
+        """Hash the request inputs into a stable cache key."""
+        payload = json.dumps(
+            {
+                "model_name": model_name,
+                "prompt": prompt,
+                "schema": schema,
+                "config": config,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _is_expired(self, created_at: float) -> bool:
+        if self.max_age_seconds is None:
+            return False
+        return time.time() - created_at > self.max_age_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text for `key`, or None on a miss."""
+        if self.refresh:
+            return None
+
+        path = self._entry_path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if self._is_expired(entry.get("created_at", 0)):
+            path.unlink(missing_ok=True)
+            return None
+
+        # Bump the mtime so size-based eviction drops least recently used first
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry["text"]
+
+    def put(self, key: str, text: str, **metadata: Any) -> None:
+        """
+        Store a response. The cache directory is scanned for entries to evict
+        on the first put, once the tracked size passes max_bytes, and every
+        `EVICT_EVERY_PUTS` puts.
+        """
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"created_at": time.time(), **metadata, "text": text}
+
+        # Write to a temp file first so concurrent readers never see partial JSON
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            json.dump(entry, tmp, ensure_ascii=False)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_name, path)
+        written = path.stat().st_size
+
+        with self._lock:
+            self._puts += 1
+            if self._size is not None:
+                self._size += written - replaced
+            due = (
+                self._size is None
+                or self._puts >= EVICT_EVERY_PUTS
+                or (self.max_bytes is not None and self._size > self.max_bytes)
+            )
+        if due:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop expired entries, then the least recently used ones over max_bytes."""
+        with self._lock:
+            entries = []
+            for path in self.cache_dir.glob("*/*.json"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            if self.max_age_seconds is not None:
+                # created_at <= mtime, so anything untouched since the cutoff is
+                # expired; recently hit but old entries are caught by get()
+                cutoff = time.time() - self.max_age_seconds
+                kept = []
+                for mtime, size, path in entries:
+                    if mtime < cutoff:
+                        path.unlink(missing_ok=True)
+                    else:
+                        kept.append((mtime, size, path))
+                entries = kept
+
+            total = sum(size for _, size, _ in entries)
+            if self.max_bytes is not None and total > self.max_bytes:
+                target = self.max_bytes * EVICT_TO_FRACTION
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    path.unlink(missing_ok=True)
+                    total -= size
+            self._size = total
+            self._puts = 0
+
+
+def build_response_cache(
+    mode: str,
+    cache_dir: Path,
+    *,
+    max_bytes: Optional[int] = None,
+    max_age_days: Optional[float] = None,
+) -> Optional[ResponseCache]:
+    """
+    Create the response cache for a run.
+
+    mode is "use" (read and write), "refresh" (re-query and overwrite) or
+    "off" (no cache at all, returns None).
+    """
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode {mode!r}; expected one of {CACHE_MODES}")
+    if mode == "off":
+        return None
+    return ResponseCache(
+        cache_dir,
+        max_bytes=max_bytes,
+        max_age_seconds=max_age_days * 86400 if max_age_days is not None else None,
+        refresh=mode == "refresh",
+    )
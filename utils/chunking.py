@@ -0,0 +1,117 @@
+"""
+Split long transcripts into overlapping windows and merge per-window results.
+
+Windows break only at speaker-turn boundaries (a turn is a run of consecutive
+segments by the same speaker), so no window starts or ends mid-answer. The
+clips found in each window are merged back into one `ClipsList`, dropping the
+duplicates picked up twice in the overlapping parts.
+"""
+
+from typing import Iterable, List, Tuple
+
+from models.data_models import ClipsList
+from models.transcript import Transcript
+from utils.timecode import timestamps_to_ms
+from utils.utils import estimate_tokens
+
+
+def speaker_turns(transcript: Transcript) -> List[range]:
+    """Group consecutive segments by the same speaker into turns."""
+    turns: List[range] = []
+    start = 0
+    for i in range(1, len(transcript) + 1):
+        if i == len(transcript) or (
+            transcript.speaker_ids[i] != transcript.speaker_ids[start]
+        ):
+            turns.append(range(start, i))
+            start = i
+    return turns if len(transcript) else []
+
+
+def split_windows(
+    transcript: Transcript, token_budget: int, overlap_tokens: int = 0
+) -> List[range]:
+    """
+    Split a transcript into windows of about `token_budget` tokens.
+
+    Each window repeats at least `overlap_tokens` worth of whole turns from the
+    end of the previous one. A single turn longer than the budget becomes its
+    own window rather than being cut.
+
+    Returns segment index ranges; one range covering everything if the whole
+    transcript fits.
+    """
+    if token_budget <= overlap_tokens:
+        raise ValueError("token_budget must be larger than overlap_tokens")
+
+    turns = speaker_turns(transcript)
+    turn_tokens = [
+        estimate_tokens(transcript.render(turn)) for turn in turns
+    ]
+    if sum(turn_tokens) <= token_budget:
+        return [range(0, len(transcript))]
+
+    windows: List[range] = []
+    first = 0
+    while first < len(turns):
+        last = first
+        used = turn_tokens[first]
+        while last + 1 < len(turns) and used + turn_tokens[last + 1] <= token_budget:
+            last += 1
+            used += turn_tokens[last]
+        windows.append(range(turns[first].start, turns[last].stop))
+        if last == len(turns) - 1:
+            break
+
+        # Step back over whole turns until the overlap budget is covered,
+        # always making progress by at least one turn.
+        next_first = last + 1
+        overlap = 0
+        while next_first - 1 > first and overlap < overlap_tokens:
+            next_first -= 1
+            overlap += turn_tokens[next_first]
+        first = next_first
+    return windows
+
+
+def merge_clip_lists(
+    clip_lists: Iterable[ClipsList], min_overlap: float = 0.5
+) -> ClipsList:
+    """
+    Merge per-window results into one list ordered by start time.
+
+    Two clips are considered duplicates when they overlap by at least
+    `min_overlap` of the shorter one; the longer clip is kept. Timestamps
+    are parsed once, and each clip is only compared with the kept clips
+    that can still reach it, so the merge is about linear in the clips.
+    """
+    clips = [clip for clips_list in clip_lists for clip in clips_list.clips]
+    starts = timestamps_to_ms([clip.start for clip in clips]).tolist()
+    ends = timestamps_to_ms([clip.end for clip in clips]).tolist()
+    order = sorted(range(len(clips)), key=lambda i: (starts[i], ends[i]))
+
+    # Kept clips as (start, end, index), sorted by start; no clip is sorted
+    # after the current one, so replacing a duplicate moves it to the end
+    merged: List[Tuple[int, int, int]] = []
+    longest = 0
+    for i in order:
+        start, end = starts[i], ends[i]
+        duplicate = None
+        for k in range(len(merged) - 1, -1, -1):
+            kept_start, kept_end, _ = merged[k]
+            # This and every earlier kept clip end before the current starts
+            if kept_start + longest <= start:
+                break
+            overlap = min(kept_end, end) - max(kept_start, start)
+            shorter = min(kept_end - kept_start, end - start)
+            if shorter > 0 and overlap > 0 and overlap / shorter >= min_overlap:
+                duplicate = k
+                break
+        if duplicate is not None:
+            kept_start, kept_end, _ = merged[duplicate]
+            if end - start <= kept_end - kept_start:
+                continue
+            del merged[duplicate]
+        merged.append((start, end, i))
+        longest = max(longest, end - start)
+    return ClipsList(clips=[clips[i] for _, _, i in merged])
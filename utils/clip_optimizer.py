@@ -0,0 +1,264 @@
+"""
+Pick trailer clips from scored candidates without asking the model to.
+
+The finder stages return candidates with a `score`; `optimize_clips` picks
+the subset with the highest total score that fills every slot of the trailer
+(hook 5-9 s, lesson 20-30 s, 2-3 emotional moments for 30-40 s, cliffhanger
+10-15 s) and keeps the whole trailer within 85-95 s. The model only ranks;
+the lengths are added up here.
+
+It is a knapsack over clip lengths, quantized to `resolution_ms` (rounded
+down, so no combination within the limits is cut early; the limits are
+checked on the real lengths):
+
+- Within a slot, the candidates are packed into every feasible (clip count,
+  length) with the best scores for each.
+- Across slots, those fills are combined into every feasible trailer length,
+  again keeping the best few per length so that clips which overlap in time
+  (the same moment found by two finders) can be skipped.
+
+Candidates longer than a slot allows are also offered trimmed to runs of
+whole sentences that fit, with times interpolated over the clip; the
+grounding in the timeline stage then snaps the cuts to the transcript.
+Unscored candidates count as `default_score`. Ties go to the trailer closest
+to the middle of the length range, then to earlier candidates, so the same
+input always gives the same trailer.
+"""
+
+from dataclasses import dataclass
+import logging
+import math
+import re
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from models.data_models import ClipSelection, ClipsList
+from utils.utils import ms_to_timestamp, timestamp_to_ms
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass(frozen=True)
+class Slot:
+    """
+    One part of the trailer, filled from the candidates of the same name:
+    - min_seconds / max_seconds: length of the slot's clips together
+    - min_clips / max_clips: how many clips fill it
+    """
+
+    name: str
+    min_seconds: float
+    max_seconds: float
+    min_clips: int = 1
+    max_clips: int = 1
+
+
+# The structure `NARRATIVE_TOGETHER` asks for, keyed by finder stage
+NARRATIVE_SLOTS = (
+    Slot("hooks", 5, 9),
+    Slot("life_lessons", 20, 30),
+    Slot("emotions", 30, 40, min_clips=2, max_clips=3),
+    Slot("cliffhangers", 10, 15),
+)
+
+
+@dataclass(frozen=True)
+class _Option:
+    slot: str
+    clip: ClipSelection
+    start_ms: int
+    end_ms: int
+    units: int
+    score: float
+
+    def overlaps(self, other: "_Option") -> bool:
+        return self.start_ms < other.end_ms and other.start_ms < self.end_ms
+
+
+# (total score, picked options) partial solutions, best first
+_Partial = Tuple[float, Tuple[_Option, ...]]
+
+
+def _length_ms(picks: Sequence[_Option]) -> int:
+    return sum(option.end_ms - option.start_ms for option in picks)
+
+
+def _trimmed(
+    clip: ClipSelection, start_ms: int, end_ms: int, min_ms: int, max_ms: int
+) -> List[Tuple[ClipSelection, int, int]]:
+    """Runs of whole sentences of `clip` lasting between min_ms and max_ms."""
+    text = clip.transcript_text.strip()
+    bounds = [0] + [m.end() for m in _SENTENCE_END_RE.finditer(text)] + [len(text)]
+    scale = (end_ms - start_ms) / max(len(text), 1)
+    variants = []
+    for i in range(len(bounds) - 1):
+        # The longest run from each sentence that still fits
+        best = None
+        for j in range(i + 1, len(bounds)):
+            duration = round((bounds[j] - bounds[i]) * scale)
+            if duration > max_ms:
+                break
+            if duration >= min_ms:
+                best = j
+        if best is None:
+            continue
+        start = start_ms + round(bounds[i] * scale)
+        end = start_ms + round(bounds[best] * scale)
+        trimmed = clip.model_copy(
+            update={
+                "start": ms_to_timestamp(start),
+                "end": ms_to_timestamp(end),
+                "transcript_text": text[bounds[i] : bounds[best]].strip(),
+            }
+        )
+        variants.append((trimmed, start, end))
+    return variants
+
+
+def _slot_options(
+    slot: Slot, clips: ClipsList, resolution_ms: int, default_score: float
+) -> List[_Option]:
+    """Every candidate, or trimmed version of it, that fits in the slot."""
+    max_ms = round(slot.max_seconds * 1000)
+    # No clip may be too short for the others to make up the rest
+    min_ms = max(round(slot.min_seconds * 1000) - (slot.max_clips - 1) * max_ms, 1)
+    options = []
+    for clip in clips.clips:
+        start_ms, end_ms = timestamp_to_ms(clip.start), timestamp_to_ms(clip.end)
+        if end_ms - start_ms <= max_ms:
+            variants = [(clip, start_ms, end_ms)] if end_ms - start_ms >= min_ms else []
+        else:
+            variants = _trimmed(clip, start_ms, end_ms, min_ms, max_ms)
+        score = default_score if clip.score is None else clip.score
+        for variant, start, end in variants:
+            units = (end - start) // resolution_ms
+            options.append(_Option(slot.name, variant, start, end, units, score))
+    return options
+
+
+def _keep(partials: List[_Partial], partial: _Partial, top_k: int) -> None:
+    """Insert keeping the best `top_k`; earlier entries win ties."""
+    i = len(partials)
+    while i > 0 and partials[i - 1][0] < partial[0]:
+        i -= 1
+    if i < top_k:
+        partials.insert(i, partial)
+        del partials[top_k:]
+
+
+def _overlaps(picks: Sequence[_Option], option: _Option) -> bool:
+    return any(option.overlaps(p) for p in picks)
+
+
+def _fill_slot(
+    slot: Slot, options: List[_Option], resolution_ms: int, top_k: int
+) -> Dict[int, List[_Partial]]:
+    """Best fills of one slot by total length in units."""
+    min_ms, max_ms = slot.min_seconds * 1000, slot.max_seconds * 1000
+    max_units = math.floor(max_ms / resolution_ms)
+
+    # table[count][units]: best picks of `count` options lasting `units`
+    table: List[Dict[int, List[_Partial]]] = [{0: [(0.0, ())]}] + [
+        {} for _ in range(slot.max_clips)
+    ]
+    for option in options:
+        # Counts go down so that each option is used at most once
+        for count in range(slot.max_clips - 1, -1, -1):
+            for units, partials in list(table[count].items()):
+                total = units + option.units
+                if total > max_units:
+                    continue
+                for score, picks in partials:
+                    if _overlaps(picks, option):
+                        continue
+                    target = table[count + 1].setdefault(total, [])
+                    _keep(target, (score + option.score, picks + (option,)), top_k)
+
+    fills: Dict[int, List[_Partial]] = {}
+    for count in range(slot.min_clips, slot.max_clips + 1):
+        for units, partials in table[count].items():
+            for partial in partials:
+                if min_ms <= _length_ms(partial[1]) <= max_ms:
+                    _keep(fills.setdefault(units, []), partial, top_k)
+    return fills
+
+
+def optimize_clips(
+    candidates: Mapping[str, ClipsList],
+    slots: Sequence[Slot] = NARRATIVE_SLOTS,
+    *,
+    min_total_seconds: float = 85,
+    max_total_seconds: float = 95,
+    default_score: float = 1.0,
+    resolution_ms: int = 500,
+    top_k: int = 4,
+    logger: Optional[logging.Logger] = None,
+) -> ClipsList:
+    """
+    The highest-scoring trailer: one fill per slot, in slot order (clips of
+    one slot in time order), no two clips overlapping, and the total length
+    between `min_total_seconds` and `max_total_seconds`.
+
+    `candidates` maps slot names to their candidates. Raises `ValueError`
+    when no combination fits.
+    """
+    min_ms, max_ms = min_total_seconds * 1000, max_total_seconds * 1000
+    max_units = math.floor(max_ms / resolution_ms)
+    target_ms = (min_total_seconds + max_total_seconds) * 500
+
+    # trailers[units]: best picks for the slots so far, lasting `units`
+    trailers: Dict[int, List[_Partial]] = {0: [(0.0, ())]}
+    for slot in slots:
+        options = _slot_options(
+            slot, candidates[slot.name], resolution_ms, default_score
+        )
+        fills = _fill_slot(slot, options, resolution_ms, top_k)
+        if not fills:
+            raise ValueError(
+                f"No {slot.name} candidates fit {slot.min_clips}-{slot.max_clips} "
+                f"clips of {slot.min_seconds:g}-{slot.max_seconds:g} s"
+            )
+        extended: Dict[int, List[_Partial]] = {}
+        for units, partials in trailers.items():
+            for fill_units, fill_partials in fills.items():
+                total = units + fill_units
+                if total > max_units:
+                    continue
+                for score, picks in partials:
+                    for fill_score, fill in fill_partials:
+                        if any(_overlaps(picks, option) for option in fill):
+                            continue
+                        fill = tuple(sorted(fill, key=lambda o: o.start_ms))
+                        _keep(
+                            extended.setdefault(total, []),
+                            (score + fill_score, picks + fill),
+                            top_k,
+                        )
+        trailers = extended
+
+    finished = [
+        partial
+        for partials in trailers.values()
+        for partial in partials
+        if min_ms <= _length_ms(partial[1]) <= max_ms
+    ]
+    if not finished:
+        raise ValueError(
+            f"No combination of candidates fills every slot within "
+            f"{min_total_seconds:g}-{max_total_seconds:g} s"
+        )
+
+    score, picks = min(
+        finished, key=lambda p: (-p[0], abs(_length_ms(p[1]) - target_ms))
+    )
+    if logger is not None:
+        logger.info(
+            f"Optimized trailer: {len(picks)} clips, "
+            f"{_length_ms(picks) / 1000:.1f} s, score {score:g}"
+        )
+        for option in picks:
+            logger.info(
+                f"  {option.slot}: {option.clip.start} --> {option.clip.end} "
+                f"({(option.end_ms - option.start_ms) / 1000:.1f} s, "
+                f"score {option.score:g})"
+            )
+    return ClipsList(clips=[option.clip for option in picks])
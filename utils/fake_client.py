@@ -0,0 +1,171 @@
+"""
+A local stand-in for `genai.Client` used to exercise the pipeline offline.
+
+It answers `client.models.generate_content(...)` without network access, can
+raise scripted errors first (e.g. 429s and 503s) and records every call, so
+rate limiting, retries and timeouts can be checked end to end. Its
+`caches.create(...)` keeps context caches in memory the way Gemini's do, and
+an optional prefill delay per uncached prompt token shows what they save.
+"""
+
+from collections import deque
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from utils.utils import estimate_tokens
+
+# '[#ID ]HH:MM:SS,mmm --> HH:MM:SS,mmm [Speaker] text', text optionally on the
+# next line
+_PROMPT_LINE = re.compile(
+    r"^(?:#(\d+) )?(\d\d:\d\d:\d\d,\d{3}) --> (\d\d:\d\d:\d\d,\d{3})"
+    r"(?: \[[^\]]*\])?[ \t]*(.*)$",
+    re.MULTILINE,
+)
+
+
+def fake_clips_response(prompt: str, max_clips: int = 4) -> str:
+    """
+    A valid `ClipsList` JSON response built from the timestamped lines of
+    `prompt`: up to `max_clips` of them, chosen with the prompt as seed.
+    When the lines are numbered ("#12 ..."), the response is a
+    `SegmentSelectionList` of single segments instead.
+    """
+    candidates = []
+    for match in _PROMPT_LINE.finditer(prompt):
+        segment_id, start, end, text = match.groups()
+        if not text:
+            following = prompt[match.end() + 1 :].split("\n", 1)[0]
+            text = following.strip()
+        if start < end:
+            candidates.append((start, end, text.strip(), segment_id))
+
+    seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+    picked = random.Random(seed).sample(candidates, min(max_clips, len(candidates)))
+    clips = [
+        (
+            {"start": start, "end": end, "transcript_text": text, "notes": "fake"}
+            if segment_id is None
+            else {
+                "first_segment": int(segment_id),
+                "last_segment": int(segment_id),
+                "notes": "fake",
+            }
+        )
+        for start, end, text, segment_id in sorted(picked)
+    ]
+    return json.dumps({"clips": clips})
+
+
+class FakeAPIError(Exception):
+    """An API error carrying an HTTP status `code`, like google-genai's APIError."""
+
+    def __init__(self, code: int, message: str = ""):
+        super().__init__(f"{code} {message}".strip())
+        self.code = code
+
+
+class FakeGenAIClient:
+    """
+    Fake client whose `models.generate_content` returns `respond(prompt)`;
+    `models.generate_content_stream` returns the same text in chunks.
+
+    - respond: response text, or a function of the prompt returning it
+    - failures: exceptions raised, in order, before any response is returned
+    - latency: seconds each call takes (before the first chunk when streaming)
+    - prefill_seconds_per_1k_tokens: extra seconds per 1,000 prompt tokens
+      not served from a context cache, like a real model's prefill (creating
+      a cache costs the same for its contents)
+    - chunk_chars / chunk_delay: size of and pause between streamed chunks
+
+    A request whose config names a `cached_content` is answered as if the
+    cached contents came before its own, so responses don't change when
+    caching is turned on.
+    """
+
+    def __init__(
+        self,
+        respond: Union[str, Callable[[str], str]] = '{"clips": []}',
+        *,
+        failures: Iterable[BaseException] = (),
+        latency: float = 0.0,
+        prefill_seconds_per_1k_tokens: float = 0.0,
+        chunk_chars: int = 64,
+        chunk_delay: float = 0.0,
+    ):
+        self._respond = respond if callable(respond) else (lambda _: respond)
+        self._failures = deque(failures)
+        self.latency = latency
+        self.prefill_seconds_per_1k_tokens = prefill_seconds_per_1k_tokens
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.calls: List[dict] = []
+        # Context cache name -> cached text
+        self.cached_contents: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.models = self
+        self.caches = SimpleNamespace(create=self._create_cache)
+
+    def _create_cache(self, *, model: str, config) -> SimpleNamespace:
+        # Caching processes the contents once, like a prompt's prefill
+        contents = "".join(config["contents"])
+        if self.prefill_seconds_per_1k_tokens:
+            time.sleep(
+                self.prefill_seconds_per_1k_tokens * estimate_tokens(contents) / 1000
+            )
+        with self._lock:
+            name = f"cachedContents/fake-{len(self.cached_contents) + 1}"
+            self.cached_contents[name] = contents
+        return SimpleNamespace(name=name, model=model)
+
+    def _start_call(self, model: str, contents: str, config) -> Tuple[str, str]:
+        """Record and wait out a call; returns the whole prompt and its cached part."""
+        with self._lock:
+            self.calls.append({"model": model, "contents": contents, "config": config})
+            failure: Optional[BaseException] = (
+                self._failures.popleft() if self._failures else None
+            )
+            name = (config or {}).get("cached_content")
+            cached = self.cached_contents[name] if name else ""
+        delay = self.latency
+        delay += self.prefill_seconds_per_1k_tokens * estimate_tokens(contents) / 1000
+        if delay:
+            time.sleep(delay)
+        if failure is not None:
+            raise failure
+        return cached + contents, cached
+
+    @staticmethod
+    def _usage(prompt: str, cached: str, text: str) -> SimpleNamespace:
+        return SimpleNamespace(
+            prompt_token_count=estimate_tokens(prompt),
+            candidates_token_count=estimate_tokens(text),
+            cached_content_token_count=estimate_tokens(cached) if cached else None,
+        )
+
+    def generate_content(self, *, model: str, contents: str, config=None):
+        prompt, cached = self._start_call(model, contents, config)
+        text = self._respond(prompt)
+        return SimpleNamespace(
+            text=text, usage_metadata=self._usage(prompt, cached, text)
+        )
+
+    def generate_content_stream(self, *, model: str, contents: str, config=None):
+        # Like the real client, nothing is sent until the first chunk is pulled
+        prompt, cached = self._start_call(model, contents, config)
+        text = self._respond(prompt)
+        starts = range(0, len(text), self.chunk_chars)
+        for start in starts:
+            if start and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            # Usage is reported on the last chunk, as Gemini does
+            last = start == starts[-1]
+            yield SimpleNamespace(
+                text=text[start : start + self.chunk_chars],
+                usage_metadata=self._usage(prompt, cached, text) if last else None,
+            )
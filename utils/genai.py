@@ -1,15 +1,125 @@
 """Utilities for working with GenAI responses in the narrative workflow."""
 
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 from pathlib import Path
 import logging
-from typing import Type
+import string
+import time
+from typing import Any, Callable, Generator, Mapping, Optional, Type, get_args
 
-from models.data_models import ClipsList
+from models.data_models import ClipSelection, ClipsList, SegmentSelectionList
+from models.transcript import Transcript
+from utils.cache import ResponseCache
+from utils.chunking import merge_clip_lists, split_windows
+from utils.json_stream import ArrayItemParser
+from utils.providers import Completion, LLMProvider
+from utils.request_layer import CallStats, RequestLayer
+from utils.segment_ids import rebuild_clip, rebuild_clips
+from utils.telemetry import RequestRecord, Telemetry
+from utils.utils import estimate_tokens
+
+
+def _cache_key(
+    provider: LLMProvider, schema: Type[ClipsList], model_name: str, prompt: str
+) -> str:
+    return ResponseCache.make_key(
+        model_name=f"{provider.name}:{model_name}",
+        prompt=prompt,
+        schema=schema.model_json_schema(),
+        config={"response_mime_type": "application/json"},
+    )
+
+
+def _parse_response(
+    response_text: str,
+    schema: Type[ClipsList],
+    segments: Optional[Transcript],
+    logger: logging.Logger,
+) -> ClipsList:
+    if segments is None:
+        return schema.model_validate_json(response_text)
+    selections = SegmentSelectionList.model_validate_json(response_text)
+    return rebuild_clips(selections, segments, logger)
+
+
+def _write_result(
+    result: ClipsList,
+    *,
+    extract_label: str,
+    detail_label: str,
+    output_path: Path,
+    logger: logging.Logger,
+) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Extracted {len(result.clips)} {extract_label}")
+    logger.debug(f"{detail_label}: {result.model_dump_json(indent=2)}")
+    output_path.write_text(result.model_dump_json(indent=2), encoding="utf-8")
+    logger.info(f"Wrote clip selections to {output_path}")
+
+
+def _send(
+    request: Callable[[], Any],
+    *,
+    request_layer: Optional[RequestLayer],
+    prompt: str,
+    timeout: Optional[float],
+    label: str,
+    stats: CallStats,
+    stream: bool = False,
+) -> Any:
+    if request_layer is None:
+        stats.attempts = 1
+        return request()
+    return request_layer.call(
+        request,
+        estimated_tokens=estimate_tokens(prompt),
+        timeout=timeout,
+        label=label,
+        stats=stats,
+        stream=stream,
+    )
+
+
+def _record_request(
+    telemetry: Optional[Telemetry],
+    *,
+    stage: Optional[str],
+    output_path: Path,
+    provider: LLMProvider,
+    model_name: str,
+    started: Optional[float] = None,
+    stats: Optional[CallStats] = None,
+    ttft: Optional[float] = None,
+    usage: Optional[Completion] = None,
+    error: Optional[BaseException] = None,
+) -> None:
+    """Record one request; without `started` it was served from the cache."""
+    if telemetry is None:
+        return
+    record = RequestRecord(
+        stage=stage or output_path.stem,
+        output=output_path.name,
+        provider=provider.name,
+        model=model_name,
+        cache_hit=started is None,
+        ttft_seconds=ttft,
+        error=None if error is None else f"{type(error).__name__}: {error}",
+    )
+    if started is not None:
+        record.queue_seconds = stats.queued_seconds
+        record.latency_seconds = time.perf_counter() - started - stats.queued_seconds
+        record.retries = max(stats.attempts - 1, 0)
+    if usage is not None:
+        record.prompt_tokens = usage.prompt_tokens
+        record.completion_tokens = usage.completion_tokens
+        record.cached_tokens = usage.cached_tokens
+    telemetry.record(record)
 
 
 def generate_clips_step(
     *,
-    client,
+    provider: LLMProvider,
     model_name: str,
     prompt: str,
     start_log: str,
@@ -18,25 +128,395 @@ def generate_clips_step(
     output_path: Path,
     logger: logging.Logger,
     schema: Type[ClipsList] = ClipsList,
+    cache: Optional[ResponseCache] = None,
+    request_layer: Optional[RequestLayer] = None,
+    timeout: Optional[float] = None,
+    stream: bool = False,
+    telemetry: Optional[Telemetry] = None,
+    stage: Optional[str] = None,
+    prefix: Optional[str] = None,
+    segments: Optional[Transcript] = None,
+    on_clip: Optional[Callable[[ClipSelection], Any]] = None,
 ) -> ClipsList:
     """
     Run a GenAI content generation call, log key details, and persist the JSON response.
+
+    `provider` is the backend that answers (Gemini, OpenAI or the offline
+    fake) and `model_name` the model it runs.
+
+    When a `cache` is given, a previous response for the same model, prompt,
+    schema and config is reused instead of calling the API. When a
+    `request_layer` is given, the call is paced, retried and limited to
+    `timeout` seconds per attempt. With `stream=True` the response is read
+    through `stream_clips_step`. Each request, cached or not, is recorded in
+    `telemetry` under `stage` (default: the output file name). `prefix` is
+    the start of `prompt` that other requests share, which the provider may
+    serve from its context cache.
+
+    With `segments`, the prompt lists that transcript with numbered segments
+    and the model answers with segment ID ranges (`SegmentSelectionList`),
+    which are rebuilt into clips locally (see `utils/segment_ids.py`).
+
+    `on_clip` is called with every clip of the response: with `stream=True`
+    as soon as the clip has arrived, while the rest is still generated,
+    otherwise once the response is complete.
     """
+    if stream:
+        clips = stream_clips_step(
+            provider=provider,
+            model_name=model_name,
+            prompt=prompt,
+            start_log=start_log,
+            extract_label=extract_label,
+            detail_label=detail_label,
+            output_path=output_path,
+            logger=logger,
+            schema=schema,
+            cache=cache,
+            request_layer=request_layer,
+            timeout=timeout,
+            telemetry=telemetry,
+            stage=stage,
+            prefix=prefix,
+            segments=segments,
+        )
+        while True:
+            try:
+                clip = next(clips)
+            except StopIteration as done:
+                return done.value
+            if on_clip is not None:
+                on_clip(clip)
+
     logger.info(start_log)
+    request_schema = schema if segments is None else SegmentSelectionList
+    cache_key = _cache_key(provider, request_schema, model_name, prompt)
 
-    response = client.models.generate_content(
-        model=model_name,
-        contents=prompt,
-        config={
-            "response_mime_type": "application/json",
-            "response_json_schema": schema.model_json_schema(),
-        },
+    record = dict(
+        stage=stage, output_path=output_path, provider=provider, model_name=model_name
+    )
+
+    response_text = None
+    if cache is not None:
+        response_text = cache.get(cache_key)
+        if response_text is not None:
+            logger.info(f"Using cached response for {output_path.name}")
+            _record_request(telemetry, **record)
+
+    if response_text is None:
+        stats = CallStats()
+        started = time.perf_counter()
+        try:
+            completion = _send(
+                lambda: provider.generate(
+                    model_name, prompt, request_schema, prefix=prefix
+                ),
+                request_layer=request_layer,
+                prompt=prompt,
+                timeout=timeout,
+                label=output_path.name,
+                stats=stats,
+            )
+        except Exception as exc:
+            _record_request(
+                telemetry, **record, started=started, stats=stats, error=exc
+            )
+            raise
+        _record_request(
+            telemetry, **record, started=started, stats=stats, usage=completion
+        )
+        response_text = completion.text
+        if cache is not None:
+            cache.put(cache_key, response_text, model_name=model_name)
+
+    result = _parse_response(response_text, schema, segments, logger)
+    if on_clip is not None:
+        for clip in result.clips:
+            on_clip(clip)
+    _write_result(
+        result,
+        extract_label=extract_label,
+        detail_label=detail_label,
+        output_path=output_path,
+        logger=logger,
+    )
+    return result
+
+
+def stream_clips_step(
+    *,
+    provider: LLMProvider,
+    model_name: str,
+    prompt: str,
+    start_log: str,
+    extract_label: str,
+    detail_label: str,
+    output_path: Path,
+    logger: logging.Logger,
+    schema: Type[ClipsList] = ClipsList,
+    cache: Optional[ResponseCache] = None,
+    request_layer: Optional[RequestLayer] = None,
+    timeout: Optional[float] = None,
+    telemetry: Optional[Telemetry] = None,
+    stage: Optional[str] = None,
+    prefix: Optional[str] = None,
+    segments: Optional[Transcript] = None,
+) -> Generator[ClipSelection, None, ClipsList]:
+    """
+    Streaming version of `generate_clips_step`.
+
+    Yields each validated clip as soon as its JSON object is complete, so
+    consumers can start before generation finishes. Once the stream ends the
+    whole response is validated, cached and written like the non-streaming
+    call, and the `ClipsList` is the generator's return value
+    (`result = yield from stream_clips_step(...)`).
+
+    The request layer covers opening the stream up to the first chunk; an
+    error after clips have been yielded is raised to the consumer instead of
+    being retried. With `segments`, each segment range is rebuilt into a
+    clip as soon as it arrives.
+    """
+    logger.info(start_log)
+    request_schema = schema if segments is None else SegmentSelectionList
+    cache_key = _cache_key(provider, request_schema, model_name, prompt)
+    item_model = get_args(request_schema.model_fields["clips"].annotation)[0]
+
+    record = dict(
+        stage=stage, output_path=output_path, provider=provider, model_name=model_name
+    )
+
+    response_text = cache.get(cache_key) if cache is not None else None
+    if response_text is not None:
+        logger.info(f"Using cached response for {output_path.name}")
+        _record_request(telemetry, **record)
+        result = _parse_response(response_text, schema, segments, logger)
+        yield from result.clips
+    else:
+        stats = CallStats()
+        started = time.perf_counter()
+        ttft = None
+
+        def open_stream():
+            nonlocal ttft
+            attempt_started = time.perf_counter()
+            chunks = iter(
+                provider.stream(model_name, prompt, request_schema, prefix=prefix)
+            )
+            # Pull the first chunk here so that failures to connect are
+            # retried and timed out like any other request
+            first = next(chunks, None)
+            ttft = time.perf_counter() - attempt_started
+            return itertools.chain([first] if first is not None else [], chunks)
+
+        parser = ArrayItemParser()
+        parts = []
+        usage = None
+        try:
+            chunks = _send(
+                open_stream,
+                request_layer=request_layer,
+                prompt=prompt,
+                timeout=timeout,
+                label=output_path.name,
+                stats=stats,
+                stream=True,
+            )
+            for chunk in chunks:
+                parts.append(chunk.text)
+                if chunk.prompt_tokens is not None:
+                    usage = chunk
+                for item in parser.feed(chunk.text):
+                    clip = item_model.model_validate(item)
+                    if segments is not None:
+                        clip = rebuild_clip(clip, segments)
+                        if clip is None:
+                            continue
+                    logger.debug(f"Received clip {clip.start} --> {clip.end}")
+                    yield clip
+        except Exception as exc:
+            _record_request(
+                telemetry, **record, started=started, stats=stats, ttft=ttft, error=exc
+            )
+            raise
+        _record_request(
+            telemetry, **record, started=started, stats=stats, ttft=ttft, usage=usage
+        )
+
+        response_text = "".join(parts)
+        result = _parse_response(response_text, schema, segments, logger)
+        if cache is not None:
+            cache.put(cache_key, response_text, model_name=model_name)
+
+    _write_result(
+        result,
+        extract_label=extract_label,
+        detail_label=detail_label,
+        output_path=output_path,
+        logger=logger,
     )
+    return result
+
+
+def generate_clips_map_reduce(
+    *,
+    provider: LLMProvider,
+    model_name: str,
+    template: str,
+    transcript: Transcript,
+    start_log: str,
+    extract_label: str,
+    detail_label: str,
+    output_path: Path,
+    logger: logging.Logger,
+    token_budget: Optional[int],
+    overlap_tokens: int = 0,
+    max_workers: int = 4,
+    format_kwargs: Optional[Mapping[str, Any]] = None,
+    prefix_template: Optional[str] = None,
+    segment_ids: bool = False,
+    reduce_template: Optional[str] = None,
+    schema: Type[ClipsList] = ClipsList,
+    cache: Optional[ResponseCache] = None,
+    request_layer: Optional[RequestLayer] = None,
+    timeout: Optional[float] = None,
+    stream: bool = False,
+    telemetry: Optional[Telemetry] = None,
+    stage: Optional[str] = None,
+    on_clip: Optional[Callable[[ClipSelection], Any]] = None,
+) -> ClipsList:
+    """
+    Run `template` over a transcript, splitting it into windows when it is
+    larger than `token_budget`.
+
+    Map: each window is rendered into `template` (as `{transcript}`, alongside
+    `format_kwargs`) and sent in parallel; results land next to `output_path`
+    as `<name>.partNN.json`. Reduce: the window results are merged and
+    deduplicated into one list. If `reduce_template` is given, the merged
+    candidates are sent through it once more to pick the final selection.
+    A transcript that fits the budget is sent in a single request as before.
+
+    With a `prefix_template`, the window is rendered into it instead and
+    `template` only holds the instructions that follow. Stages using the
+    same prefix template, transcript and chunking send identical prefixes,
+    which the provider can cache once for all of them.
+
+    With `segment_ids`, windows are rendered with numbered segments and the
+    map requests are answered by segment ID (`template` has to ask for
+    that); the reduce request still works on the merged clips' text.
+
+    `on_clip` is called with the clips of every request, as in
+    `generate_clips_step`.
+    """
+    format_kwargs = dict(format_kwargs or {})
+    fields = {name for _, name, _, _ in string.Formatter().parse(template) if name}
+    if prefix_template is None and "transcript" not in fields:
+        # `str.format` ignores the unused transcript, so the prompt would
+        # silently go out without it
+        raise ValueError(
+            "The template has no {transcript} placeholder; pass the "
+            "prefix_template that holds the transcript"
+        )
+
+    def render(window: range) -> dict:
+        text = transcript.render(window, numbered=segment_ids)
+        kwargs = {"segments": transcript} if segment_ids else {}
+        if prefix_template is None:
+            prompt = template.format(transcript=text, **format_kwargs)
+            return {"prompt": prompt, **kwargs}
+        prefix = prefix_template.format(transcript=text, **format_kwargs)
+        prompt = prefix + template.format(**format_kwargs)
+        return {"prompt": prompt, "prefix": prefix, **kwargs}
+
+    step_kwargs = dict(
+        provider=provider,
+        model_name=model_name,
+        extract_label=extract_label,
+        detail_label=detail_label,
+        logger=logger,
+        schema=schema,
+        cache=cache,
+        request_layer=request_layer,
+        timeout=timeout,
+        stream=stream,
+        telemetry=telemetry,
+        stage=stage,
+        on_clip=on_clip,
+    )
+
+    windows = (
+        split_windows(transcript, token_budget, overlap_tokens)
+        if token_budget
+        else [range(0, len(transcript))]
+    )
+    if len(windows) == 1:
+        return generate_clips_step(
+            **render(windows[0]),
+            start_log=start_log,
+            output_path=output_path,
+            **step_kwargs,
+        )
+
+    logger.info(f"{start_log} ({len(windows)} windows of <= {token_budget} tokens)")
+
+    def run_window(item):
+        number, window = item
+        return generate_clips_step(
+            **render(window),
+            start_log=f"Window {number}/{len(windows)}: segments "
+            f"{window.start}-{window.stop - 1}",
+            output_path=output_path.with_name(
+                f"{output_path.stem}.part{number:02d}{output_path.suffix}"
+            ),
+            **step_kwargs,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partials = list(executor.map(run_window, enumerate(windows, start=1)))
+
+    merged = merge_clip_lists(partials)
+    logger.info(
+        f"Merged {sum(len(p.clips) for p in partials)} window results "
+        f"into {len(merged.clips)} {extract_label}"
+    )
+
+    if reduce_template is not None:
+        return generate_clips_step(
+            prompt=reduce_template.format(
+                transcript=merged.to_prompt(), **format_kwargs
+            ),
+            start_log=f"Selecting final {extract_label} from merged candidates",
+            output_path=output_path,
+            **step_kwargs,
+        )
 
-    result = schema.model_validate_json(response.text)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    logger.info(f"Extracted {len(result.clips)} {extract_label}")
-    logger.info(f"{detail_label}: {result.model_dump_json(indent=2)}")
-    output_path.write_text(result.model_dump_json(indent=2), encoding="utf-8")
+    output_path.write_text(merged.model_dump_json(indent=2), encoding="utf-8")
     logger.info(f"Wrote clip selections to {output_path}")
-    return result
+    return merged
+
+
+def load_clips(path: Path, schema: Type[ClipsList] = ClipsList) -> ClipsList:
+    """Read back a clip selection previously written by `generate_clips_step`."""
+    return schema.model_validate_json(path.read_text(encoding="utf-8"))
+
+
+def render_clips_for_prompt(
+    clips_list: ClipsList,
+    *,
+    label: str,
+    logger: logging.Logger,
+    include_notes: bool = False,
+) -> str:
+    """
+    Render clips compactly for a downstream prompt and log the size saved
+    compared to formatting the model directly.
+    """
+    rendered = clips_list.to_prompt(include_notes=include_notes)
+    baseline = str(clips_list.clips)
+    saved = 1 - len(rendered) / len(baseline) if baseline else 0.0
+    logger.info(
+        f"Rendered {label}: {len(rendered):,} chars "
+        f"(~{estimate_tokens(rendered):,} tokens) instead of {len(baseline):,} chars "
+        f"(~{estimate_tokens(baseline):,} tokens), {saved:.0%} smaller"
+    )
+    return rendered
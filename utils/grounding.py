@@ -0,0 +1,283 @@
+"""
+Check AI-selected clips against the transcript before they become timeline
+cuts.
+
+Models often return timestamps that fall between segment boundaries, or
+`transcript_text` that is paraphrased, or quoted from another part of the
+episode. `TranscriptGrounder` fixes what it can and rejects the rest:
+
+- The text is located with a word-bigram index over the whole transcript:
+  the quote's rarest bigrams vote for where it starts, and it counts as
+  grounded there when enough of all its bigrams are found around that
+  start. Punctuation, case and a few changed words don't matter.
+- Timestamps are found in the transcript's interval index and snapped to
+  the segment bound next to them, or else to the nearest word. Word times
+  are interpolated within each segment, as the transcript only times
+  segments.
+- If the text is found somewhere the timestamps don't cover, the clip is
+  moved to where the text is. Clips whose text can't be found, or whose
+  timestamps are far from any speech, are rejected.
+
+Building the index is linear in the transcript. Checking a clip costs a
+fixed number of index lookups plus one pass over its words, however long
+the episode. Results are kept per clip, so clips checked while a response
+streams in aren't checked again when the finished list is grounded.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from heapq import nsmallest
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from models.data_models import ClipSelection, ClipsList
+from models.transcript import Transcript
+from utils.utils import ms_to_timestamp, timestamp_to_ms
+
+_WORD_RE = re.compile(r"\w+")
+# Speaker labels and sound tags, e.g. "[Host]" or "[laughs]"
+_TAG_RE = re.compile(r"\[[^\]]*\]")
+
+GROUNDING_STATUSES = ("ok", "snapped", "relocated", "rejected")
+
+# Bigrams this frequent ("you know") say little about where a quote is
+_MAX_POSITIONS = 256
+# Width, in words, of the buckets the start votes are counted in
+_BUCKET = 8
+# Bigrams of a quote that vote for its location
+_SEEDS = 8
+
+
+def _normalize(text: str) -> str:
+    return _TAG_RE.sub(" ", text.lower().replace("'", "").replace("\u2019", ""))
+
+
+def normalize_words(text: str) -> List[str]:
+    """Lowercase words without punctuation or tags; "[Host] Don't" -> ["dont"]."""
+    return _WORD_RE.findall(_normalize(text))
+
+
+@dataclass
+class GroundingResult:
+    """
+    Outcome for one clip:
+    - status: "ok", "snapped" (timestamps moved to segment or word bounds),
+      "relocated" (moved to where its text is) or "rejected"
+    - clip: the clip to use, None when rejected
+    - text_score: share of the quote found in place, None without text
+    """
+
+    status: str
+    clip: Optional[ClipSelection]
+    text_score: Optional[float] = None
+    reason: str = ""
+
+
+class TranscriptGrounder:
+    """
+    Word and segment indexes over one transcript.
+
+    - min_text_score: share of a quote's bigrams that must be found in place
+      for the text to count as grounded
+    - max_snap_ms: how far a timestamp may move to reach a segment bound; a
+      timestamp farther from one snaps to the nearest word instead, and one
+      this far from any speech is rejected
+    """
+
+    def __init__(
+        self,
+        transcript: Transcript,
+        min_text_score: float = 0.6,
+        max_snap_ms: int = 1_500,
+    ):
+        self.transcript = transcript
+        self.min_text_score = min_text_score
+        self.max_snap_ms = max_snap_ms
+        self._checked: Dict[str, GroundingResult] = {}
+
+        # The transcript only times segments; word times are interpolated by
+        # character offset within their segment
+        self._words: List[str] = []
+        self._segment_words = array("q")
+        self._word_start_ms = array("q")
+        self._word_end_ms = array("q")
+        self._bigrams: Dict[Tuple[str, str], array] = {}
+        previous = None
+        for i in range(len(transcript)):
+            self._segment_words.append(len(self._word_start_ms))
+            start, end = transcript.start_ms[i], transcript.end_ms[i]
+            text = _normalize(transcript.text(i))
+            scale = (end - start) / max(len(text), 1)
+            for match in _WORD_RE.finditer(text):
+                word = match.group()
+                position = len(self._words)
+                self._words.append(word)
+                self._word_start_ms.append(start + round(match.start() * scale))
+                self._word_end_ms.append(start + round(match.end() * scale))
+                if previous is not None:
+                    positions = self._bigrams.get((previous, word))
+                    if positions is None:
+                        positions = self._bigrams[(previous, word)] = array("q")
+                    positions.append(position - 1)
+                previous = word
+        self._segment_words.append(len(self._word_start_ms))
+
+    def locate(self, text: str) -> Tuple[Optional[range], Optional[float]]:
+        """
+        Word positions of the best match for `text`, and the share of its
+        bigrams found there. The score is None when the text is too short or
+        too common to tell where it is.
+        """
+        words = normalize_words(text)
+        grams = list(zip(words, words[1:]))
+
+        # The quote's rarest bigrams vote for where it starts; a dropped or
+        # added word moves the vote one bucket
+        indexed = []
+        common = False
+        for k, gram in enumerate(grams):
+            positions = self._bigrams.get(gram)
+            if positions is None:
+                continue
+            if len(positions) > _MAX_POSITIONS:
+                common = True
+                continue
+            indexed.append((k, positions))
+        if not indexed:
+            return None, (None if common or not grams else 0.0)
+        votes: Counter = Counter()
+        for k, positions in nsmallest(_SEEDS, indexed, key=lambda i: len(i[1])):
+            votes.update({(p - k) // _BUCKET for p in positions})
+        best = max(votes, key=lambda b: votes[b] + votes.get(b + 1, 0))
+
+        # Then every bigram of the quote is looked up around that start
+        first = max(best * _BUCKET - _BUCKET, 0)
+        window = self._words[first : best * _BUCKET + len(words) + 2 * _BUCKET]
+        found: Dict[Tuple[str, str], int] = {}
+        for offset, gram in enumerate(zip(window, window[1:])):
+            found.setdefault(gram, first + offset)
+        matched = [found[gram] for gram in grams if gram in found]
+        if not matched:
+            return None, 0.0
+        return range(min(matched), max(matched) + 2), len(matched) / len(grams)
+
+    def _snap(self, ms: int, bounds: array, words: array) -> Optional[int]:
+        """
+        Move `ms` to the nearest segment bound (`start_ms` or `end_ms`) within
+        `max_snap_ms`, else to the nearest word bound of its segment. None if
+        it is farther than `max_snap_ms` from any speech.
+        """
+        t = self.transcript
+        segment = t.segment_at(ms)
+        if segment is None:
+            segment = t.nearest_segment(ms)
+            if segment is None or min(
+                abs(t.start_ms[segment] - ms), abs(t.end_ms[segment] - ms)
+            ) > self.max_snap_ms:
+                return None
+        if abs(bounds[segment] - ms) <= self.max_snap_ms:
+            return bounds[segment]
+        first, last = self._segment_words[segment], self._segment_words[segment + 1]
+        if first == last:
+            return bounds[segment]
+        i = bisect_left(words, ms, first, last)
+        nearest = min(
+            (j for j in (i - 1, i) if first <= j < last),
+            key=lambda j: abs(words[j] - ms),
+        )
+        return words[nearest]
+
+    def check(self, clip: ClipSelection) -> GroundingResult:
+        """Fix or reject one clip; a clip checked before isn't checked again."""
+        key = clip.model_dump_json()
+        result = self._checked.get(key)
+        if result is None:
+            result = self._checked[key] = self._check(clip)
+        return result
+
+    def _check(self, clip: ClipSelection) -> GroundingResult:
+        t = self.transcript
+        start_ms, end_ms = timestamp_to_ms(clip.start), timestamp_to_ms(clip.end)
+
+        located, text_score = self.locate(clip.transcript_text)
+        if text_score is not None and text_score < self.min_text_score:
+            return GroundingResult(
+                "rejected",
+                None,
+                text_score,
+                f"text not found in transcript ({text_score:.0%} matched)",
+            )
+
+        if located is not None:
+            text_start = self._word_start_ms[located.start]
+            text_end = self._word_end_ms[located[-1]]
+            # Interpolated word times are approximate, so allow some slack
+            if (
+                start_ms > text_end + self.max_snap_ms
+                or end_ms < text_start - self.max_snap_ms
+            ):
+                fixed = self._with_bounds(clip, text_start, text_end)
+                return GroundingResult(
+                    "relocated",
+                    fixed,
+                    text_score,
+                    f"text is at {fixed.start} --> {fixed.end}",
+                )
+
+        snapped_start = self._snap(start_ms, t.start_ms, self._word_start_ms)
+        snapped_end = self._snap(end_ms, t.end_ms, self._word_end_ms)
+        if located is not None:
+            # A timestamp past the speech is replaced by where the text is
+            if snapped_start is None:
+                snapped_start = text_start
+            if snapped_end is None:
+                snapped_end = text_end
+        if snapped_start is None or snapped_end is None:
+            return GroundingResult(
+                "rejected",
+                None,
+                text_score,
+                f"more than {self.max_snap_ms} ms away from any speech",
+            )
+        if snapped_end <= snapped_start:
+            return GroundingResult(
+                "rejected", None, text_score, "no speech between the timestamps"
+            )
+
+        fixed = self._with_bounds(clip, snapped_start, snapped_end)
+        if (fixed.start, fixed.end) == (clip.start, clip.end):
+            return GroundingResult("ok", clip, text_score)
+        return GroundingResult(
+            "snapped",
+            fixed,
+            text_score,
+            f"{clip.start} --> {clip.end} snapped to {fixed.start} --> {fixed.end}",
+        )
+
+    @staticmethod
+    def _with_bounds(clip: ClipSelection, start_ms: int, end_ms: int) -> ClipSelection:
+        return clip.model_copy(
+            update={"start": ms_to_timestamp(start_ms), "end": ms_to_timestamp(end_ms)}
+        )
+
+    def ground(
+        self, clips: ClipsList, logger: Optional[logging.Logger] = None
+    ) -> Tuple[ClipsList, List[GroundingResult]]:
+        """Fix or reject every clip; returns the kept clips and all results."""
+        results = [self.check(clip) for clip in clips.clips]
+        kept = ClipsList(clips=[r.clip for r in results if r.clip is not None])
+        if logger is not None:
+            counts = Counter(r.status for r in results)
+            logger.info(
+                "Grounded clips against the transcript: "
+                + ", ".join(f"{counts[s]} {s}" for s in GROUNDING_STATUSES)
+            )
+            for clip, r in zip(clips.clips, results):
+                if r.status in ("relocated", "rejected"):
+                    logger.warning(
+                        f"Clip {clip.start} --> {clip.end} {r.status}: {r.reason}"
+                    )
+        return kept, results
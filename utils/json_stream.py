@@ -0,0 +1,61 @@
+"""
+Incremental parsing of streamed structured-output JSON.
+
+Structured responses look like `{"clips": [{...}, {...}]}`. `ArrayItemParser`
+is fed the text chunks as they arrive and returns each array item as soon as
+its closing brace is seen, without re-scanning earlier text.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+class ArrayItemParser:
+    """
+    Pull the objects inside the top-level object's arrays out of a JSON stream.
+
+    Only string state and bracket nesting are tracked while scanning; each
+    complete item is decoded with `json.loads`, so malformed items still raise.
+    """
+
+    def __init__(self):
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._item_parts: Optional[List[str]] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume the next chunk and return the items completed in it."""
+        items: List[Dict[str, Any]] = []
+        item_start = 0 if self._item_parts is not None else None
+
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._stack == ["{", "["]:
+                    self._item_parts = []
+                    item_start = i
+                self._stack.append(char)
+            elif char in "}]":
+                if not self._stack:
+                    raise ValueError("Unbalanced JSON in stream")
+                self._stack.pop()
+                if char == "}" and self._stack == ["{", "["]:
+                    self._item_parts.append(chunk[item_start : i + 1])
+                    items.append(json.loads("".join(self._item_parts)))
+                    self._item_parts = None
+                    item_start = None
+
+        if self._item_parts is not None:
+            self._item_parts.append(chunk[item_start:])
+        return items
@@ -0,0 +1,171 @@
+"""
+Probe source media with ffprobe, once per file version.
+
+`MediaProber` reads each file's duration, frame rate, start timecode and
+stream layout (`MediaInfo`) and keeps the result on disk, keyed by the
+file's path, size and mtime. Re-runs and batch jobs over the same footage
+don't start ffprobe again until a file is replaced or modified.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import subprocess
+import tempfile
+import threading
+from typing import Dict, Iterable, Optional
+
+from models.data_models import MediaInfo
+
+
+def media_cache_key(path: Path) -> str:
+    """Changes whenever the file at `path` is replaced or modified."""
+    stat = path.stat()
+    key = f"{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def media_versions(file_paths: Iterable[str]) -> Dict[str, Optional[str]]:
+    """
+    `media_cache_key` of each file, None for a file that can't be read; as a
+    checkpoint input, it reruns a stage when its media is replaced.
+    """
+    versions: Dict[str, Optional[str]] = {}
+    for file_path in file_paths:
+        try:
+            versions[file_path] = media_cache_key(Path(file_path))
+        except OSError:
+            versions[file_path] = None
+    return versions
+
+
+def _frame_rate(stream: dict) -> Optional[str]:
+    # r_frame_rate is the container's base rate; "0/0" when unknown
+    for field in ("r_frame_rate", "avg_frame_rate"):
+        rate = stream.get(field)
+        if rate and not rate.startswith("0"):
+            return rate
+    return None
+
+
+def parse_ffprobe(file_path: str, output: dict) -> MediaInfo:
+    """`MediaInfo` from `ffprobe -show_format -show_streams` JSON output."""
+    streams = output.get("streams", [])
+    # Cover art and thumbnails are video streams too
+    video = [
+        s
+        for s in streams
+        if s.get("codec_type") == "video"
+        and not s.get("disposition", {}).get("attached_pic")
+    ]
+    audio = [s for s in streams if s.get("codec_type") == "audio"]
+    timecode = output.get("format", {}).get("tags", {}).get("timecode")
+    for stream in streams:
+        timecode = timecode or stream.get("tags", {}).get("timecode")
+    duration = output.get("format", {}).get("duration") or max(
+        (float(s.get("duration", 0)) for s in streams), default=0.0
+    )
+    return MediaInfo(
+        file_path=file_path,
+        duration_seconds=float(duration),
+        frame_rate=_frame_rate(video[0]) if video else None,
+        start_timecode=timecode,
+        video_streams=len(video),
+        audio_channels=[int(s.get("channels", 0)) for s in audio],
+    )
+
+
+class MediaProber:
+    """
+    ffprobe with an on-disk cache.
+
+    - cache_dir: one JSON file per probed file version
+    - ffprobe: the ffprobe executable
+    """
+
+    def __init__(self, cache_dir: Path, ffprobe: str = "ffprobe"):
+        self.cache_dir = Path(cache_dir)
+        self.ffprobe = ffprobe
+        self.probed = 0
+        self._lock = threading.Lock()
+
+    def _run_ffprobe(self, file_path: str) -> MediaInfo:
+        result = subprocess.run(
+            [
+                self.ffprobe,
+                "-v",
+                "error",
+                "-print_format",
+                "json",
+                "-show_format",
+                "-show_streams",
+                file_path,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"ffprobe could not read {file_path}: {result.stderr.strip()}"
+            )
+        with self._lock:
+            self.probed += 1
+        return parse_ffprobe(file_path, json.loads(result.stdout))
+
+    def probe(self, file_path: str) -> MediaInfo:
+        """The file's `MediaInfo`, from the cache unless the file changed."""
+        path = self.cache_dir / f"{media_cache_key(Path(file_path))}.json"
+        if path.exists():
+            try:
+                return MediaInfo.model_validate_json(path.read_text(encoding="utf-8"))
+            except ValueError:
+                pass  # Unreadable entry; probe again and overwrite it
+        info = self._run_ffprobe(file_path)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(info.model_dump_json(indent=2))
+        os.replace(tmp, path)
+        return info
+
+    def probe_all(
+        self,
+        file_paths: Iterable[str],
+        logger: Optional[logging.Logger] = None,
+        max_workers: int = 4,
+    ) -> Dict[str, MediaInfo]:
+        """
+        Probe files in parallel. Files that can't be probed (missing file or
+        ffprobe) are left out, with a warning.
+        """
+        file_paths = list(dict.fromkeys(file_paths))
+        probed = self.probed
+
+        def attempt(file_path: str) -> Optional[MediaInfo]:
+            try:
+                return self.probe(file_path)
+            except (OSError, RuntimeError, ValueError) as exc:
+                if logger is not None:
+                    logger.warning(
+                        f"Could not probe {file_path}, using the configured frame "
+                        f"rate and clip extents: {type(exc).__name__}: {exc}"
+                    )
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(zip(file_paths, executor.map(attempt, file_paths)))
+        media = {path: info for path, info in results.items() if info is not None}
+        if logger is not None and media:
+            logger.info(
+                f"Probed {len(media)} media files ({self.probed - probed} with "
+                f"ffprobe, the rest cached): "
+                + ", ".join(
+                    f"{Path(path).name} {info.duration_seconds:.0f}s @ "
+                    f"{info.frame_rate or '-'} fps"
+                    for path, info in media.items()
+                )
+            )
+        return media
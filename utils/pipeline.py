@@ -0,0 +1,319 @@
+"""
+Dependency-aware stage runner for multi-step workflows.
+
+Each stage declares the stages whose results it consumes. Stages whose
+dependencies are satisfied run concurrently on a bounded thread pool, so a job
+takes about as long as its longest dependency chain instead of the sum of all
+stages.
+
+Stages that write their result to disk can be checkpointed in a
+`PipelineManifest`. On the next run a stage whose inputs, upstream outputs and
+output file are unchanged is loaded from disk instead of being run again, so a
+failure late in the chain doesn't force the early stages to be paid for twice.
+"""
+
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+from pathlib import Path
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A named unit of work in a pipeline:
+    - name: unique stage name
+    - run: callable receiving {dependency name: result} and returning a result
+    - depends_on: names of the stages whose results `run` needs
+    - inputs: JSON-serializable values that determine the result besides the
+      dependencies (model name, prompt template, transcript, ...)
+    - output_path: file `run` writes its result to, used for checkpointing
+    - load: reads the result back from `output_path` when resuming
+    """
+
+    name: str
+    run: Callable[[Mapping[str, Any]], Any]
+    depends_on: Tuple[str, ...] = ()
+    inputs: Mapping[str, Any] = field(default_factory=dict)
+    output_path: Optional[Path] = None
+    load: Optional[Callable[[Path], Any]] = None
+
+    @property
+    def checkpointed(self) -> bool:
+        return self.output_path is not None and self.load is not None
+
+
+def hash_inputs(value: Any) -> str:
+    """Stable SHA-256 of a JSON-serializable value."""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PipelineManifest:
+    """
+    JSON record of each completed stage: its input hash, output path and
+    output hash. A stage is valid while all three still match.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        if self.path.exists():
+            self._data = json.loads(self.path.read_text(encoding="utf-8"))
+        else:
+            self._data = {"stages": {}}
+
+    def entry(self, name: str) -> Optional[dict]:
+        return self._data["stages"].get(name)
+
+    def output_hash(self, name: str) -> Optional[str]:
+        entry = self.entry(name)
+        return entry["output_hash"] if entry else None
+
+    def is_valid(self, name: str, input_hash: str, output_path: Path) -> bool:
+        """True if `name` last ran with `input_hash` and its output is untouched."""
+        entry = self.entry(name)
+        if entry is None or entry["input_hash"] != input_hash:
+            return False
+        if entry["output_path"] != str(output_path) or not output_path.exists():
+            return False
+        return hash_file(output_path) == entry["output_hash"]
+
+    def record(self, name: str, input_hash: str, output_path: Path) -> None:
+        """Store a completed stage and write the manifest to disk."""
+        with self._lock:
+            self._data["stages"][name] = {
+                "input_hash": input_hash,
+                "output_path": str(output_path),
+                "output_hash": hash_file(output_path),
+                "completed_at": datetime.now(timezone.utc).isoformat(),
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self._data, indent=2), encoding="utf-8")
+
+
+def topological_order(stages: Sequence[Stage]) -> List[Stage]:
+    """Return stages ordered so every stage comes after its dependencies.
+
+    Stages without a mutual dependency keep their declaration order.
+
+    Raises:
+        ValueError: on duplicate names, unknown dependencies or cycles.
+    """
+    by_name: Dict[str, Stage] = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Duplicate stage name: {stage.name!r}")
+        by_name[stage.name] = stage
+
+    for stage in stages:
+        for dep in stage.depends_on:
+            if dep not in by_name:
+                raise ValueError(
+                    f"Stage {stage.name!r} depends on unknown stage {dep!r}"
+                )
+
+    ordered: List[Stage] = []
+    done: set = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [s for s in remaining if all(d in done for d in s.depends_on)]
+        if not ready:
+            names = ", ".join(s.name for s in remaining)
+            raise ValueError(f"Dependency cycle between stages: {names}")
+        for stage in ready:
+            ordered.append(stage)
+            done.add(stage.name)
+        remaining = [s for s in remaining if s.name not in done]
+    return ordered
+
+
+def _ancestors(stages: Sequence[Stage], names: Iterable[str]) -> Set[str]:
+    by_name = {s.name: s for s in stages}
+    found: Set[str] = set()
+    stack = [d for n in names for d in by_name[n].depends_on]
+    while stack:
+        name = stack.pop()
+        if name not in found:
+            found.add(name)
+            stack.extend(by_name[name].depends_on)
+    return found
+
+
+def _descendants(stages: Sequence[Stage], name: str) -> Set[str]:
+    found = {name}
+    for stage in topological_order(stages):
+        if any(d in found for d in stage.depends_on):
+            found.add(stage.name)
+    return found
+
+
+def run_stages(
+    stages: Sequence[Stage],
+    *,
+    max_workers: int = 4,
+    logger: Optional[logging.Logger] = None,
+    manifest: Optional[PipelineManifest] = None,
+    from_stage: Optional[str] = None,
+    only_stages: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Run stages as soon as their dependencies finish, at most `max_workers` at once.
+
+    With a `manifest`, checkpointed stages that are still valid are loaded from
+    their output file instead of being run, and every stage that runs is
+    recorded. `from_stage` re-runs that stage and everything downstream of it;
+    `only_stages` runs just the named stages. In both cases the upstream stages
+    are loaded from their last output without checking whether it is stale.
+
+    Returns a mapping of stage name to result. If a stage raises, no new stages
+    are started, running ones are allowed to finish and the first error is
+    re-raised.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    if from_stage is not None and only_stages:
+        raise ValueError("from_stage and only_stages are mutually exclusive")
+
+    logger = logger or logging.getLogger(__name__)
+    pending = topological_order(stages)
+    names = {s.name for s in pending}
+    for name in [from_stage, *(only_stages or [])]:
+        if name is not None and name not in names:
+            raise ValueError(f"Unknown stage {name!r}; expected one of {sorted(names)}")
+
+    # forced stages always run; pinned stages are loaded from disk if possible
+    forced: Set[str] = set()
+    if from_stage is not None:
+        forced = _descendants(pending, from_stage)
+    elif only_stages:
+        forced = set(only_stages)
+        needed = forced | _ancestors(pending, forced)
+        pending = [s for s in pending if s.name in needed]
+    pinned = _ancestors(pending, forced) - forced if forced else set()
+
+    results: Dict[str, Any] = {}
+    running: Dict[Future, Stage] = {}
+    input_hashes: Dict[str, str] = {}
+    started_at: Dict[str, float] = {}
+    error: Optional[BaseException] = None
+
+    def try_load(stage: Stage) -> bool:
+        """Load a stage from its checkpoint instead of running it, if allowed."""
+        if not stage.checkpointed:
+            return False
+        if stage.name in pinned:
+            if not stage.output_path.exists():
+                raise ValueError(
+                    f"Stage {stage.name!r} has no output at {stage.output_path}; "
+                    "run it first"
+                )
+        elif manifest is None or stage.name in forced:
+            return False
+        elif not manifest.is_valid(
+            stage.name, input_hashes[stage.name], stage.output_path
+        ):
+            return False
+        logger.info(f"Reusing checkpoint for stage '{stage.name}'")
+        results[stage.name] = stage.load(stage.output_path)
+        return True
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="stage"
+    ) as executor:
+        while pending or running:
+            # Loading a checkpoint can make further stages ready straight away
+            scheduled = True
+            while error is None and scheduled:
+                scheduled = False
+                ready = [
+                    s for s in pending if all(d in results for d in s.depends_on)
+                ]
+                for stage in ready:
+                    pending.remove(stage)
+                    scheduled = True
+                    if manifest is not None:
+                        input_hashes[stage.name] = hash_inputs(
+                            {
+                                "inputs": stage.inputs,
+                                "depends_on": {
+                                    d: manifest.output_hash(d)
+                                    for d in stage.depends_on
+                                },
+                            }
+                        )
+                    try:
+                        if try_load(stage):
+                            continue
+                    except Exception as exc:
+                        error = exc
+                        break
+                    inputs = {dep: results[dep] for dep in stage.depends_on}
+                    logger.info(f"Starting stage '{stage.name}'")
+                    started_at[stage.name] = time.perf_counter()
+                    running[executor.submit(stage.run, inputs)] = stage
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                elapsed = time.perf_counter() - started_at[stage.name]
+                try:
+                    results[stage.name] = future.result()
+                except BaseException as exc:
+                    logger.error(f"Stage '{stage.name}' failed after {elapsed:.1f}s")
+                    if error is None:
+                        error = exc
+                    continue
+                logger.info(f"Finished stage '{stage.name}' in {elapsed:.1f}s")
+                if manifest is not None and stage.checkpointed:
+                    manifest.record(
+                        stage.name, input_hashes[stage.name], stage.output_path
+                    )
+
+    if error is not None:
+        raise error
+    return results
+
+
+def add_resume_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the --from-stage / --only-stage options shared by the workflow scripts."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--from-stage",
+        help="Re-run this stage and everything after it, reusing earlier outputs",
+    )
+    group.add_argument(
+        "--only-stage",
+        action="append",
+        help="Run only this stage (repeatable), reusing the outputs it depends on",
+    )
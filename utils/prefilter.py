@@ -0,0 +1,211 @@
+"""
+Shrink a transcript locally before the cleanup call.
+
+About half of a raw interview transcript is filler the cleanup model throws
+away anyway: sound tags ("[laughs]"), filler words, stutters ("I'm, I'm,
+I'm so ex- excited") and backchannel turns ("Mm-hmm."). `prefilter_transcript`
+removes them with a few deterministic rules:
+
+- Segment text loses sound tags, filler words, stuttered restarts ("to, to
+  know") and cut-off word fragments; timestamps are kept as they are. Words
+  repeated on purpose ("no, no, no", "many, many years") stay.
+- Segments left empty (backchannel turns) are dropped. A segment with fewer
+  than `min_words` words that changes the speaker is kept, as it may be an
+  answer ("Yes.", "Ten years."); one of the same speaker is merged into the
+  previous segment (a sentence carried on), or dropped if it can't be.
+- Consecutive segments of one speaker are merged as long as the result lasts
+  at most `max_merged_ms`, which saves a header per segment.
+- Optionally, segments that mostly repeat what was said just before (low
+  TF-IDF novelty against the previous kept segments) are dropped.
+
+A `PrefilterReport` tells how much was removed.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+import logging
+import math
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from models.transcript import Segment, Transcript
+from utils.utils import estimate_tokens
+
+_TAG_RE = re.compile(r"\[[^\]]*\]")
+_FILLER_RE = re.compile(
+    r"(?<![\w'-])(?:u+m+|u+h+|uhm|erm?|a+h+|hm+|m{2,}|m+-?hm+|mhm|uh-huh)(?![\w'-]),?",
+    re.IGNORECASE,
+)
+_WORD = r"\w+(?:'\w+)?"
+# "I'm, I'm, I'm so" -> "I'm so", "when you, when you know" -> "when you know":
+# only restarts that carry on into the sentence count as stutters
+_REPEAT_RE = re.compile(
+    rf"\b({_WORD}(?:,?\s+{_WORD}){{0,2}}?)(?:,?\s+\1\b)+(?=,?\s+\w)(?!,?\s+\1\b)",
+    re.IGNORECASE,
+)
+# Words that are repeated on purpose ("no, no, no, I said", "many, many years")
+_EMPHATIC_WORDS = frozenset(
+    "again always bye ha hey many more much never no nope oh ok okay please "
+    "really stop very wait wow yeah yep yes".split()
+)
+# "ex- excited" -> "excited"
+_FRAGMENT_RE = re.compile(r"\b(\w+)-\s+(?=\1)", re.IGNORECASE)
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"\s+([,.!?])")
+# Punctuation left behind by a removed filler or tag: "So, um, ..." ->
+# "So, , ...", "again? [laughs]." -> "again?."
+_DANGLING_PUNCT_RE = re.compile(r",\s*(?=[,.!?])|(?<=[!?])\.")
+_LEADING_PUNCT_RE = re.compile(r"^[\s,.]+")
+_WORD_RE = re.compile(_WORD)
+
+# Kept segments each new segment is compared with for novelty
+_NOVELTY_WINDOW = 30
+
+
+def _collapse_repeat(match: re.Match) -> str:
+    repeated = match.group(1)
+    if repeated.split()[0].lower() in _EMPHATIC_WORDS:
+        return match.group(0)
+    return repeated
+
+
+def clean_text(text: str) -> str:
+    """Segment text without sound tags, filler words and stutters."""
+    text = _TAG_RE.sub(" ", text)
+    text = _FILLER_RE.sub(" ", text)
+    text = _FRAGMENT_RE.sub("", text)
+    text = _REPEAT_RE.sub(_collapse_repeat, text)
+    text = _SPACE_BEFORE_PUNCT_RE.sub(r"\1", " ".join(text.split()))
+    return _LEADING_PUNCT_RE.sub("", _DANGLING_PUNCT_RE.sub("", text))
+
+
+@dataclass
+class PrefilterReport:
+    """How much the pre-filter removed from a transcript."""
+
+    segments_in: int
+    segments_out: int
+    dropped: int
+    merged: int
+    novelty_dropped: int
+    chars_in: int
+    chars_out: int
+    tokens_in: int
+    tokens_out: int
+    seconds: float
+
+    @property
+    def token_reduction(self) -> float:
+        return 1 - self.tokens_out / self.tokens_in if self.tokens_in else 0.0
+
+    def log(self, logger: logging.Logger) -> None:
+        logger.info(
+            f"Pre-filtered transcript: {self.segments_in:,} -> "
+            f"{self.segments_out:,} segments ({self.dropped:,} dropped, "
+            f"{self.merged:,} merged, {self.novelty_dropped:,} repetitive), "
+            f"{self.chars_in:,} -> {self.chars_out:,} characters, "
+            f"~{self.tokens_in:,} -> ~{self.tokens_out:,} tokens "
+            f"({self.token_reduction:.0%} fewer) in {self.seconds * 1000:.0f} ms"
+        )
+
+
+def _novelty_filter(segments: List[Segment], min_novelty: float) -> List[Segment]:
+    """Drop segments too similar (TF-IDF cosine) to recent kept ones."""
+    term_counts = [
+        Counter(word.lower() for word in _WORD_RE.findall(s.text)) for s in segments
+    ]
+    document_frequency: Counter = Counter()
+    for counts in term_counts:
+        document_frequency.update(counts.keys())
+    n = len(segments)
+
+    vectors: List[Dict[str, float]] = []
+    for counts in term_counts:
+        vector = {
+            term: count * math.log(n / document_frequency[term])
+            for term, count in counts.items()
+        }
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        vectors.append({term: v / norm for term, v in vector.items()})
+
+    kept: List[int] = []
+    for i, vector in enumerate(vectors):
+        similarity = max(
+            (
+                sum(v * vectors[j].get(term, 0.0) for term, v in vector.items())
+                for j in kept[-_NOVELTY_WINDOW:]
+            ),
+            default=0.0,
+        )
+        if 1 - similarity >= min_novelty:
+            kept.append(i)
+    return [segments[i] for i in kept]
+
+
+def prefilter_transcript(
+    transcript: Transcript,
+    *,
+    min_words: int = 3,
+    max_merge_gap_ms: int = 2_000,
+    max_merged_ms: int = 30_000,
+    min_novelty: Optional[float] = None,
+    logger: Optional[logging.Logger] = None,
+) -> Tuple[Transcript, PrefilterReport]:
+    """
+    The transcript without filler, and a report of what was removed.
+
+    - min_words: shorter segments of the same speaker are merged into the
+      previous segment, or dropped; at a change of speaker they are kept
+    - max_merge_gap_ms / max_merged_ms: largest gap between, and total length
+      of, same-speaker segments merged into one
+    - min_novelty: drop segments whose TF-IDF novelty (1 - highest cosine
+      similarity to the previous kept segments) is below this; None = off
+    """
+    started = time.perf_counter()
+    segments: List[Segment] = []
+    dropped = merged = 0
+    for segment in transcript:
+        text = clean_text(segment.text)
+        previous = segments[-1] if segments else None
+        same_speaker = previous is not None and previous.speaker == segment.speaker
+        joinable = (
+            same_speaker
+            and segment.start_ms - previous.end_ms <= max_merge_gap_ms
+            and segment.end_ms - previous.start_ms <= max_merged_ms
+        )
+        short = len(_WORD_RE.findall(text)) < min_words
+        if not text or (short and same_speaker and not joinable):
+            dropped += 1
+            continue
+        if not joinable:
+            segments.append(segment._replace(text=text[:1].upper() + text[1:]))
+            continue
+        segments[-1] = previous._replace(
+            end_ms=max(previous.end_ms, segment.end_ms),
+            text=f"{previous.text} {text}",
+        )
+        merged += 1
+
+    novelty_dropped = 0
+    if min_novelty is not None and segments:
+        count = len(segments)
+        segments = _novelty_filter(segments, min_novelty)
+        novelty_dropped = count - len(segments)
+
+    filtered = Transcript.from_segments(segments)
+    before, after = transcript.render(), filtered.render()
+    report = PrefilterReport(
+        segments_in=len(transcript),
+        segments_out=len(filtered),
+        dropped=dropped,
+        merged=merged,
+        novelty_dropped=novelty_dropped,
+        chars_in=len(before),
+        chars_out=len(after),
+        tokens_in=estimate_tokens(before),
+        tokens_out=estimate_tokens(after),
+        seconds=time.perf_counter() - started,
+    )
+    if logger is not None:
+        report.log(logger)
+    return filtered, report
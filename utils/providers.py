@@ -0,0 +1,415 @@
+"""
+LLM provider backends behind one structured-output interface.
+
+Every backend turns (model, prompt, Pydantic schema) into the JSON text of a
+response matching the schema, either in one piece (`generate`) or in chunks
+(`stream`), together with the token usage the provider reports.
+`generate_clips_step` validates, caches and writes that text, so stages don't
+depend on which provider answered.
+
+Stages are routed to models with "provider:model" specs, e.g.
+"gemini:gemini-2.5-flash", "openai:gpt-5.1" or "fake:fake"; see `ModelRouter`.
+
+Requests can name a `prefix` of their prompt that other requests share (the
+context and transcript the finder stages all read). Gemini registers it once
+as a context cache and sends only the rest of the prompt; OpenAI caches
+repeated prefixes by itself. Either way the reused tokens are reported as
+`cached_tokens`.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, Mapping, NamedTuple, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from utils.fake_client import FakeGenAIClient, fake_clips_response
+from utils.utils import estimate_tokens
+
+PROVIDER_NAMES = ("gemini", "openai", "fake")
+
+logger = logging.getLogger(__name__)
+
+
+class Completion(NamedTuple):
+    """
+    Response text, or one streamed piece of it, with the token usage the
+    provider reported (None when it didn't; streams usually report it once,
+    on the last chunk). `prompt_tokens` includes the `cached_tokens` served
+    from the provider's prompt cache.
+    """
+
+    text: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+
+
+class LLMProvider:
+    """
+    Base class for provider backends.
+
+    `prefix`, when given, is the leading part of `prompt` that other requests
+    share; backends that can cache it send it only once.
+    """
+
+    name = "base"
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Completion:
+        """Return the full JSON response for `prompt`."""
+        raise NotImplementedError
+
+    def stream(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Iterator[Completion]:
+        """Yield the JSON response in chunks as it is generated."""
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    """
+    Google Gemini through `google-genai`, using `response_json_schema`.
+
+    Any object with the client's `models.generate_content(_stream)` methods
+    works, including `FakeGenAIClient`.
+
+    With `context_cache_ttl` (seconds), each distinct prompt prefix is stored
+    once per model with `caches.create` and later requests only send the rest
+    of the prompt. Concurrent requests for the same prefix wait for one
+    cache; a prefix the API refuses to cache (e.g. below the model's minimum
+    size) is sent in full until the TTL has passed.
+    """
+
+    name = "gemini"
+
+    def __init__(self, client, *, context_cache_ttl: Optional[int] = None):
+        self.client = client
+        self.context_cache_ttl = context_cache_ttl
+        # (model, prefix hash) -> (cache name or None, monotonic expiry)
+        self._context_caches: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+        self._cache_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def config(schema: Type[BaseModel]) -> dict:
+        # Thinking models (gemini-3-pro) also accept
+        # "thinking_config": {"thinking_level": "low"}
+        return {
+            "response_mime_type": "application/json",
+            "response_json_schema": schema.model_json_schema(),
+        }
+
+    @staticmethod
+    def _completion(response) -> Completion:
+        usage = getattr(response, "usage_metadata", None)
+        return Completion(
+            response.text or "",
+            getattr(usage, "prompt_token_count", None),
+            getattr(usage, "candidates_token_count", None),
+            getattr(usage, "cached_content_token_count", None),
+        )
+
+    def _context_cache(self, model: str, prefix: str) -> Optional[str]:
+        """Name of the context cache holding `prefix`, created on first use."""
+        key = (model, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+        with self._lock:
+            lock = self._cache_locks.setdefault(key, threading.Lock())
+        with lock:
+            cached = self._context_caches.get(key)
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
+            try:
+                name = self.client.caches.create(
+                    model=model,
+                    config={
+                        "contents": [prefix],
+                        "ttl": f"{self.context_cache_ttl}s",
+                    },
+                ).name
+                logger.info(f"Created context cache {name} for {model}")
+            except Exception as exc:
+                logger.warning(
+                    f"Could not create a context cache for {model}, sending "
+                    f"full prompts: {type(exc).__name__}: {exc}"
+                )
+                name = None
+            # Renewed a little before the provider drops it
+            expires = time.monotonic() + self.context_cache_ttl * 0.9
+            self._context_caches[key] = (name, expires)
+            return name
+
+    def _request(
+        self, model: str, prompt: str, schema: Type[BaseModel], prefix: Optional[str]
+    ) -> dict:
+        config = self.config(schema)
+        if self.context_cache_ttl and prefix and prompt.startswith(prefix):
+            name = self._context_cache(model, prefix)
+            if name is not None:
+                config["cached_content"] = name
+                prompt = prompt[len(prefix) :]
+        return {"model": model, "contents": prompt, "config": config}
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Completion:
+        response = self.client.models.generate_content(
+            **self._request(model, prompt, schema, prefix)
+        )
+        return self._completion(response)
+
+    def stream(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Iterator[Completion]:
+        for chunk in self.client.models.generate_content_stream(
+            **self._request(model, prompt, schema, prefix)
+        ):
+            yield self._completion(chunk)
+
+
+class OpenAIProvider(LLMProvider):
+    """
+    OpenAI chat completions with the Pydantic schema as `response_format`.
+
+    OpenAI caches long prompt prefixes automatically, so `prefix` needs no
+    extra request; the reused tokens show up in the usage.
+    """
+
+    name = "openai"
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _usage(completion) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        usage = getattr(completion, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        return (
+            getattr(usage, "prompt_tokens", None),
+            getattr(usage, "completion_tokens", None),
+            getattr(details, "cached_tokens", None),
+        )
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Completion:
+        completion = self.client.chat.completions.parse(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format=schema,
+        )
+        text = completion.choices[0].message.content
+        return Completion(text, *self._usage(completion))
+
+    def stream(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Iterator[Completion]:
+        with self.client.chat.completions.stream(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format=schema,
+            stream_options={"include_usage": True},
+        ) as events:
+            for event in events:
+                if event.type == "content.delta":
+                    yield Completion(event.delta)
+            yield Completion("", *self._usage(events.get_final_completion()))
+
+
+class FakeProvider(GeminiProvider):
+    """
+    Deterministic offline backend.
+
+    Picks up to `max_clips` of the timestamped lines found in the prompt,
+    seeded by the prompt itself, so the same input always gives the same
+    clips. `latency`, `failures` and `prefill_seconds_per_1k_tokens` are
+    passed to `FakeGenAIClient`, whose context caches stand in for Gemini's.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        *,
+        max_clips: int = 4,
+        latency: float = 0.0,
+        failures=(),
+        prefill_seconds_per_1k_tokens: float = 0.0,
+        context_cache_ttl: Optional[int] = None,
+    ):
+        super().__init__(
+            FakeGenAIClient(
+                lambda prompt: fake_clips_response(prompt, max_clips),
+                latency=latency,
+                failures=failures,
+                prefill_seconds_per_1k_tokens=prefill_seconds_per_1k_tokens,
+            ),
+            context_cache_ttl=context_cache_ttl,
+        )
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Offline backend that answers with recorded responses.
+
+    `responses` maps model names to response text. Routing each stage to its
+    own name (e.g. "fake:hooks" with this provider registered as "fake")
+    replays a recorded run stage by stage.
+    """
+
+    name = "replay"
+
+    def __init__(self, responses: Mapping[str, str], chunk_chars: int = 256):
+        self.responses = dict(responses)
+        self.chunk_chars = chunk_chars
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Completion:
+        # Usage is estimated, as a recording has no provider metadata
+        if model not in self.responses:
+            raise KeyError(f"No recorded response for model {model!r}")
+        text = self.responses[model]
+        return Completion(text, estimate_tokens(prompt), estimate_tokens(text))
+
+    def stream(
+        self,
+        model: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        prefix: Optional[str] = None,
+    ) -> Iterator[Completion]:
+        completion = self.generate(model, prompt, schema)
+        text = completion.text
+        for start in range(0, len(text), self.chunk_chars):
+            yield Completion(text[start : start + self.chunk_chars])
+        yield completion._replace(text="")
+
+
+def create_provider(
+    name: str, *, context_cache_ttl: Optional[int] = None
+) -> LLMProvider:
+    """
+    Create a provider backend with its API key from the environment.
+    `context_cache_ttl` turns on Gemini context caching (and the fake's).
+    """
+    if name == "gemini":
+        from google import genai
+
+        return GeminiProvider(
+            genai.Client(api_key=os.getenv("GOOGLE_API_KEY")),
+            context_cache_ttl=context_cache_ttl,
+        )
+    if name == "openai":
+        from openai import OpenAI
+
+        return OpenAIProvider(OpenAI(api_key=os.getenv("OPENAI_API_KEY")))
+    if name == "fake":
+        return FakeProvider(context_cache_ttl=context_cache_ttl)
+    raise ValueError(f"Unknown provider {name!r}; expected one of {PROVIDER_NAMES}")
+
+
+def parse_model_spec(spec: str) -> Tuple[str, str]:
+    """Split "provider:model" into its parts."""
+    provider, sep, model = spec.partition(":")
+    if not sep or not model or provider not in PROVIDER_NAMES:
+        raise ValueError(
+            f"Model spec must look like 'provider:model' with provider in "
+            f"{PROVIDER_NAMES}, got {spec!r}"
+        )
+    return provider, model
+
+
+class ModelRouter:
+    """
+    Routes each stage to a provider and model.
+
+    - default: spec for stages without an entry in `stage_models`
+    - stage_models: stage name -> spec,
+      e.g. {"narrative": "gemini:gemini-3-pro-preview"}
+    - provider_override: send every stage to this provider instead, keeping
+      the model names (e.g. "fake" to run the whole pipeline offline)
+    - context_cache_ttl: seconds shared prompt prefixes stay in the
+      provider's context cache (None = no explicit caches)
+
+    Providers are created on first use and shared between stages, and so are
+    their context caches.
+    """
+
+    def __init__(
+        self,
+        default: str,
+        stage_models: Optional[Mapping[str, str]] = None,
+        *,
+        provider_override: Optional[str] = None,
+        providers: Optional[Mapping[str, LLMProvider]] = None,
+        context_cache_ttl: Optional[int] = None,
+    ):
+        self.default = default
+        self.stage_models = dict(stage_models or {})
+        self.provider_override = provider_override
+        self.context_cache_ttl = context_cache_ttl
+        self._providers: Dict[str, LLMProvider] = dict(providers or {})
+        self._lock = threading.Lock()
+        for spec in [default, *self.stage_models.values()]:
+            parse_model_spec(spec)
+
+    def spec(self, stage: str) -> str:
+        """The "provider:model" spec a stage runs on."""
+        provider, model = parse_model_spec(self.stage_models.get(stage, self.default))
+        return f"{self.provider_override or provider}:{model}"
+
+    def provider(self, name: str) -> LLMProvider:
+        with self._lock:
+            if name not in self._providers:
+                self._providers[name] = create_provider(
+                    name, context_cache_ttl=self.context_cache_ttl
+                )
+            return self._providers[name]
+
+    def route(self, stage: str) -> Tuple[LLMProvider, str]:
+        """The provider backend and model name for a stage."""
+        provider, model = parse_model_spec(self.spec(stage))
+        return self.provider(provider), model
+
+
+def add_provider_arguments(parser) -> None:
+    """Add the `--provider` option shared by the workflow scripts."""
+    parser.add_argument(
+        "--provider",
+        choices=PROVIDER_NAMES,
+        help="Send every stage to this provider, keeping the configured model "
+        "names ('fake' runs the whole pipeline offline)",
+    )
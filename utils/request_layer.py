@@ -0,0 +1,395 @@
+"""
+Client-side pacing and resilience for GenAI requests.
+
+`RequestLayer.call` wraps any zero-argument request function, so it works the
+same for Gemini, OpenAI or a local fake client:
+
+- token buckets for requests per minute and (estimated) tokens per minute
+- an optional cap on requests in flight across threads; a streamed response
+  keeps its slot until it has been read
+- jittered exponential backoff on 408/429/5xx, timeouts and connection errors
+- a circuit breaker that fails fast after repeated transient failures (the
+  errors that are retried; a 400 or an invalid response doesn't count)
+- per-call timeouts
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Threads that run requests with a timeout when `max_concurrent` is None; more
+# requests than this at once would wait in the queue with their timeout running
+UNCAPPED_REQUEST_WORKERS = 64
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the provider while the circuit is open."""
+
+
+class RequestTimeoutError(TimeoutError):
+    """Raised when a single request exceeds its timeout."""
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """Best-effort HTTP status of a provider exception (google-genai, openai, httpx)."""
+    for attr in ("code", "status_code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for throttling, transient server errors, timeouts and dropped connections."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return status_code(exc) in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `per_minute` tokens per minute.
+
+    `capacity` bounds the burst size; it defaults to one minute's worth.
+    """
+
+    def __init__(
+        self,
+        per_minute: float,
+        capacity: Optional[float] = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Take `amount` tokens, blocking until available. Returns seconds waited."""
+        # Requests larger than the bucket would never fit; let them drain it instead
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_seconds`; then lets a single trial call through (half-open).
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_seconds: float = 60.0,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._clock() - self._opened_at < self.reset_seconds:
+                raise CircuitOpenError("Circuit open after repeated request failures")
+            if self._trial_in_flight:
+                raise CircuitOpenError("Circuit half-open; trial request in flight")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff: sleep U(0, min(max_delay, base * 2**n))."""
+
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class _SlotHeldIterator(Iterator[T]):
+    """A streamed response that frees its request slot once read or closed."""
+
+    def __init__(self, chunks: Iterable[T], release: Callable[[], None]):
+        self._chunks = iter(chunks)
+        self._release: Optional[Callable[[], None]] = release
+
+    def __next__(self) -> T:
+        if self._release is None:
+            raise StopIteration
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
+        finally:
+            release()
+
+    def __del__(self) -> None:
+        self.close()
+
+
+def _close_stream(future: Any) -> None:
+    """Close a stream nobody waits for any more, once it has opened."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+@dataclass
+class CallStats:
+    """Filled in by `RequestLayer.call`: attempts made and seconds spent queued."""
+
+    attempts: int = 0
+    queued_seconds: float = 0.0
+
+
+class RequestLayer:
+    """
+    Paces, limits and retries provider requests.
+
+    - requests_per_minute / tokens_per_minute: token-bucket limits (None = off)
+    - max_concurrent: cap on requests in flight across all threads (None =
+      no cap)
+    - retry: backoff policy for retryable errors
+    - breaker: shared circuit breaker (None = off)
+    - timeout: default seconds per request attempt (None = no timeout)
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrent: Optional[int] = None,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        timeout: Optional[float] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.request_bucket = (
+            TokenBucket(requests_per_minute, sleep=sleep)
+            if requests_per_minute
+            else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute, sleep=sleep) if tokens_per_minute else None
+        )
+        self.max_concurrent = max_concurrent
+        self._slots = (
+            threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        )
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker
+        self.timeout = timeout
+        self._sleep = sleep
+        self.logger = logger or logging.getLogger(__name__)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _release_slot(self, _future=None) -> None:
+        if self._slots is not None:
+            self._slots.release()
+
+    def _run_with_timeout(
+        self, fn: Callable[[], T], timeout: Optional[float], stream: bool = False
+    ) -> T:
+        """
+        Run `fn` in the slot `call` took. The slot is freed once `fn` returns,
+        or with `stream`, once the iterator it returns is exhausted or closed.
+        """
+
+        def run() -> T:
+            result = fn()
+            if stream:
+                return _SlotHeldIterator(result, self._release_slot)
+            return result
+
+        def release(future: Any) -> None:
+            # A stream that opened has taken the slot over
+            if not stream or future.cancelled() or future.exception() is not None:
+                self._release_slot()
+
+        if timeout is None:
+            try:
+                result = run()
+            except BaseException:
+                self._release_slot()
+                raise
+            if not stream:
+                self._release_slot()
+            return result
+        with self._executor_lock:
+            if self._executor is None:
+                # With the slots held until `fn` returns, no request waits in
+                # the executor's queue, where its timeout would already run
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrent or UNCAPPED_REQUEST_WORKERS,
+                    thread_name_prefix="request",
+                )
+        try:
+            future = self._executor.submit(run)
+        except BaseException:
+            self._release_slot()
+            raise
+        # An abandoned request is still in flight, so it keeps its slot
+        future.add_done_callback(release)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # The abandoned request keeps running in its thread; we stop waiting
+            if stream:
+                future.add_done_callback(_close_stream)
+            raise RequestTimeoutError(f"Request timed out after {timeout:g}s")
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        *,
+        estimated_tokens: int = 0,
+        timeout: Optional[float] = None,
+        label: str = "request",
+        stats: Optional[CallStats] = None,
+        stream: bool = False,
+    ) -> T:
+        """
+        Run `fn` under the configured limits, retrying transient failures.
+
+        With `stream`, `fn` opens a streamed response and returns an iterator
+        over it; the request keeps its slot until the caller has read the
+        iterator to the end or closed it.
+        """
+        stats = stats if stats is not None else CallStats()
+        timeout = timeout if timeout is not None else self.timeout
+
+        for attempt in range(self.retry.max_attempts):
+            stats.attempts = attempt + 1
+            if self.breaker is not None:
+                self.breaker.before_call()
+
+            queued = time.perf_counter()
+            if self.request_bucket is not None:
+                self.request_bucket.acquire()
+            if self.token_bucket is not None and estimated_tokens:
+                self.token_bucket.acquire(estimated_tokens)
+            if self._slots is not None:
+                self._slots.acquire()
+            stats.queued_seconds += time.perf_counter() - queued
+
+            try:
+                result = self._run_with_timeout(fn, timeout, stream)
+            except Exception as exc:
+                if self.breaker is not None:
+                    if is_retryable(exc):
+                        self.breaker.record_failure()
+                    else:
+                        # The provider answered; a bad request or response
+                        # says nothing about its health
+                        self.breaker.record_success()
+                last_attempt = attempt + 1 >= self.retry.max_attempts
+                if not is_retryable(exc) or last_attempt:
+                    raise
+                delay = self.retry.delay(attempt)
+                self.logger.warning(
+                    f"{label} failed ({type(exc).__name__}: {exc}); "
+                    f"retry {attempt + 1}/{self.retry.max_attempts - 1} in {delay:.1f}s"
+                )
+                self._sleep(delay)
+                continue
+
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+def build_request_layer(
+    *,
+    requests_per_minute: Optional[float],
+    tokens_per_minute: Optional[float],
+    max_concurrent: Optional[int],
+    max_attempts: int,
+    breaker_failures: Optional[int],
+    breaker_reset_seconds: float,
+    timeout: Optional[float],
+    logger: Optional[logging.Logger] = None,
+) -> RequestLayer:
+    """Create the request layer from the request settings in `config.py`."""
+    return RequestLayer(
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        max_concurrent=max_concurrent,
+        retry=RetryPolicy(max_attempts=max_attempts),
+        breaker=(
+            CircuitBreaker(breaker_failures, breaker_reset_seconds)
+            if breaker_failures
+            else None
+        ),
+        timeout=timeout,
+        logger=logger,
+    )
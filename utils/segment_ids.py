@@ -0,0 +1,113 @@
+"""
+Address transcript segments by ID instead of copying them.
+
+A prompt that lists the transcript with numbered segments
+(`Transcript.render(numbered=True)`: "#12 00:01:02,000 --> ...") can be
+answered with a `SegmentSelectionList`: ranges of segment IDs, optionally
+trimmed by a few words, instead of timestamps and verbatim text. The model
+then writes a few tokens per clip instead of the clip's whole text, and
+`rebuild_clips` turns the ranges back into `ClipSelection`s:
+
+- transcript_text: the segments' text, with a speaker label wherever the
+  speaker changes, as the finder prompts ask for
+- start / end: the first segment's start and the last one's end, moved in
+  by the trimmed words. Word times are interpolated by character offset
+  within their segment, as the transcript only times segments.
+
+Ranges outside the transcript, reversed, or trimmed down to nothing are
+dropped.
+"""
+
+import logging
+import re
+from typing import List, Optional
+
+from models.data_models import (
+    ClipSelection,
+    ClipsList,
+    SegmentSelection,
+    SegmentSelectionList,
+)
+from models.transcript import Transcript
+from utils.utils import ms_to_timestamp
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def _ms_at(transcript: Transcript, index: int, char: int) -> int:
+    """Interpolated time of character `char` of segment `index`."""
+    start, end = transcript.start_ms[index], transcript.end_ms[index]
+    length = len(transcript.text(index))
+    return start + round(char * (end - start) / max(length, 1))
+
+
+def rebuild_clip(
+    selection: SegmentSelection, transcript: Transcript
+) -> Optional[ClipSelection]:
+    """The clip a segment range stands for; None if it is not a valid range."""
+    first, last = selection.first_segment, selection.last_segment
+    if not 0 <= first <= last < len(transcript):
+        return None
+
+    # Character offsets where the kept words start in the first segment and
+    # end in the last one
+    first_text = transcript.text(first)
+    first_words = [m.span() for m in _WORD_RE.finditer(first_text)]
+    skip = max(selection.trim_start_words, 0)
+    start_char = first_words[skip][0] if skip < len(first_words) else len(first_text)
+    last_words = (
+        first_words
+        if last == first
+        else [m.span() for m in _WORD_RE.finditer(transcript.text(last))]
+    )
+    keep = len(last_words) - max(selection.trim_end_words, 0)
+    end_char = last_words[keep - 1][1] if keep > 0 else 0
+
+    parts: List[str] = []
+    speaker = None
+    for i in range(first, last + 1):
+        text = transcript.text(i)
+        if i == last:
+            text = text[:end_char]
+        if i == first:
+            text = text[start_char:]
+        text = text.strip()
+        if not text:
+            continue
+        if transcript.speaker(i) and transcript.speaker(i) != speaker:
+            speaker = transcript.speaker(i)
+            text = f"[{speaker}] {text}"
+        parts.append(text)
+
+    start_ms = _ms_at(transcript, first, start_char)
+    end_ms = _ms_at(transcript, last, end_char)
+    if not parts or end_ms <= start_ms:
+        return None
+    return ClipSelection(
+        start=ms_to_timestamp(start_ms),
+        end=ms_to_timestamp(end_ms),
+        transcript_text=" ".join(parts),
+        notes=selection.notes,
+        score=selection.score,
+    )
+
+
+def rebuild_clips(
+    selections: SegmentSelectionList,
+    transcript: Transcript,
+    logger: Optional[logging.Logger] = None,
+) -> ClipsList:
+    """Rebuild every valid range, in the order given."""
+    clips = []
+    for selection in selections.clips:
+        clip = rebuild_clip(selection, transcript)
+        if clip is not None:
+            clips.append(clip)
+        elif logger is not None:
+            logger.warning(
+                f"Dropped segment range #{selection.first_segment}-"
+                f"#{selection.last_segment} (trimmed {selection.trim_start_words}/"
+                f"{selection.trim_end_words} words): no such segments, or "
+                "nothing left after trimming"
+            )
+    return ClipsList(clips=clips)
@@ -0,0 +1,324 @@
+"""
+Move clip cuts into the pauses of the source audio.
+
+Transcript timestamps are rounded straight to frames, so cuts often land
+mid-breath or mid-syllable. `SilenceRefiner` snaps every clip's in and out
+point to the nearest silence within `max_shift_ms`, read from the media's
+own audio:
+
+- Only the audio around the cuts is decoded. The file is split into
+  `block_seconds` blocks, and each block some cut needs is decoded once with
+  ffmpeg (input seeking, so reading it costs the same anywhere in a
+  two-hour file) and streamed as 16-bit mono PCM into a WAV file in the
+  cache. Blocks are decoded in parallel, and later runs reuse them until
+  the media file changes (the cache key includes its size and mtime).
+- The cached blocks are memory-mapped, and the windows around all cuts are
+  stacked into one array. RMS energy over `min_silence_ms` frames, every
+  `hop_ms`, comes from one cumulative sum over that array.
+- A frame is silent below `threshold_db` (dBFS). Each cut moves to the
+  centre of the nearest silent frame; cuts with no silence in reach keep
+  their time, as does a clip that snapping would empty.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import logging
+import os
+from pathlib import Path
+import subprocess
+import time
+from typing import Iterable, List, Optional, Tuple
+import wave
+
+import numpy as np
+
+from models.data_models import ClipsList
+from utils.media_probe import media_cache_key
+from utils.utils import ms_to_timestamp
+
+_CHUNK_BYTES = 1 << 16
+# Cuts whose windows are analysed together. With the default 400 ms reach a
+# cut takes about 0.3 MB (float32 samples, float64 squares and their cumulative
+# sum), so a batch peaks under 20 MB
+_CUTS_PER_BATCH = 64
+
+
+class AudioBlockCache:
+    """
+    Mono 16-bit PCM of one media file, decoded block by block on demand.
+
+    - media_path: any file ffmpeg reads; its first audio stream is used
+    - cache_dir: root of the cache; each media version gets a subdirectory
+    - sample_rate: decoding rate; speech pauses need no more than 16 kHz
+    - block_seconds: length of the decoded and cached blocks
+    """
+
+    def __init__(
+        self,
+        media_path: Path,
+        cache_dir: Path,
+        *,
+        sample_rate: int = 16_000,
+        block_seconds: float = 10.0,
+        ffmpeg: str = "ffmpeg",
+    ):
+        self.media_path = Path(media_path)
+        self.sample_rate = sample_rate
+        self.block_samples = round(block_seconds * sample_rate)
+        self.ffmpeg = ffmpeg
+        self.directory = Path(cache_dir) / media_cache_key(self.media_path)
+        self.decoded = 0
+
+    def _block_path(self, index: int) -> Path:
+        return self.directory / f"{self.sample_rate}_{index:06d}.wav"
+
+    def _decode(self, index: int) -> None:
+        """Stream one block's PCM from ffmpeg into its cache file."""
+        start = index * self.block_samples / self.sample_rate
+        command = [
+            self.ffmpeg,
+            "-nostdin",
+            "-v",
+            "error",
+            "-ss",
+            f"{start:.6f}",
+            "-t",
+            f"{self.block_samples / self.sample_rate:.6f}",
+            "-i",
+            str(self.media_path),
+            "-map",
+            "0:a:0",
+            "-ac",
+            "1",
+            "-ar",
+            str(self.sample_rate),
+            "-f",
+            "s16le",
+            "pipe:1",
+        ]
+        path = self._block_path(index)
+        tmp = path.with_suffix(f".{os.getpid()}.{index}.tmp")
+        with subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        ) as process:
+            with wave.open(str(tmp), "wb") as out:
+                out.setnchannels(1)
+                out.setsampwidth(2)
+                out.setframerate(self.sample_rate)
+                while chunk := process.stdout.read(_CHUNK_BYTES):
+                    out.writeframesraw(chunk)
+            error = process.stderr.read().decode("utf-8", "replace").strip()
+        if process.returncode != 0:
+            tmp.unlink(missing_ok=True)
+            raise RuntimeError(
+                f"ffmpeg could not decode {self.media_path} at {start:.0f}s: {error}"
+            )
+        os.replace(tmp, path)
+
+    def ensure(self, indices: Iterable[int], max_workers: int = 4) -> None:
+        """Decode the blocks that aren't cached yet, in parallel."""
+        missing = sorted(i for i in set(indices) if not self._block_path(i).exists())
+        if not missing:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(self._decode, missing))
+        self.decoded += len(missing)
+
+    def block(self, index: int) -> np.ndarray:
+        """Memory-mapped samples of a cached block; short or empty at the end."""
+        path = self._block_path(index)
+        with wave.open(str(path), "rb") as f:
+            frames = f.getnframes()
+        if frames == 0:
+            return np.zeros(0, dtype="<i2")
+        offset = path.stat().st_size - 2 * frames
+        return np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(frames,))
+
+    def windows(self, starts: np.ndarray, length: int) -> np.ndarray:
+        """
+        Samples `starts[i]:starts[i] + length` for every i, as float32 in
+        [-1, 1]. Samples outside the file read as full scale, so they never
+        look silent.
+        """
+        first = starts // self.block_samples
+        last = (starts + length - 1) // self.block_samples
+        needed = {
+            i
+            for a, b in zip(first.tolist(), last.tolist())
+            for i in range(max(a, 0), b + 1)
+        }
+        self.ensure(needed)
+        blocks = {i: self.block(i) for i in needed}
+
+        out = np.ones((len(starts), length), dtype=np.float32)
+        for row, (start, a, b) in enumerate(zip(starts.tolist(), first, last)):
+            for i in range(max(a, 0), b + 1):
+                samples = blocks[i]
+                offset = i * self.block_samples
+                lo = max(start, offset)
+                hi = min(start + length, offset + len(samples))
+                if hi > lo:
+                    out[row, lo - start : hi - start] = (
+                        samples[lo - offset : hi - offset] / 32768.0
+                    )
+        return out
+
+
+@dataclass
+class SilenceReport:
+    """What `SilenceRefiner.refine` did to a clip list's cuts."""
+
+    cuts: int
+    snapped: int
+    no_silence: int
+    unchanged_clips: int
+    median_shift_ms: float
+    blocks_decoded: int
+    seconds: float
+
+    def log(self, logger: logging.Logger) -> None:
+        logger.info(
+            f"Snapped {self.snapped} of {self.cuts} cuts to silence "
+            f"(median shift {self.median_shift_ms:.0f} ms, {self.no_silence} "
+            f"without silence in reach, {self.unchanged_clips} clips left as "
+            f"they were as snapping would empty them); decoded "
+            f"{self.blocks_decoded} audio blocks in {self.seconds:.1f}s"
+        )
+
+
+class SilenceRefiner:
+    """
+    Snaps cuts to pauses in the audio of one media file (see the module
+    docstring).
+
+    - threshold_db: frames quieter than this (dBFS RMS) are silent
+    - min_silence_ms: length of the RMS frames, i.e. the shortest pause used
+    - max_shift_ms: farthest a cut may move
+    - hop_ms: spacing of the RMS frames, and so the precision of a cut
+    """
+
+    def __init__(
+        self,
+        media_path: Path,
+        cache_dir: Path,
+        *,
+        threshold_db: float = -40.0,
+        min_silence_ms: int = 60,
+        max_shift_ms: int = 400,
+        hop_ms: int = 10,
+        sample_rate: int = 16_000,
+        block_seconds: float = 10.0,
+    ):
+        self.audio = AudioBlockCache(
+            media_path,
+            cache_dir,
+            sample_rate=sample_rate,
+            block_seconds=block_seconds,
+        )
+        self.threshold_db = threshold_db
+        self.frame = round(min_silence_ms * sample_rate / 1000)
+        self.hop = max(round(hop_ms * sample_rate / 1000), 1)
+        self.reach = round(max_shift_ms * sample_rate / 1000)
+
+    def snap(self, times_ms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Snapped cut times in ms, and which cuts found a silence."""
+        times_ms = np.asarray(times_ms, dtype=np.int64)
+        batches = [
+            self._snap(times_ms[i : i + _CUTS_PER_BATCH])
+            for i in range(0, len(times_ms), _CUTS_PER_BATCH)
+        ]
+        if not batches:
+            return times_ms, np.zeros(0, dtype=bool)
+        return (
+            np.concatenate([new for new, _ in batches]),
+            np.concatenate([found for _, found in batches]),
+        )
+
+    def _snap(self, times_ms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rate = self.audio.sample_rate
+        centers = np.round(times_ms * rate / 1000).astype(np.int64)
+        # Window covering every frame whose centre is within reach of the cut
+        length = 2 * self.reach + self.frame
+        starts = centers - self.reach - self.frame // 2
+        samples = self.audio.windows(starts, length)
+
+        squares = np.zeros((len(centers), length + 1), dtype=np.float64)
+        np.cumsum(np.square(samples, dtype=np.float64), axis=1, out=squares[:, 1:])
+        offsets = np.arange(0, length - self.frame + 1, self.hop)
+        energy = (squares[:, offsets + self.frame] - squares[:, offsets]) / self.frame
+        silent = 10 * np.log10(energy + 1e-12) <= self.threshold_db
+
+        # Distance from each frame's centre to the cut, in samples
+        distance = np.abs(offsets - self.reach)
+        distance = np.where(silent, distance, np.iinfo(np.int64).max)
+        best = distance.argmin(axis=1)
+        found = silent[np.arange(len(centers)), best]
+        snapped = starts + offsets[best] + self.frame // 2
+        new_ms = np.where(found, np.round(snapped * 1000 / rate), times_ms)
+        return new_ms.astype(np.int64), found
+
+    def refine(
+        self, clips: ClipsList, logger: Optional[logging.Logger] = None
+    ) -> Tuple[ClipsList, SilenceReport]:
+        """The clips with their cuts moved into silences, and a report."""
+        started = time.perf_counter()
+        decoded = self.audio.decoded
+        starts, ends = clips.to_ms_arrays()
+        count = len(starts)
+        new, found = self.snap(np.concatenate([starts, ends]))
+        new_starts, new_ends = new[:count], new[count:]
+        # A clip snapped to (or past) nothing keeps its original cuts
+        keep = new_ends <= new_starts
+        new_starts = np.where(keep, starts, new_starts)
+        new_ends = np.where(keep, ends, new_ends)
+
+        refined: List = []
+        for clip, start, end, kept in zip(
+            clips.clips, new_starts.tolist(), new_ends.tolist(), keep.tolist()
+        ):
+            if kept:
+                refined.append(clip)
+            else:
+                refined.append(
+                    clip.model_copy(
+                        update={
+                            "start": ms_to_timestamp(start),
+                            "end": ms_to_timestamp(end),
+                        }
+                    )
+                )
+
+        moved = found & ~np.concatenate([keep, keep])
+        shifts = np.abs(new[moved] - np.concatenate([starts, ends])[moved])
+        report = SilenceReport(
+            cuts=2 * count,
+            snapped=int(moved.sum()),
+            no_silence=int((~found).sum()),
+            unchanged_clips=int(keep.sum()),
+            median_shift_ms=float(np.median(shifts)) if len(shifts) else 0.0,
+            blocks_decoded=self.audio.decoded - decoded,
+            seconds=time.perf_counter() - started,
+        )
+        if logger is not None:
+            report.log(logger)
+        return ClipsList(clips=refined), report
+
+
+def snap_cuts_to_silence(
+    clips: ClipsList,
+    media_path: Path,
+    cache_dir: Path,
+    logger: logging.Logger,
+    **options,
+) -> ClipsList:
+    """
+    `SilenceRefiner(media_path, cache_dir, **options).refine(clips)`, or the
+    clips unchanged, with a warning, when the audio can't be read (missing
+    file or ffmpeg, no audio stream).
+    """
+    try:
+        return SilenceRefiner(media_path, cache_dir, **options).refine(clips, logger)[0]
+    except (OSError, RuntimeError) as exc:
+        logger.warning(f"Cuts not snapped to silence: {type(exc).__name__}: {exc}")
+        return clips
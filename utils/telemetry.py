@@ -0,0 +1,247 @@
+"""
+Per-request telemetry for AI calls.
+
+`generate_clips_step` records one `RequestRecord` per request, cached or
+not: queue time in the request layer, time to first token (streaming only),
+latency, token usage from the response metadata (including prompt tokens
+served from the provider's prompt cache), estimated cost and retries.
+`Telemetry` appends each record to a JSONL run log, can export Prometheus
+text-format metrics, and summarizes the run per stage.
+"""
+
+from dataclasses import asdict, dataclass, field
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# USD per million (prompt, completion[, cached prompt]) tokens
+Prices = Mapping[str, Tuple[float, ...]]
+
+METRIC_PREFIX = "automate_timelines"
+
+# (metric name, summary key, help text)
+_PROMETHEUS_COUNTERS = [
+    ("requests_total", "requests", "AI requests, including cache hits"),
+    ("cache_hits_total", "cache_hits", "Requests served from the response cache"),
+    ("errors_total", "errors", "Requests that failed"),
+    ("retries_total", "retries", "Request retries"),
+    ("queue_seconds_total", "queue_seconds", "Time spent waiting for rate limits"),
+    ("latency_seconds_total", "latency_seconds", "Time spent in requests"),
+    ("prompt_tokens_total", "prompt_tokens", "Prompt tokens reported"),
+    ("completion_tokens_total", "completion_tokens", "Completion tokens reported"),
+    ("cached_tokens_total", "cached_tokens", "Prompt tokens served from cache"),
+    ("cost_usd_total", "cost_usd", "Estimated cost in USD"),
+]
+
+
+def _label_value(value: Any) -> str:
+    """A Prometheus label value, with backslashes, quotes and newlines escaped."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@dataclass
+class RequestRecord:
+    """Measurements for one AI request."""
+
+    stage: str
+    output: str
+    provider: str
+    model: str
+    cache_hit: bool
+    queue_seconds: float = 0.0
+    ttft_seconds: Optional[float] = None
+    latency_seconds: float = 0.0
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    cost_usd: Optional[float] = None
+    retries: int = 0
+    error: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+def estimate_cost(
+    prices: Prices,
+    model: str,
+    prompt_tokens: Optional[int],
+    completion_tokens: Optional[int],
+    cached_tokens: Optional[int] = None,
+) -> Optional[float]:
+    """
+    Cost in USD from per-million-token prices; None for unpriced models.
+    The `cached_tokens` part of the prompt is charged at the cached price,
+    when the model has one.
+    """
+    if model not in prices or prompt_tokens is None:
+        return None
+    prompt_price, completion_price, *cached_price = prices[model]
+    cached = min(cached_tokens or 0, prompt_tokens) if cached_price else 0
+    return (
+        (prompt_tokens - cached) * prompt_price
+        + cached * (cached_price[0] if cached_price else 0.0)
+        + (completion_tokens or 0) * completion_price
+    ) / 1_000_000
+
+
+class Telemetry:
+    """
+    Collects request records for one run.
+
+    - run_log: JSONL file each record is appended to as it happens (None = off)
+    - prices: model name -> (prompt, completion[, cached prompt]) USD per
+      million tokens
+    """
+
+    def __init__(
+        self, run_log: Optional[Path] = None, prices: Optional[Prices] = None
+    ):
+        self.run_log = run_log
+        self.prices = dict(prices or {})
+        self.records: List[RequestRecord] = []
+        self._lock = threading.Lock()
+        if run_log is not None:
+            run_log.parent.mkdir(parents=True, exist_ok=True)
+
+    def record(self, record: RequestRecord) -> None:
+        if record.cost_usd is None:
+            record.cost_usd = estimate_cost(
+                self.prices,
+                record.model,
+                record.prompt_tokens,
+                record.completion_tokens,
+                record.cached_tokens,
+            )
+        with self._lock:
+            self.records.append(record)
+            if self.run_log is not None:
+                with open(self.run_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(record)) + "\n")
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Totals per stage, in the order the stages first made a request."""
+        stages: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            records = list(self.records)
+        for r in records:
+            s = stages.setdefault(
+                r.stage,
+                {
+                    "stage": r.stage,
+                    "model": r.model,
+                    "requests": 0,
+                    "cache_hits": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "queue_seconds": 0.0,
+                    "latency_seconds": 0.0,
+                    "max_ttft_seconds": None,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cached_tokens": 0,
+                    "cost_usd": 0.0,
+                },
+            )
+            s["requests"] += 1
+            s["cache_hits"] += r.cache_hit
+            s["errors"] += r.error is not None
+            s["retries"] += r.retries
+            s["queue_seconds"] += r.queue_seconds
+            s["latency_seconds"] += r.latency_seconds
+            if r.ttft_seconds is not None:
+                s["max_ttft_seconds"] = max(s["max_ttft_seconds"] or 0, r.ttft_seconds)
+            s["prompt_tokens"] += r.prompt_tokens or 0
+            s["completion_tokens"] += r.completion_tokens or 0
+            s["cached_tokens"] += r.cached_tokens or 0
+            s["cost_usd"] += r.cost_usd or 0.0
+        return list(stages.values())
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log a one-line-per-stage table plus run totals."""
+        rows = self.summary()
+        if not rows:
+            return
+        width = max([len("stage")] + [len(r["stage"]) for r in rows])
+        lines = [
+            f"{'stage':<{width}}  reqs  cached  errors  retries  queue s  "
+            f"latency s  ttft s  prompt tok  cached tok  compl tok  cost $"
+        ]
+        for r in rows + [self._totals(rows)]:
+            ttft = r["max_ttft_seconds"]
+            lines.append(
+                f"{r['stage']:<{width}}  {r['requests']:>4}  {r['cache_hits']:>6}  "
+                f"{r['errors']:>6}  {r['retries']:>7}  {r['queue_seconds']:>7.1f}  "
+                f"{r['latency_seconds']:>9.1f}  "
+                f"{'-' if ttft is None else f'{ttft:.1f}':>6}  "
+                f"{r['prompt_tokens']:>10,}  {r['cached_tokens']:>10,}  "
+                f"{r['completion_tokens']:>9,}  "
+                f"{r['cost_usd']:>6.3f}"
+            )
+        logger.info("Request telemetry:\n" + "\n".join(lines))
+
+    @staticmethod
+    def _totals(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        ttfts = [r["max_ttft_seconds"] for r in rows if r["max_ttft_seconds"]]
+        totals = {
+            key: sum(r[key] for r in rows)
+            for key in (
+                "requests",
+                "cache_hits",
+                "errors",
+                "retries",
+                "queue_seconds",
+                "latency_seconds",
+                "prompt_tokens",
+                "completion_tokens",
+                "cached_tokens",
+                "cost_usd",
+            )
+        }
+        totals["max_ttft_seconds"] = max(ttfts, default=None)
+        return {"stage": "total", **totals}
+
+    def write_prometheus(self, path: Path) -> None:
+        """
+        Write per-stage metrics in the Prometheus text format, e.g. for the
+        node_exporter textfile collector. The file is replaced atomically.
+        """
+        rows = self.summary()
+        lines = []
+        for name, key, help_text in _PROMETHEUS_COUNTERS:
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for r in rows:
+                labels = (
+                    f'stage="{_label_value(r["stage"])}",'
+                    f'model="{_label_value(r["model"])}"'
+                )
+                lines.append(f"{metric}{{{labels}}} {r[key]}")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+
+    def finish(
+        self, logger: logging.Logger, prometheus_path: Optional[Path] = None
+    ) -> None:
+        """Log the summary table and export metrics at the end of a run."""
+        self.log_summary(logger)
+        if self.run_log is not None:
+            logger.info(f"Request log written to {self.run_log}")
+        if prometheus_path is not None:
+            self.write_prometheus(prometheus_path)
+            logger.info(f"Metrics written to {prometheus_path}")
+
+
+def build_telemetry(
+    log_dir: Optional[Path], run_name: str, prices: Optional[Prices] = None
+) -> Telemetry:
+    """Telemetry logging to `<log_dir>/<run_name>_<timestamp>.jsonl` (None = off)."""
+    run_log = None
+    if log_dir is not None:
+        run_log = log_dir / f"{run_name}_{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+    return Telemetry(run_log, prices)
@@ -0,0 +1,134 @@
+"""
+Batch timestamp parsing and frame conversion.
+
+Parses whole columns of 'HH:MM:SS,mmm' timestamps into integer milliseconds
+with NumPy in one pass, and converts milliseconds to frames at integer or
+rational (NTSC) frame rates such as 24000/1001.
+"""
+
+from fractions import Fraction
+from typing import Sequence, Union
+
+import numpy as np
+
+from utils.utils import timestamp_to_ms
+
+FrameRate = Union[int, float, str, Fraction]
+
+# Common NTSC rates written as decimals, mapped to their exact values
+_NTSC_RATES = {
+    23.976: Fraction(24000, 1001),
+    29.97: Fraction(30000, 1001),
+    47.952: Fraction(48000, 1001),
+    59.94: Fraction(60000, 1001),
+    119.88: Fraction(120000, 1001),
+}
+
+# 'HH:MM:SS,mmm': digit positions and their weight in milliseconds
+_TIMESTAMP_WIDTH = 12
+_DIGIT_POSITIONS = np.array([0, 1, 3, 4, 6, 7, 9, 10, 11])
+_DIGIT_WEIGHTS = np.array(
+    [36_000_000, 3_600_000, 600_000, 60_000, 10_000, 1_000, 100, 10, 1],
+    dtype=np.int64,
+)
+_SEPARATORS = {2: ord(":"), 5: ord(":"), 8: ord(",")}
+
+
+def parse_frame_rate(rate: FrameRate) -> Fraction:
+    """
+    Normalize a frame rate to an exact Fraction.
+
+    Accepts ints (24), NTSC decimals (23.976, 29.97), and strings such as
+    "25", "29.97" or "24000/1001".
+    """
+    if isinstance(rate, str) and "/" not in rate:
+        rate = float(rate) if "." in rate else int(rate)
+
+    if isinstance(rate, Fraction):
+        value = rate
+    elif isinstance(rate, str):
+        value = Fraction(rate.strip())
+    elif isinstance(rate, float):
+        value = _NTSC_RATES.get(round(rate, 3))
+        if value is None:
+            value = Fraction(rate).limit_denominator(1001)
+    else:
+        value = Fraction(rate)
+
+    if value <= 0:
+        raise ValueError(f"Frame rate must be positive, got {rate!r}")
+    return value
+
+
+def timestamps_to_ms(timestamps: Sequence[str]) -> np.ndarray:
+    """
+    Parse a column of 'HH:MM:SS,mmm' timestamps into an int64 array of ms.
+
+    Canonical fixed-width timestamps are parsed in one vectorized pass; any
+    entry with a different width falls back to `timestamp_to_ms`.
+
+    Raises:
+        ValueError: naming the first timestamp that can't be parsed.
+    """
+    values = np.asarray(timestamps, dtype=str)
+    if values.ndim != 1:
+        values = values.reshape(-1)
+    result = np.zeros(len(values), dtype=np.int64)
+    if not len(values):
+        return result
+
+    fixed = np.char.str_len(values) == _TIMESTAMP_WIDTH
+    if fixed.any():
+        # View each string as its 12 UTF-32 code points
+        codes = (
+            values[fixed]
+            .astype(f"U{_TIMESTAMP_WIDTH}")
+            .view(np.uint32)
+            .reshape(-1, _TIMESTAMP_WIDTH)
+        )
+        digits = codes[:, _DIGIT_POSITIONS].astype(np.int64) - ord("0")
+        valid = ((digits >= 0) & (digits <= 9)).all(axis=1)
+        for position, code in _SEPARATORS.items():
+            valid &= codes[:, position] == code
+        if not valid.all():
+            bad = np.flatnonzero(fixed)[np.argmin(valid)]
+            raise ValueError(f"Invalid timestamp format: {str(values[bad])!r}")
+        result[fixed] = digits @ _DIGIT_WEIGHTS
+
+    for i in np.flatnonzero(~fixed):
+        result[i] = timestamp_to_ms(str(values[i]))
+    return result
+
+
+def ms_to_frames(ms: np.ndarray, fps: FrameRate) -> np.ndarray:
+    """
+    Convert milliseconds to the nearest frame numbers at `fps`.
+
+    Rational rates are applied exactly (ms * num / (den * 1000)); ties round
+    to even, like Python's round().
+    """
+    rate = parse_frame_rate(fps)
+    scaled = np.asarray(ms, dtype=np.int64) * rate.numerator
+    return np.rint(scaled / (rate.denominator * 1000)).astype(np.int64)
+
+
+def timecode_to_frames(timecode: str, fps: FrameRate) -> int:
+    """
+    Frame number of an SMPTE timecode, e.g. "01:00:00:00" -> 86400 at 24.
+
+    A ';' (or '.') before the frames marks drop-frame timecode, as used at
+    29.97 and 59.94: frame numbers 0 and 1 (0-3 at 59.94) are skipped at
+    the start of every minute except each tenth.
+    """
+    rate = parse_frame_rate(fps)
+    nominal = round(rate)
+    parts = timecode.replace(";", ":").replace(".", ":").split(":")
+    try:
+        hours, minutes, seconds, frames = (int(part) for part in parts)
+    except ValueError:
+        raise ValueError(f"Invalid timecode: {timecode!r}") from None
+    total = ((hours * 60 + minutes) * 60 + seconds) * nominal + frames
+    if ";" in timecode or "." in timecode:
+        total_minutes = hours * 60 + minutes
+        total -= round(nominal / 15) * (total_minutes - total_minutes // 10)
+    return total
@@ -14,3 +14,34 @@ def timestamp_to_seconds(ts: str) -> float:
         return int(hh) * 3600 + int(mm) * 60 + int(ss) + int(ms) / 1000.0
     except Exception as exc:
         raise ValueError(f"Invalid timestamp format: {ts!r}") from exc
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for prompt budgeting (about 4 characters per token).
+    """
+    return (len(text) + 3) // 4
+
+
+def timestamp_to_ms(ts: str) -> int:
+    """
+    Convert 'HH:MM:SS,mmm' to total milliseconds as int.
+    Example: '01:23:48,320' -> 5028320
+    """
+    try:
+        hh, mm, rest = ts.split(":")
+        ss, ms = rest.split(",")
+        return ((int(hh) * 60 + int(mm)) * 60 + int(ss)) * 1000 + int(ms)
+    except Exception as exc:
+        raise ValueError(f"Invalid timestamp format: {ts!r}") from exc
+
+
+def ms_to_timestamp(ms: int) -> str:
+    """
+    Convert total milliseconds to 'HH:MM:SS,mmm'.
+    Example: 5028320 -> '01:23:48,320'
+    """
+    seconds, millis = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"